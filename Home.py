@@ -1,5 +1,6 @@
 import streamlit as st
-from PIL import Image
+from leanflow.ativos import estilo, logo
+from leanflow.preaquecimento import preaquecer
 
 # Configuração da página
 st.set_page_config(
@@ -9,73 +10,14 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Estilo CSS personalizado ajustado
-st.markdown("""
-<style>
-    body {
-        background-color: #1E1E1E;
-        color: #E0E0E0;
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-    }
-    .main-title {
-        font-size: 3rem !important;
-        color: #4FC3F7;
-        text-align: center;
-        margin-top: 0 !important;
-        margin-bottom: 0.5rem;
-        font-weight: bold;
-    }
-    .sub-title {
-        font-size: 1.5rem;
-        color: #B0BEC5;
-        text-align: center;
-        font-style: italic;
-        margin-bottom: 2.5rem;
-    }
-    .section-title {
-        font-size: 1.8rem;
-        color: #4FC3F7;
-        margin-top: 2rem;
-        margin-bottom: 1.5rem;
-    }
-    .stButton>button {
-        background-color: #4FC3F7;
-        color: #1E1E1E;
-        font-weight: bold;
-        border-radius: 8px;
-        padding: 0.5rem 1rem;
-        transition: background-color 0.3s ease;
-    }
-    .stButton>button:hover {
-        background-color: #03A9F4;
-    }
-    .footer {
-        text-align: center;
-        color: #B0BEC5;
-        margin-top: 3rem;
-        font-size: 0.9rem;
-    }
-    .footer a {
-        color: #4FC3F7;
-        text-decoration: none;
-    }
-    .footer a:hover {
-        text-decoration: underline;
-    }
-    .feedback-link {
-        color: #4FC3F7;
-        text-decoration: none;
-        font-weight: bold;
-    }
-    .feedback-link:hover {
-        text-decoration: underline;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Carrega em segundo plano as bibliotecas da página de diagnóstico
+preaquecer()
+
+# Estilo CSS personalizado ajustado (assets/estilo.css)
+st.markdown(estilo(), unsafe_allow_html=True)
 
 # Sidebar com logo e introdução
-image = Image.open('app2.png')
-st.sidebar.image(image, width=200) 
+st.sidebar.image(logo(200), width=200)
 st.sidebar.markdown("""
     <h1 style='display: inline; font-size: 28px;'>LeanFlow</h1>
     <h2 style='display: inline; font-size: 18px;'>➤</h2>
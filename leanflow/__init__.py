@@ -0,0 +1,7 @@
+"""
+LeanFlow - módulos de cálculo reutilizados pelas páginas Streamlit.
+
+As funções deste pacote não dependem do Streamlit: recebem arrays/DataFrames
+e devolvem resultados numéricos, para que possam ser usadas em lote ou em
+outras páginas.
+"""
@@ -0,0 +1,194 @@
+"""
+Programação de cirurgias eletivas em salas e janelas de funcionamento.
+
+Cada sala-dia é um "recipiente" com capacidade igual à janela de
+funcionamento. Uma cirurgia ocupa sua duração mais o turnover até a próxima;
+o setup é pago uma vez por sala-dia aberta. A alocação inicial usa First Fit
+Decreasing e é refinada por busca local (mover e trocar cirurgias entre
+salas-dia para eliminar hora extra e fechar salas-dia pouco usadas).
+"""
+
+import datetime as dt
+
+import numpy as np
+
+
+# =====================================
+# Janela de funcionamento
+# =====================================
+
+def minutos_do_dia(valor):
+    """Converte '07:00', '7h', 7, datetime.time ou Timestamp em minutos desde 0h."""
+    if isinstance(valor, (dt.time, dt.datetime)):
+        return valor.hour * 60 + valor.minute
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        # Valores < 1 vêm de células de horário do Excel (fração do dia)
+        return float(valor) * 24 * 60 if 0 <= valor < 1 else float(valor) * 60
+    texto = str(valor).strip().lower().replace('h', ':')
+    partes = [p for p in texto.split(':') if p != '']
+    horas = int(float(partes[0]))
+    minutos = int(float(partes[1])) if len(partes) > 1 else 0
+    return horas * 60 + minutos
+
+
+def duracao_janela(inicios, terminos):
+    """Soma das durações (min) dos períodos de funcionamento.
+
+    Períodos que terminam antes de começar atravessam a meia-noite.
+    """
+    total = 0.0
+    for inicio, termino in zip(inicios, terminos):
+        ini, fim = minutos_do_dia(inicio), minutos_do_dia(termino)
+        total += (fim - ini) % (24 * 60) or 24 * 60
+    return total
+
+
+# =====================================
+# Lista de casos
+# =====================================
+
+def gerar_casos(quantidade, duracao_media, cv=0.4, semente=0):
+    """Gera durações (min) log-normais com média e coeficiente de variação dados."""
+    rng = np.random.default_rng(semente)
+    sigma2 = np.log(1 + cv ** 2)
+    mu = np.log(duracao_media) - sigma2 / 2
+    return rng.lognormal(mu, np.sqrt(sigma2), int(quantidade))
+
+
+# =====================================
+# Empacotamento e busca local
+# =====================================
+
+def _first_fit_decreasing(tamanhos, n_recipientes, capacidade):
+    ordem = np.argsort(-tamanhos, kind='stable')
+    restante = np.full(n_recipientes, capacidade, dtype=float)
+    atribuicao = np.empty(len(tamanhos), dtype=int)
+    for i in ordem:
+        cabe = np.flatnonzero(restante >= tamanhos[i])
+        # Sem espaço: vai para o recipiente mais folgado (gera hora extra)
+        j = cabe[0] if len(cabe) else int(np.argmax(restante))
+        atribuicao[i] = j
+        restante[j] -= tamanhos[i]
+    return atribuicao
+
+
+def _busca_local(tamanhos, atribuicao, n_recipientes, capacidade, max_iteracoes):
+    carga = np.bincount(atribuicao, weights=tamanhos, minlength=n_recipientes)
+
+    for _ in range(max_iteracoes):
+        melhorou = False
+        excesso = carga - capacidade
+
+        # 1) Eliminar hora extra movendo ou trocando cirurgias
+        for j in np.flatnonzero(excesso > 1e-9)[np.argsort(-excesso[excesso > 1e-9])]:
+            casos_j = np.flatnonzero(atribuicao == j)
+            folga = capacidade - carga
+            folga[j] = -np.inf
+            for i in casos_j[np.argsort(tamanhos[casos_j])]:
+                # Move para o recipiente aberto mais justo (best fit); senão, um vazio
+                candidatos = np.flatnonzero((folga >= tamanhos[i]) & (carga > 0))
+                if not len(candidatos):
+                    candidatos = np.flatnonzero(folga >= tamanhos[i])
+                if len(candidatos):
+                    k = candidatos[np.argmin(folga[candidatos])]
+                    atribuicao[i] = k
+                    carga[j] -= tamanhos[i]
+                    carga[k] += tamanhos[i]
+                    melhorou = True
+                    break
+            else:
+                # Troca um caso grande de j por um menor de outro recipiente com folga
+                for i in casos_j[np.argsort(-tamanhos[casos_j])]:
+                    delta = tamanhos[i] - tamanhos
+                    cabe = (atribuicao != j) & (delta > 0) & (delta <= folga[atribuicao])
+                    if cabe.any():
+                        b = np.flatnonzero(cabe)[np.argmax(delta[cabe])]
+                        k = atribuicao[b]
+                        atribuicao[i], atribuicao[b] = k, j
+                        carga[j] -= delta[b]
+                        carga[k] += delta[b]
+                        melhorou = True
+                        break
+            if melhorou:
+                break
+        if melhorou:
+            continue
+
+        # 2) Fechar a sala-dia menos carregada realocando seus casos na folga das demais
+        abertos = np.flatnonzero(carga > 0)
+        for j in abertos[np.argsort(carga[abertos])]:
+            casos_j = np.flatnonzero(atribuicao == j)
+            folga = capacidade - carga
+            folga[j] = -np.inf
+            folga[carga == 0] = -np.inf
+            destino = {}
+            for i in casos_j[np.argsort(-tamanhos[casos_j])]:
+                candidatos = np.flatnonzero(folga >= tamanhos[i])
+                if not len(candidatos):
+                    break
+                k = candidatos[np.argmin(folga[candidatos])]
+                destino[i] = k
+                folga[k] -= tamanhos[i]
+            if len(destino) == len(casos_j):
+                for i, k in destino.items():
+                    atribuicao[i] = k
+                    carga[k] += tamanhos[i]
+                carga[j] = 0.0
+                melhorou = True
+            break
+        if not melhorou:
+            break
+
+    return atribuicao
+
+
+def agendar_casos(duracoes, n_salas, n_dias, janela_min, setup_min=0.0, turnover_min=0.0,
+                  max_iteracoes=200):
+    """Distribui as cirurgias nas salas-dia disponíveis.
+
+    duracoes: duração de cada cirurgia (min).
+    janela_min: minutos de funcionamento por sala-dia.
+
+    Retorna um dicionário com:
+        'sala', 'dia'        - sala e dia atribuídos a cada cirurgia;
+        'ocupacao'           - minutos ocupados por sala-dia (n_salas x n_dias),
+                               incluindo setup e turnovers;
+        'hora_extra'         - minutos além da janela por sala-dia;
+        'utilizacao'         - ocupação / janela das salas-dia abertas (limitada à janela);
+        'utilizacao_total'   - ocupação / janela de todas as salas-dia disponíveis;
+        'salas_dia_abertas'  - salas-dia com ao menos uma cirurgia.
+    """
+    duracoes = np.asarray(duracoes, dtype=float)
+    n_recipientes = int(n_salas) * int(n_dias)
+    if n_recipientes <= 0:
+        raise ValueError("É necessário ao menos uma sala e um dia de funcionamento.")
+
+    # O último caso do dia não paga turnover: a capacidade efetiva ganha um turnover
+    tamanhos = duracoes + turnover_min
+    capacidade = janela_min - setup_min + turnover_min
+
+    atribuicao = _first_fit_decreasing(tamanhos, n_recipientes, capacidade)
+    atribuicao = _busca_local(tamanhos, atribuicao, n_recipientes, capacidade, max_iteracoes)
+
+    casos = np.bincount(atribuicao, minlength=n_recipientes)
+    carga = np.bincount(atribuicao, weights=tamanhos, minlength=n_recipientes)
+    ocupacao = np.where(casos > 0, carga + setup_min - turnover_min, 0.0)
+    hora_extra = np.maximum(ocupacao - janela_min, 0.0)
+
+    abertos = casos > 0
+    ocupacao_na_janela = np.minimum(ocupacao, janela_min)
+    utilizacao = ocupacao_na_janela[abertos].sum() / (abertos.sum() * janela_min) if abertos.any() else 0.0
+
+    # Recipientes numerados sala a sala (índice = sala * n_dias + dia), de modo que
+    # o First Fit enche uma sala em todos os dias antes de abrir a próxima
+    forma = (int(n_salas), int(n_dias))
+    return {
+        'sala': atribuicao // int(n_dias),
+        'dia': atribuicao % int(n_dias),
+        'ocupacao': ocupacao.reshape(forma),
+        'hora_extra': hora_extra.reshape(forma),
+        'casos': casos.reshape(forma),
+        'utilizacao': float(utilizacao),
+        'utilizacao_total': float(ocupacao_na_janela.sum() / (n_recipientes * janela_min)),
+        'salas_dia_abertas': int(abertos.sum()),
+    }
@@ -0,0 +1,70 @@
+"""
+Arquivos estáticos das páginas: logo da barra lateral e folha de estilo.
+
+O logo é redimensionado para a largura exibida e codificado em PNG uma única
+vez por processo. O st.image recebe os bytes prontos e, como a imagem já tem
+a largura pedida, não a decodifica nem a redimensiona a cada execução. A
+folha de estilo (assets/estilo.css) também é lida uma vez.
+
+O cache é compartilhado entre as sessões e identificado pelo caminho do
+arquivo, pela data de modificação e, no logo, pela largura.
+"""
+
+import io
+import os
+import threading
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGO = os.path.join(RAIZ, 'app2.png')
+ESTILO = os.path.join(RAIZ, 'assets', 'estilo.css')
+
+_cache = {}
+_trava = threading.Lock()
+
+
+def _em_cache(chave, carregar):
+    with _trava:
+        if chave in _cache:
+            return _cache[chave]
+    valor = carregar()
+    with _trava:
+        _cache[chave] = valor
+    return valor
+
+
+# =====================================
+# Logo
+# =====================================
+
+def _redimensionar(caminho, largura):
+    from PIL import Image
+
+    with Image.open(caminho) as imagem:
+        if imagem.width > largura:
+            altura = round(imagem.height * largura / imagem.width)
+            imagem = imagem.resize((largura, altura), Image.LANCZOS)
+        saida = io.BytesIO()
+        imagem.save(saida, format='PNG', optimize=True)
+    return saida.getvalue()
+
+
+def logo(largura, caminho=LOGO):
+    """PNG do logo com `largura` pixels (bytes), ou None se o arquivo não existir."""
+    if not os.path.exists(caminho):
+        return None
+    chave = ('logo', caminho, os.path.getmtime(caminho), largura)
+    return _em_cache(chave, lambda: _redimensionar(caminho, largura))
+
+
+# =====================================
+# Folha de estilo
+# =====================================
+
+def estilo(caminho=ESTILO):
+    """Bloco <style> com o conteúdo da folha de estilo, para st.markdown(..., unsafe_allow_html=True)."""
+    def carregar():
+        with open(caminho, encoding='utf-8') as arquivo:
+            return f"<style>\n{arquivo.read()}</style>"
+
+    chave = ('estilo', caminho, os.path.getmtime(caminho))
+    return _em_cache(chave, carregar)
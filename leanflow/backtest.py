@@ -0,0 +1,159 @@
+"""
+Backtest de previsões com origem móvel (rolling origin).
+
+Para cada série e cada origem t, o modelo é ajustado em y[:t] e prevê os
+`horizonte` meses seguintes, comparados com o realizado. Cada (série, modelo,
+origem) é uma tarefa independente, executada em um pool de processos quando
+há tarefas e núcleos suficientes.
+
+Métricas:
+    MAPE  - erro percentual absoluto médio (ignora meses com valor zero);
+    sMAPE - MAPE simétrico, 2|e| / (|y| + |ŷ|);
+    MASE  - erro absoluto médio escalado pelo erro do método ingênuo
+            (sazonal, quando há ao menos um ciclo) no período de treino.
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from leanflow.previsao import PERIODOS_SAZONAIS, contexto_processos, previsao_pontual
+from leanflow.tendencia import projetar_tendencia
+
+LIMIAR_PARALELO = 32
+
+
+# =====================================
+# Modelos avaliados
+# =====================================
+
+def _tendencia_linear(y, horizonte):
+    # Mesma reta de mínimos quadrados no tempo usada nos gráficos de tendência
+    return projetar_tendencia(y, horizonte)
+
+
+def _ingenuo(y, horizonte):
+    return np.full(horizonte, y[-1], dtype=float)
+
+
+def _ingenuo_sazonal(y, horizonte):
+    if len(y) < PERIODOS_SAZONAIS:
+        return _ingenuo(y, horizonte)
+    ultimo_ciclo = y[-PERIODOS_SAZONAIS:]
+    return np.resize(ultimo_ciclo, horizonte).astype(float)
+
+
+def _holt_winters(y, horizonte):
+    return previsao_pontual(y, horizonte, selecao='primeiro')
+
+
+def _holt_winters_aic(y, horizonte):
+    return previsao_pontual(y, horizonte, selecao='aic')
+
+
+MODELOS = {
+    'Tendência linear (OLS)': _tendencia_linear,
+    'Ingênuo': _ingenuo,
+    'Ingênuo sazonal': _ingenuo_sazonal,
+    'Holt-Winters': _holt_winters,
+    'Holt-Winters (AIC)': _holt_winters_aic,
+}
+
+
+# =====================================
+# Execução das dobras
+# =====================================
+
+def _escala_mase(treino):
+    m = PERIODOS_SAZONAIS if len(treino) > PERIODOS_SAZONAIS else 1
+    diferencas = np.abs(treino[m:] - treino[:-m])
+    escala = diferencas.mean() if len(diferencas) else np.nan
+    return escala if escala > 0 else np.nan
+
+
+def _executar_dobra(tarefa):
+    serie, modelo, y, origem, horizonte = tarefa
+    treino, real = y[:origem], y[origem:origem + horizonte]
+    inicio = time.perf_counter()
+    try:
+        previsto = np.asarray(MODELOS[modelo](treino, horizonte), dtype=float)[:len(real)]
+    except (ValueError, np.linalg.LinAlgError):
+        previsto = np.full(len(real), np.nan)
+    duracao = time.perf_counter() - inicio
+
+    erro = np.abs(real - previsto)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(real != 0, erro / np.abs(real), np.nan)
+        sape = np.where(np.abs(real) + np.abs(previsto) > 0, 2 * erro / (np.abs(real) + np.abs(previsto)), np.nan)
+    return {
+        'serie': serie,
+        'modelo': modelo,
+        'origem': origem,
+        'ape': np.nanmean(ape) if np.isfinite(ape).any() else np.nan,
+        'sape': np.nanmean(sape) if np.isfinite(sape).any() else np.nan,
+        'ase': np.nanmean(erro) / _escala_mase(treino) if np.isfinite(erro).any() else np.nan,
+        'tempo': duracao,
+    }
+
+
+def avaliar_previsoes(series, horizonte=3, min_treino=12, passo=1, modelos=None,
+                      max_processos=None, limiar_paralelo=LIMIAR_PARALELO):
+    """Backtest de origem móvel dos modelos sobre as séries.
+
+    series: dicionário {nome: série mensal}.
+    modelos: nomes de MODELOS a avaliar (padrão: todos).
+
+    Retorna um dicionário com:
+        'por_serie'  - MAPE, sMAPE e MASE por série e modelo;
+        'por_modelo' - médias por modelo, dobras avaliadas, tempo total de
+                       ajuste (s) e tempo médio por ajuste (ms);
+        'tempo_total' - tempo de relógio do backtest (s).
+    """
+    modelos = list(MODELOS) if modelos is None else list(modelos)
+    tarefas = []
+    for nome, serie in series.items():
+        y = np.asarray(serie, dtype=float)
+        for origem in range(min_treino, len(y) - horizonte + 1, passo):
+            tarefas.extend((nome, modelo, y, origem, horizonte) for modelo in modelos)
+
+    inicio = time.perf_counter()
+    if len(tarefas) >= limiar_paralelo and (max_processos or os.cpu_count() or 1) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=max_processos, mp_context=contexto_processos()) as executor:
+            resultados = list(executor.map(_executar_dobra, tarefas, chunksize=max(1, len(tarefas) // 64)))
+    else:
+        resultados = [_executar_dobra(tarefa) for tarefa in tarefas]
+    tempo_total = time.perf_counter() - inicio
+
+    colunas_serie = ['serie', 'modelo', 'MAPE (%)', 'sMAPE (%)', 'MASE', 'dobras']
+    colunas_modelo = ['modelo', 'MAPE (%)', 'sMAPE (%)', 'MASE', 'dobras', 'tempo_total_s', 'tempo_por_ajuste_ms']
+    if not resultados:
+        return {
+            'por_serie': pd.DataFrame(columns=colunas_serie),
+            'por_modelo': pd.DataFrame(columns=colunas_modelo),
+            'tempo_total': tempo_total,
+        }
+
+    dobras = pd.DataFrame(resultados)
+    por_serie = dobras.groupby(['serie', 'modelo'], sort=False).agg(
+        ape=('ape', 'mean'), sape=('sape', 'mean'), ase=('ase', 'mean'), dobras=('origem', 'size')
+    ).reset_index()
+    por_modelo = dobras.groupby('modelo', sort=False).agg(
+        ape=('ape', 'mean'), sape=('sape', 'mean'), ase=('ase', 'mean'),
+        dobras=('origem', 'size'), tempo_total_s=('tempo', 'sum'), tempo_por_ajuste_ms=('tempo', 'mean')
+    ).reset_index()
+    por_modelo['tempo_por_ajuste_ms'] *= 1000
+
+    for tabela in (por_serie, por_modelo):
+        tabela['ape'] *= 100
+        tabela['sape'] *= 100
+        tabela.rename(columns={'ape': 'MAPE (%)', 'sape': 'sMAPE (%)', 'ase': 'MASE'}, inplace=True)
+
+    return {
+        'por_serie': por_serie[colunas_serie],
+        'por_modelo': por_modelo[colunas_modelo].sort_values('MASE').reset_index(drop=True),
+        'tempo_total': tempo_total,
+    }
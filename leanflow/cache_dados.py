@@ -0,0 +1,177 @@
+"""
+Cache de planilhas compartilhado entre as sessões.
+
+Em uma implantação com vários gestores, a mesma planilha mensal é aberta por
+dezenas de sessões ao mesmo tempo. Cada planilha é identificada pelo hash do
+conteúdo do arquivo: as abas são lidas uma única vez por processo (mesmo que
+várias sessões façam o upload juntas) e os resultados derivados dela, que não
+dependem de parâmetros da sessão, ficam guardados junto com as abas.
+
+As sessões recebem cópias rasas das abas (`copy(deep=False)`): a página
+acrescenta e substitui colunas ao preparar os dados, o que cria arrays novos
+na cópia sem alterar a aba compartilhada nem duplicar os dados. Alterações
+no lugar (`.loc[...] = ...`, `.at`) não são permitidas nas abas. Os
+resultados derivados (tabelas, séries e matrizes que dependem só da
+planilha) são devolvidos sem cópia e não devem ser alterados; arrays numpy
+são marcados como somente leitura por quem os calcula.
+
+Cada sessão segura no máximo uma planilha (contagem de referências). Quando a
+memória estimada passa de LIMITE_BYTES, saem primeiro as planilhas menos
+usadas recentemente que nenhuma sessão segura. Como o Streamlit não avisa o
+fim de uma sessão, a referência expira após EXPIRACAO_SESSAO segundos sem uso.
+"""
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+LIMITE_BYTES = 512 * 1024 * 1024
+EXPIRACAO_SESSAO = 2 * 60 * 60
+
+_cache = OrderedDict()
+_sessoes = {}
+_carregando = {}
+_trava = threading.Lock()
+
+
+# =====================================
+# Memória
+# =====================================
+
+def tamanho(valor):
+    """Estimativa em bytes da memória ocupada por `valor` (DataFrames, arrays e coleções)."""
+    # Importados aqui: a página importa este módulo antes do upload
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho(k) + tamanho(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sys.getsizeof(valor) + sum(tamanho(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+def _expirar_sessoes(agora):
+    for sessao in [s for s, (_, visto) in _sessoes.items() if agora - visto > EXPIRACAO_SESSAO]:
+        chave, _ = _sessoes.pop(sessao)
+        if chave in _cache:
+            _cache[chave]['referencias'] -= 1
+
+
+def _liberar_memoria():
+    # Planilhas seguradas por alguma sessão ficam mesmo acima do limite
+    total = sum(entrada['bytes'] for entrada in _cache.values())
+    for chave in list(_cache):
+        if total <= LIMITE_BYTES:
+            break
+        if _cache[chave]['referencias'] == 0:
+            total -= _cache.pop(chave)['bytes']
+
+
+# =====================================
+# Planilhas
+# =====================================
+
+def hash_conteudo(conteudo):
+    """Identificador da planilha: sha1 dos bytes do arquivo."""
+    return hashlib.sha1(conteudo).hexdigest()
+
+
+def _segurar(sessao, chave, agora):
+    anterior = _sessoes.get(sessao)
+    if anterior is None or anterior[0] != chave:
+        if anterior is not None and anterior[0] in _cache:
+            _cache[anterior[0]]['referencias'] -= 1
+        _cache[chave]['referencias'] += 1
+    _sessoes[sessao] = (chave, agora)
+    _cache.move_to_end(chave)
+
+
+def abrir_planilha(sessao, conteudo, ler):
+    """Abas da planilha `conteudo` (bytes) para a sessão: (chave, dict nome -> cópia rasa do DataFrame).
+
+    ler: função que recebe os bytes e devolve o dict de DataFrames; só é
+    chamada se a planilha não estiver no cache. Exceções de `ler` são
+    repassadas e nada fica em cache.
+    """
+    chave = hash_conteudo(conteudo)
+    while True:
+        with _trava:
+            agora = time.monotonic()
+            _expirar_sessoes(agora)
+            if chave in _cache:
+                _segurar(sessao, chave, agora)
+                abas = _cache[chave]['abas']
+                break
+            # Outra sessão já está lendo a mesma planilha: espera por ela
+            evento = _carregando.get(chave)
+            if evento is None:
+                evento = _carregando[chave] = threading.Event()
+                leitor = True
+            else:
+                leitor = False
+        if not leitor:
+            evento.wait()
+            continue
+        try:
+            abas = ler(conteudo)
+            bytes_abas = tamanho(abas)
+            with _trava:
+                _cache[chave] = {'abas': abas, 'derivados': {}, 'referencias': 0, 'bytes': bytes_abas}
+                _segurar(sessao, chave, time.monotonic())
+                _liberar_memoria()
+        finally:
+            with _trava:
+                _carregando.pop(chave, None)
+            evento.set()
+        break
+    return chave, {nome: df.copy(deep=False) for nome, df in abas.items()}
+
+
+def derivado(chave, nome, calcular):
+    """Resultado `nome` derivado da planilha `chave`, calculado uma vez por `calcular()`.
+
+    O resultado deve depender só da planilha. Se a planilha tiver saído do
+    cache, calcula sem guardar.
+    """
+    with _trava:
+        entrada = _cache.get(chave)
+        if entrada is not None and nome in entrada['derivados']:
+            return entrada['derivados'][nome]
+    valor = calcular()
+    bytes_valor = tamanho(valor)
+    with _trava:
+        entrada = _cache.get(chave)
+        if entrada is not None and nome not in entrada['derivados']:
+            entrada['derivados'][nome] = valor
+            entrada['bytes'] += bytes_valor
+            _liberar_memoria()
+    return valor
+
+
+def liberar_sessao(sessao):
+    """Solta a planilha segurada pela sessão (ela continua no cache até precisar sair)."""
+    with _trava:
+        anterior = _sessoes.pop(sessao, None)
+        if anterior is not None and anterior[0] in _cache:
+            _cache[anterior[0]]['referencias'] -= 1
+            _liberar_memoria()
+
+
+def estatisticas():
+    """Resumo do cache: planilhas, sessões, bytes estimados e limite."""
+    with _trava:
+        return {
+            'planilhas': len(_cache),
+            'sessoes': len(_sessoes),
+            'bytes': sum(entrada['bytes'] for entrada in _cache.values()),
+            'limite': LIMITE_BYTES,
+        }
@@ -0,0 +1,120 @@
+"""
+Matriz de demanda por dia da semana e hora.
+
+A planilha traz a demanda em dois agregados separados: média de pacientes por
+dia da semana e média por hora do dia. A matriz 7 x 24 é reconstruída por
+ajuste proporcional iterativo (IPF / raking): parte de uma semente (uniforme,
+ou a contagem de chegadas quando há registros individuais) e alterna o ajuste
+de linhas e colunas até reproduzir as duas margens.
+
+A matriz é montada uma vez por planilha e reaproveitada por todos os cálculos
+de filas e escalas, que passam a recortar janelas de horário sobre ela em vez
+de refiltrar as tabelas em cada aba.
+"""
+
+import numpy as np
+
+HORAS_DIA = 24
+DIAS_SEMANA = 7
+JANELA_DIURNA = (7, 18)
+# Folga relativa ao erro do float32 (cerca de 6e-8) no arredondamento para cima
+TOLERANCIA_FLOAT32 = 8 * float(np.finfo(np.float32).eps)
+
+
+# =====================================
+# Construção da matriz
+# =====================================
+
+def contar_chegadas(instantes):
+    """Média de chegadas por dia da semana (segunda = 0) e hora a partir de registros individuais.
+
+    instantes: datas/horas de chegada de cada paciente. Cada célula é dividida
+    pelo número de vezes que aquele dia da semana ocorre no período coberto.
+    """
+    instantes = np.asarray(instantes, dtype='datetime64[h]')
+    matriz = np.zeros((DIAS_SEMANA, HORAS_DIA), dtype=np.float64)
+    if instantes.size == 0:
+        return matriz.astype(np.float32)
+
+    dias = instantes.astype('datetime64[D]')
+    # 1970-01-01 foi uma quinta-feira
+    dia_semana = (dias.astype(np.int64) + 3) % DIAS_SEMANA
+    hora = (instantes - dias).astype(np.int64)
+    np.add.at(matriz, (dia_semana, hora), 1)
+
+    calendario = np.arange(dias.min(), dias.max() + np.timedelta64(1, 'D'))
+    ocorrencias = np.bincount((calendario.astype(np.int64) + 3) % DIAS_SEMANA, minlength=DIAS_SEMANA)
+    return (matriz / np.maximum(ocorrencias, 1)[:, None]).astype(np.float32)
+
+
+def matriz_semana_hora(perfil_semana, perfil_hora, semente=None, max_iteracoes=100, tolerancia=1e-9):
+    """Matriz (dias x 24) de pacientes por dia da semana e hora, por IPF.
+
+    perfil_semana: média de pacientes por dia da semana, na ordem das linhas.
+    perfil_hora: média de pacientes por hora do dia (média entre os dias).
+    semente: matriz inicial (ex.: `contar_chegadas`); uniforme se omitida, o
+    que equivale a supor independência entre dia e hora.
+
+    As duas margens raramente fecham no mesmo total. Prevalece a margem
+    horária, usada pelos cálculos de filas: a média das linhas reproduz
+    `perfil_hora` e os dias mantêm as proporções de `perfil_semana`.
+
+    Retorna um array float32.
+    """
+    perfil_semana = np.nan_to_num(np.asarray(perfil_semana, dtype=np.float64))
+    perfil_hora = np.nan_to_num(np.asarray(perfil_hora, dtype=np.float64))
+    n_dias = len(perfil_semana)
+
+    alvo_colunas = perfil_hora * n_dias
+    total = alvo_colunas.sum()
+    if perfil_semana.sum() > 0:
+        alvo_linhas = perfil_semana * total / perfil_semana.sum()
+    else:
+        alvo_linhas = np.full(n_dias, total / max(n_dias, 1))
+
+    if semente is None:
+        matriz = np.ones((n_dias, len(perfil_hora)))
+    else:
+        matriz = np.array(semente, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(max_iteracoes):
+            soma = matriz.sum(axis=1)
+            matriz *= np.where(soma > 0, alvo_linhas / soma, 0)[:, None]
+            soma = matriz.sum(axis=0)
+            matriz *= np.where(soma > 0, alvo_colunas / soma, 0)[None, :]
+            if np.abs(matriz.sum(axis=1) - alvo_linhas).max() <= tolerancia * max(total, 1):
+                break
+    return matriz.astype(np.float32)
+
+
+# =====================================
+# Consultas sobre a matriz
+# =====================================
+
+def perfil_horario(matriz, arredondar=False, sem_dado=None):
+    """Média de pacientes por hora (média entre os dias da semana).
+
+    arredondar: arredonda para cima. O float32 guarda cerca de 7 dígitos; o
+    erro relativo dele é descontado antes, para que valores inteiros da
+    planilha voltem exatos (8,0000005 não pode virar 9) sem perder frações
+    verdadeiras (8,0004 vira 9).
+    sem_dado: máscara das horas sem registro na planilha, que a matriz trata
+    como demanda nula; elas voltam como NaN e `media_janela` as ignora.
+    """
+    perfil = np.asarray(matriz).mean(axis=0, dtype=np.float64)
+    if arredondar:
+        perfil = np.ceil(perfil - np.abs(perfil) * TOLERANCIA_FLOAT32)
+    if sem_dado is not None:
+        perfil = np.where(sem_dado, np.nan, perfil)
+    return perfil
+
+
+def media_janela(valores_hora, inicio=JANELA_DIURNA[0], fim=JANELA_DIURNA[1]):
+    """Média dos valores horários entre `inicio` e `fim` (inclusive).
+
+    Aceita um vetor de 24 horas ou uma matriz com as horas no último eixo.
+    Horas sem dado (NaN) são ignoradas.
+    """
+    valores = np.asarray(valores_hora, dtype=np.float64)
+    return np.nanmean(valores[..., inicio:fim + 1], axis=-1)
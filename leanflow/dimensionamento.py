@@ -0,0 +1,132 @@
+"""
+Dimensionamento de equipes e leitos a partir da previsão de demanda.
+
+Encadeia a previsão mensal (cenários inferior, central e superior do
+intervalo) com a matriz de demanda por dia da semana e hora e com o motor de
+filas:
+
+    volume mensal -> λ por dia da semana e hora -> profissionais por hora
+    volume mensal -> fator sobre a demanda histórica -> leitos por setor
+
+Cada etapa é memorizada pelo conteúdo das suas entradas. Trocar o horizonte
+ou o mês exibido reaproveita o modelo já ajustado (cache da previsão) e só
+recalcula as etapas cujas entradas mudaram.
+"""
+
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from leanflow.filas import servidores_necessarios
+
+CENARIOS = ('inferior', 'previsao', 'superior')
+TAMANHO_CACHE = 128
+
+
+# =====================================
+# Memorização por conteúdo
+# =====================================
+
+def _chave(valor):
+    if isinstance(valor, np.ndarray):
+        return ('array', valor.shape, str(valor.dtype), hashlib.sha1(np.ascontiguousarray(valor).tobytes()).hexdigest())
+    if isinstance(valor, (list, tuple)):
+        return tuple(_chave(v) for v in valor)
+    return valor
+
+
+def _memorizar(funcao):
+    # Cache compartilhado pelas sessões do processo: consulta e inserção sob
+    # a trava; o cálculo fica fora dela
+    cache = OrderedDict()
+    trava = threading.Lock()
+
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        chave = (_chave(args), _chave(tuple(sorted(kwargs.items()))))
+        with trava:
+            resultado = cache.get(chave)
+            if resultado is not None:
+                cache.move_to_end(chave)
+                return resultado
+        resultado = funcao(*args, **kwargs)
+        # Resultados compartilhados entre chamadas não podem ser alterados
+        resultado.flags.writeable = False
+        with trava:
+            cache[chave] = resultado
+            while len(cache) > TAMANHO_CACHE:
+                cache.popitem(last=False)
+        return resultado
+
+    def limpar_cache():
+        with trava:
+            cache.clear()
+
+    envoltorio.limpar_cache = limpar_cache
+    return envoltorio
+
+
+# =====================================
+# Desagregação da demanda
+# =====================================
+
+@_memorizar
+def demanda_horaria(volumes_mes, dias_mes, matriz_semana_hora):
+    """Chegadas por hora (λ) para cada cenário, dia da semana e hora.
+
+    volumes_mes: volume mensal previsto por cenário (ex.: inferior, central,
+    superior).
+    matriz_semana_hora: volume médio por dia da semana e hora, dias x 24
+    (qualquer escala; ver `leanflow.demanda.matriz_semana_hora`).
+
+    Retorna um array (cenários x dias da semana x 24) em pacientes/hora.
+    """
+    volumes_mes = np.asarray(volumes_mes, dtype=float)
+    matriz = np.asarray(matriz_semana_hora, dtype=float)
+
+    # Pesos das células com dia médio igual a 1
+    dia_medio = matriz.sum(axis=1).mean()
+    pesos = matriz / dia_medio if dia_medio > 0 else np.full(matriz.shape, 1 / matriz.shape[1])
+    media_dia = volumes_mes / dias_mes
+    return media_dia[:, None, None] * pesos[None, :, :]
+
+
+# =====================================
+# Profissionais e leitos
+# =====================================
+
+@_memorizar
+def profissionais_por_hora(demanda, tempo_atendimento_min, tempo_espera_alvo_min=None, rho_maximo=0.85, limite=None):
+    """Profissionais necessários (M/M/c) em cada célula de `demanda` (pacientes/hora).
+
+    Todas as células (cenários x dias x horas) são resolvidas de uma vez.
+    `limite` é um teto físico opcional (ex.: salas ou consultórios).
+    """
+    mu = 60 / tempo_atendimento_min
+    alvo_h = None if tempo_espera_alvo_min is None else tempo_espera_alvo_min / 60
+    requisito = servidores_necessarios(np.asarray(demanda, dtype=float), mu, alvo_h, rho_maximo=rho_maximo)
+    if limite is not None:
+        requisito = np.minimum(requisito, int(limite))
+    return requisito
+
+
+@_memorizar
+def leitos_necessarios(demanda_dia, tmp_dias, fatores, nivel=0.95):
+    """Leitos por setor para cada fator de demanda.
+
+    O censo de um setor com chegadas de Poisson e permanência média TMP segue
+    Poisson(λ·TMP); o número de leitos é o quantil `nivel` desse censo, isto é,
+    a capacidade que comporta o censo em `nivel` dos dias.
+
+    Retorna um array (fatores x setores).
+    """
+    from scipy.stats import poisson
+
+    demanda_dia = np.nan_to_num(np.asarray(demanda_dia, dtype=float))
+    tmp_dias = np.nan_to_num(np.asarray(tmp_dias, dtype=float))
+    fatores = np.asarray(fatores, dtype=float)
+    censo_medio = fatores[:, None] * demanda_dia[None, :] * tmp_dias[None, :]
+    return np.where(censo_medio > 0, poisson.ppf(nivel, np.maximum(censo_medio, 1e-12)), 0).astype(int)
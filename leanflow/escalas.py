@@ -0,0 +1,138 @@
+"""
+Otimização de escalas de turnos (cobertura hora a hora).
+
+O dia é tratado como cíclico: um turno de 12h iniciado às 19h cobre das 19h
+às 6h do dia seguinte. O problema de cobertura é resolvido como MILP pelo
+solver HiGHS embarcado no SciPy; sem ele, usa-se uma heurística gulosa.
+"""
+
+import numpy as np
+
+from leanflow.filas import servidores_necessarios
+
+HORAS_DIA = 24
+
+
+def requisito_por_hora(demanda_hora, tempo_atendimento_min, tempo_espera_alvo_min=None,
+                       rho_maximo=0.85, limite=None):
+    """Profissionais necessários em cada hora para atender à demanda (M/M/c).
+
+    demanda_hora: pacientes/hora para as 24 horas do dia.
+    limite: teto físico (ex.: número de salas); horas cujo requisito ultrapassa
+    o teto ficam limitadas a ele.
+
+    Retorna (requisito, sem_meta), onde `sem_meta` indica as horas em que a
+    meta não é atingível dentro do limite.
+    """
+    demanda_hora = np.asarray(demanda_hora, dtype=float)
+    mu = 60 / tempo_atendimento_min
+    alvo_h = None if tempo_espera_alvo_min is None else tempo_espera_alvo_min / 60
+    requisito = servidores_necessarios(demanda_hora, mu, alvo_h, rho_maximo=rho_maximo)
+
+    sem_meta = np.zeros(requisito.shape, dtype=bool)
+    if limite is not None:
+        sem_meta = requisito > limite
+        requisito = np.minimum(requisito, int(limite))
+    return requisito, sem_meta
+
+
+def matriz_cobertura(duracoes):
+    """Matriz (24 x turnos) indicando quais horas cada turno cobre.
+
+    Os turnos são todas as combinações de hora de início (0-23) e duração.
+    Retorna (matriz, inicios, duracoes_turno).
+    """
+    inicios = np.tile(np.arange(HORAS_DIA), len(duracoes))
+    duracoes_turno = np.repeat(np.asarray(duracoes, dtype=int), HORAS_DIA)
+    horas = np.arange(HORAS_DIA)[:, None]
+    cobertura = ((horas - inicios[None, :]) % HORAS_DIA) < duracoes_turno[None, :]
+    return cobertura.astype(float), inicios, duracoes_turno
+
+
+def _resolver_milp(cobertura, custo, requisito, limite=np.inf):
+    from scipy.optimize import Bounds, LinearConstraint, milp
+
+    resultado = milp(
+        c=custo,
+        constraints=LinearConstraint(cobertura, lb=requisito, ub=limite),
+        integrality=np.ones(len(custo)),
+        bounds=Bounds(0, np.inf),
+        options={'time_limit': 10},
+    )
+    # status 2: nenhuma escala cabe no limite
+    if resultado.status == 2:
+        return None
+    if resultado.x is None:
+        raise RuntimeError(resultado.message)
+    return np.round(resultado.x).astype(int)
+
+
+def _resolver_guloso(cobertura, custo, requisito, limite=np.inf):
+    # Escolhe repetidamente o turno com maior déficit coberto por hora paga,
+    # entre os que não levam nenhuma hora acima do limite
+    quantidade = np.zeros(len(custo), dtype=int)
+    deficit = np.asarray(requisito, dtype=float).copy()
+    presentes = np.zeros(len(deficit))
+    while (deficit > 0).any():
+        cabe = ((presentes[:, None] + cobertura) <= limite).all(axis=0)
+        ganho = np.where(cabe, cobertura.T @ np.clip(deficit, 0, 1) / custo, 0.0)
+        if not ganho.max() > 0:
+            return None
+        j = int(np.argmax(ganho))
+        quantidade[j] += 1
+        deficit -= cobertura[:, j]
+        presentes += cobertura[:, j]
+    return quantidade
+
+
+def _resolver(cobertura, custo, requisito, limite):
+    # Quantidade de cada turno e método; quantidade None quando nada cabe no limite
+    try:
+        return _resolver_milp(cobertura, custo, requisito, limite), 'MILP'
+    except (ImportError, RuntimeError):
+        return _resolver_guloso(cobertura, custo, requisito, limite), 'Guloso'
+
+
+def otimizar_escala(requisito, duracoes=(6, 12), limite=None):
+    """Escolhe turnos (início e duração) que cobrem o requisito horário com
+    o menor total de horas-profissional.
+
+    limite: teto de profissionais presentes em cada hora (ex.: número de
+    salas). Turnos sobrepostos podem levar a cobertura acima do requisito;
+    com `limite`, ela não passa dele. Se nenhuma escala couber no limite, a
+    escala é resolvida sem ele e 'excede_limite' fica verdadeiro.
+
+    Retorna um dicionário com:
+        'turnos'        - lista de (hora_inicio, duracao, quantidade);
+        'cobertura'     - profissionais presentes em cada hora;
+        'horas'         - total de horas-profissional por dia;
+        'metodo'        - 'MILP' ou 'Guloso';
+        'excede_limite' - se a cobertura passa do limite em alguma hora.
+    """
+    requisito = np.asarray(requisito, dtype=float)
+    cobertura, inicios, duracoes_turno = matriz_cobertura(duracoes)
+    custo = duracoes_turno.astype(float)
+    teto = np.inf if limite is None else float(limite)
+
+    excede_limite = False
+    if not (requisito > 0).any():
+        quantidade = np.zeros(len(custo), dtype=int)
+        metodo = 'MILP'
+    else:
+        quantidade, metodo = _resolver(cobertura, custo, requisito, teto)
+        if quantidade is None:
+            quantidade, metodo = _resolver(cobertura, custo, requisito, np.inf)
+            excede_limite = True
+
+    turnos = [
+        (int(inicios[j]), int(duracoes_turno[j]), int(quantidade[j]))
+        for j in np.flatnonzero(quantidade)
+    ]
+    turnos.sort()
+    return {
+        'turnos': turnos,
+        'cobertura': (cobertura @ quantidade).astype(int),
+        'horas': int(custo @ quantidade),
+        'metodo': metodo,
+        'excede_limite': excede_limite,
+    }
@@ -0,0 +1,85 @@
+"""
+Cache de figuras Plotly.
+
+Cada figura é guardada serializada em JSON, identificada pelo hash da planilha,
+por um identificador da figura e pelos parâmetros de visualização. Uma figura
+que não mudou volta do cache sem recalcular traços nem layout. A figura é
+remontada a partir do JSON sem a validação do Plotly, que já foi feita quando
+ela foi construída. Cada chamada devolve um objeto novo, que pode receber
+anotações ou destaques sem alterar o que está no cache.
+
+O cache é um LRU do processo limitado pelo tamanho total dos JSONs
+(LIMITE_BYTES); as figuras menos usadas recentemente saem primeiro.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+LIMITE_BYTES = 64 * 1024 * 1024
+
+_cache = OrderedDict()
+_trava = threading.Lock()
+_bytes = 0
+
+
+# =====================================
+# Chave e armazenamento
+# =====================================
+
+def chave_figura(hash_dados, id_figura, parametros=()):
+    """Chave da figura: hash da planilha, identificador e parâmetros (valores simples, via repr)."""
+    h = hashlib.sha1(str(hash_dados).encode())
+    h.update(str(id_figura).encode())
+    h.update(repr(parametros).encode())
+    return h.hexdigest()
+
+
+def _guardar(chave, texto):
+    global _bytes
+    with _trava:
+        anterior = _cache.pop(chave, None)
+        if anterior is not None:
+            _bytes -= len(anterior)
+        _cache[chave] = texto
+        _bytes += len(texto)
+        while _bytes > LIMITE_BYTES and len(_cache) > 1:
+            _, removido = _cache.popitem(last=False)
+            _bytes -= len(removido)
+
+
+def limpar_cache():
+    """Esvazia o cache de figuras."""
+    global _bytes
+    with _trava:
+        _cache.clear()
+        _bytes = 0
+
+
+# =====================================
+# Consulta
+# =====================================
+
+def figura_em_cache(hash_dados, id_figura, construir, parametros=()):
+    """Figura do cache ou, na primeira vez, construída por `construir()`.
+
+    hash_dados: identifica o conjunto de dados (ex.: hash da planilha).
+    id_figura: nome da figura na página.
+    construir: função sem argumentos que devolve a go.Figure.
+    parametros: tudo o que a figura depende além dos dados (horizonte,
+    filtros, seleções), em valores simples.
+    """
+    chave = chave_figura(hash_dados, id_figura, parametros)
+    with _trava:
+        texto = _cache.get(chave)
+        if texto is not None:
+            _cache.move_to_end(chave)
+    if texto is not None:
+        return go.Figure(json.loads(texto), _validate=False)
+
+    figura = construir()
+    _guardar(chave, figura.to_json())
+    return figura
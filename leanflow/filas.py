@@ -0,0 +1,231 @@
+"""
+Motor de filas M/M/c e M/M/c/K vetorizado.
+
+Todas as funções aceitam escalares ou arrays NumPy (com broadcast) e devolvem
+arrays. Sistemas instáveis (ρ >= 1) ou sem servidores retornam infinito nas
+métricas de espera, seguindo a convenção já usada na página de Diagnóstico.
+"""
+
+import heapq
+
+import numpy as np
+
+
+# =====================================
+# Probabilidades de Erlang
+# =====================================
+
+def erlang_b(carga, c):
+    """Probabilidade de bloqueio de Erlang B para carga `a = λ/μ` e `c` servidores.
+
+    Usa a recorrência B(k) = a·B(k-1) / (k + a·B(k-1)), numericamente estável
+    mesmo para centenas de servidores (não há fatoriais nem potências).
+    """
+    carga = np.asarray(carga, dtype=float)
+    c = np.asarray(c)
+    carga, c = np.broadcast_arrays(carga, np.floor(c).astype(int))
+    b = np.ones(carga.shape, dtype=float)
+    c_max = int(c.max()) if c.size else 0
+    for k in range(1, c_max + 1):
+        b_k = carga * b / (k + carga * b)
+        b = np.where(k <= c, b_k, b)
+    return b
+
+
+def erlang_c(carga, c):
+    """Probabilidade de espera de Erlang C (P(W > 0)) para M/M/c.
+
+    Retorna 1 quando o sistema é instável (carga >= c).
+    """
+    carga = np.asarray(carga, dtype=float)
+    c = np.asarray(c)
+    carga, c = np.broadcast_arrays(carga, np.floor(c).astype(int))
+    b = erlang_b(carga, c)
+    estavel = (carga < c) & (c > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prob = c * b / (c - carga * (1 - b))
+    return np.where(estavel, prob, 1.0)
+
+
+# =====================================
+# Métricas M/M/c e M/M/c/K
+# =====================================
+
+def metricas_mmc(lambda_, mu, c):
+    """Métricas de regime estacionário de uma fila M/M/c.
+
+    Parâmetros na mesma unidade de tempo (ex.: pacientes/hora). Retorna um
+    dicionário com arrays: 'rho', 'p_espera', 'Lq', 'Wq', 'L' e 'W'. Wq e W
+    estão na unidade de tempo de `lambda_`/`mu`.
+    """
+    lambda_ = np.asarray(lambda_, dtype=float)
+    mu = np.asarray(mu, dtype=float)
+    c = np.asarray(c)
+    lambda_, mu, c = np.broadcast_arrays(lambda_, mu, np.floor(c).astype(int))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        carga = lambda_ / mu
+        rho = np.where(c > 0, carga / np.maximum(c, 1), np.inf)
+        estavel = (rho < 1) & (c > 0)
+
+        p_espera = erlang_c(carga, c)
+        wq = np.where(estavel, p_espera / (c * mu - lambda_), np.inf)
+        wq = np.where(estavel & (lambda_ == 0), 0.0, wq)
+        lq = np.where(estavel, lambda_ * wq, np.inf)
+        w = wq + 1 / mu
+        l = lq + carga
+
+    return {
+        'rho': rho,
+        'p_espera': np.where(estavel, p_espera, 1.0),
+        'Lq': lq,
+        'Wq': wq,
+        'L': np.where(estavel, l, np.inf),
+        'W': np.where(estavel, w, np.inf),
+    }
+
+
+def metricas_mmck(lambda_, mu, c, K):
+    """Métricas de regime estacionário de uma fila M/M/c/K (capacidade finita).
+
+    K é o número máximo de clientes no sistema (c em atendimento + K - c em
+    espera); chegadas com o sistema cheio são bloqueadas. Sempre estável.
+    Retorna um dicionário com arrays: 'p_bloqueio', 'lambda_efetivo', 'rho'
+    (utilização dos servidores), 'p_espera', 'Lq', 'Wq', 'L' e 'W'.
+    """
+    lambda_ = np.asarray(lambda_, dtype=float)
+    mu = np.asarray(mu, dtype=float)
+    c = np.asarray(c)
+    K = np.asarray(K)
+    lambda_, mu, c, K = np.broadcast_arrays(lambda_, mu, np.floor(c).astype(int), np.floor(K).astype(int))
+    K = np.maximum(K, c)
+
+    # log p_n acumulado pelas razões p_n / p_(n-1) = λ / (μ·min(n, c)), em escala log
+    k_max = int(K.max()) if K.size else 0
+    n = np.arange(k_max + 1).reshape((-1,) + (1,) * lambda_.ndim)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        razao_log = np.log(lambda_) - np.log(mu * np.minimum(np.maximum(n, 1), np.maximum(c, 1)))
+    razao_log = np.where(n == 0, 0.0, razao_log)
+    log_p = np.cumsum(razao_log, axis=0)
+    log_p = np.where(n <= K, log_p, -np.inf)
+    log_p = log_p - np.max(log_p, axis=0)
+    p = np.exp(log_p)
+    p = p / p.sum(axis=0)
+
+    p_bloqueio = np.take_along_axis(p, K[None], axis=0)[0]
+    lambda_efetivo = lambda_ * (1 - p_bloqueio)
+    l = (n * p).sum(axis=0)
+    lq = (np.maximum(n - c, 0) * p).sum(axis=0)
+    p_espera = np.where(n >= c, p, 0.0).sum(axis=0) - p_bloqueio
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.where(lambda_efetivo > 0, l / lambda_efetivo, 1 / mu)
+        wq = np.where(lambda_efetivo > 0, lq / lambda_efetivo, 0.0)
+        rho = np.where(c > 0, lambda_efetivo / (np.maximum(c, 1) * mu), np.inf)
+
+    return {
+        'p_bloqueio': p_bloqueio,
+        'lambda_efetivo': lambda_efetivo,
+        'rho': rho,
+        'p_espera': np.clip(p_espera, 0.0, 1.0),
+        'Lq': lq,
+        'Wq': wq,
+        'L': l,
+        'W': w,
+    }
+
+
+def servidores_necessarios(lambda_, mu, tempo_espera_alvo=None, rho_maximo=1.0, c_maximo=500):
+    """Menor número de servidores que atende às metas de serviço.
+
+    A meta é atendida quando ρ < `rho_maximo` e, se informado, quando Wq é
+    menor ou igual a `tempo_espera_alvo` (na unidade de tempo de `mu`).
+    Demanda nula requer zero servidores. Retorna `c_maximo + 1` onde a meta
+    não é alcançável com até `c_maximo` servidores.
+    """
+    lambda_ = np.asarray(lambda_, dtype=float)
+    mu = np.asarray(mu, dtype=float)
+    lambda_, mu = np.broadcast_arrays(lambda_, mu)
+
+    resultado = np.full(lambda_.shape, c_maximo + 1, dtype=int)
+    resultado = np.where(lambda_ <= 0, 0, resultado)
+    pendente = lambda_ > 0
+
+    # Começa na menor quantidade estável e sobe até cumprir a meta
+    c_inicial = max(1, int(np.floor(np.min(lambda_ / mu, initial=0))))
+    for c in range(c_inicial, c_maximo + 1):
+        if not pendente.any():
+            break
+        m = metricas_mmc(lambda_, mu, c)
+        ok = pendente & (m['rho'] < rho_maximo)
+        if tempo_espera_alvo is not None:
+            ok &= m['Wq'] <= tempo_espera_alvo
+        resultado = np.where(ok, c, resultado)
+        pendente &= ~ok
+
+    return resultado
+
+
+# =====================================
+# Otimização da alocação de servidores
+# =====================================
+
+def otimizar_alocacao(lambdas, mu, total_servidores, objetivo='total', minimo=1):
+    """Redistribui um total fixo de servidores entre filas M/M/c independentes.
+
+    Usa análise marginal: parte do menor número de servidores que torna cada
+    fila estável e adiciona um servidor por vez onde o ganho é maior. Como Wq
+    é convexa e decrescente em c, o procedimento guloso é exato.
+
+    objetivo:
+        'total'  - minimiza a espera total Σ λ_i·Wq_i (equivale a minimizar a
+                   espera média por paciente);
+        'maximo' - minimiza o maior Wq_i entre as filas.
+
+    Retorna um array de inteiros com a alocação proposta. Levanta ValueError
+    quando o total de servidores não é suficiente para estabilizar todas as
+    filas.
+    """
+    if objetivo not in ('total', 'maximo'):
+        raise ValueError("objetivo deve ser 'total' ou 'maximo'")
+
+    lambdas = np.asarray(lambdas, dtype=float)
+    mu = np.broadcast_to(np.asarray(mu, dtype=float), lambdas.shape)
+    total_servidores = int(total_servidores)
+
+    # Menor número de servidores que garante ρ < 1 em cada fila
+    carga = lambdas / mu
+    alocacao = np.maximum(np.floor(carga).astype(int) + 1, minimo)
+    alocacao = np.where(lambdas > 0, alocacao, minimo)
+
+    necessario = int(alocacao.sum())
+    if necessario > total_servidores:
+        raise ValueError(
+            f"São necessários pelo menos {necessario} servidores para estabilizar "
+            f"todas as filas, mas o total disponível é {total_servidores}."
+        )
+
+    def wq(i, c):
+        return float(metricas_mmc(lambdas[i], mu[i], c)['Wq'])
+
+    espera = np.array([wq(i, alocacao[i]) for i in range(len(lambdas))])
+
+    if objetivo == 'total':
+        # Heap de ganhos marginais (negativos para simular max-heap)
+        heap = []
+        for i in range(len(lambdas)):
+            ganho = lambdas[i] * (espera[i] - wq(i, alocacao[i] + 1))
+            heap.append((-ganho, i))
+        heapq.heapify(heap)
+        for _ in range(total_servidores - necessario):
+            _, i = heapq.heappop(heap)
+            alocacao[i] += 1
+            espera[i] = wq(i, alocacao[i])
+            ganho = lambdas[i] * (espera[i] - wq(i, alocacao[i] + 1))
+            heapq.heappush(heap, (-ganho, i))
+    else:
+        for _ in range(total_servidores - necessario):
+            i = int(np.argmax(espera))
+            alocacao[i] += 1
+            espera[i] = wq(i, alocacao[i])
+
+    return alocacao
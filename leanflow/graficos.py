@@ -0,0 +1,132 @@
+"""
+Traços Plotly para séries grandes.
+
+Abaixo de LIMIAR_PONTOS (LIMIAR_HISTOGRAMA nos histogramas) as funções
+devolvem o mesmo traço que a página montaria com os dados brutos. Acima do
+limiar, a redução é feita no servidor e o navegador recebe poucos pontos:
+
+    linhas      - LTTB (Largest-Triangle-Three-Buckets) reduz a série a
+                  PONTOS_LINHA pontos preservando picos e vales, desenhados
+                  em WebGL (Scattergl);
+    histogramas - contagens por classe calculadas com numpy (go.Bar);
+    box plots   - quartis, cercas de Tukey (1,5·IQR) e média pré-calculados
+                  (go.Box com q1/median/q3), sem as observações.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+LIMIAR_PONTOS = 5000
+PONTOS_LINHA = 1000
+# Um histograma só precisa das contagens: a partir de poucos milhares de
+# valores, as observações brutas dominam o JSON da figura
+LIMIAR_HISTOGRAMA = 1000
+CLASSES_HISTOGRAMA = 50
+
+
+# =====================================
+# LTTB
+# =====================================
+
+def _eixo_numerico(x):
+    # Datas viram inteiros (ns); rótulos de texto usam a posição
+    x = pd.Series(x) if not isinstance(x, pd.Series) else x
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.astype('int64').to_numpy(dtype=float)
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype=float)
+    return np.arange(len(x), dtype=float)
+
+
+def lttb(x, y, pontos=PONTOS_LINHA):
+    """Índices dos pontos mantidos pelo Largest-Triangle-Three-Buckets.
+
+    O primeiro e o último ponto são sempre mantidos; os demais são divididos
+    em `pontos` - 2 grupos e, de cada grupo, fica o ponto que forma o maior
+    triângulo com o ponto escolhido no grupo anterior e a média do grupo
+    seguinte.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if pontos >= n or pontos < 3:
+        return np.arange(n)
+    x = _eixo_numerico(x)
+
+    limites = np.linspace(1, n - 1, pontos - 1).astype(int)
+    indices = np.empty(pontos, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        proximo_fim = limites[i + 2] if i + 2 < len(limites) else n
+        x_medio, y_medio = x[fim:proximo_fim].mean(), np.nanmean(y[fim:proximo_fim])
+        area = np.abs(
+            (x[anterior] - x_medio) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (y_medio - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        indices[i + 1] = anterior
+    return indices
+
+
+def reduzir_grupos(df, x, y, grupo=None, limiar=LIMIAR_PONTOS, pontos=PONTOS_LINHA):
+    """Linhas de `df` mantidas pelo LTTB em cada grupo (para px.line).
+
+    Devolve o próprio `df` quando ele tem até `limiar` linhas.
+    """
+    if len(df) <= limiar:
+        return df
+    grupos = df.groupby(grupo, sort=False) if grupo else [(None, df)]
+    partes = [parte.iloc[lttb(parte[x], parte[y], pontos)] for _, parte in grupos]
+    return pd.concat(partes)
+
+
+# =====================================
+# Traços
+# =====================================
+
+def linha(x, y, limiar=LIMIAR_PONTOS, pontos=PONTOS_LINHA, **kwargs):
+    """go.Scatter da série; acima de `limiar` pontos, reduzida por LTTB e em WebGL."""
+    if len(y) <= limiar:
+        return go.Scatter(x=x, y=y, **kwargs)
+    indices = lttb(x, y, pontos)
+    return go.Scattergl(x=np.asarray(x)[indices], y=np.asarray(y)[indices], **kwargs)
+
+
+def histograma(valores, limiar=LIMIAR_HISTOGRAMA, classes=CLASSES_HISTOGRAMA, **kwargs):
+    """go.Histogram dos valores; acima de `limiar`, barras com as contagens já calculadas."""
+    valores = np.asarray(valores, dtype=float)
+    if len(valores) <= limiar:
+        return go.Histogram(x=valores, **kwargs)
+    valores = valores[np.isfinite(valores)]
+    contagens, bordas = np.histogram(valores, bins=classes)
+    return go.Bar(x=(bordas[:-1] + bordas[1:]) / 2, y=contagens, width=np.diff(bordas), **kwargs)
+
+
+def _estatisticas_caixa(valores):
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[np.isfinite(valores)]
+    q1, mediana, q3 = np.percentile(valores, [25, 50, 75])
+    iqr = q3 - q1
+    # Cercas de Tukey: os extremos dos dados dentro de 1,5·IQR dos quartis
+    dentro = valores[(valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)]
+    return dict(q1=[q1], median=[mediana], q3=[q3], lowerfence=[dentro.min()], upperfence=[dentro.max()],
+                mean=[valores.mean()])
+
+
+def caixa(valores, name, limiar=LIMIAR_PONTOS, **kwargs):
+    """go.Box vertical dos valores; acima de `limiar`, com as estatísticas pré-calculadas."""
+    if len(valores) <= limiar:
+        return go.Box(y=valores, name=name, **kwargs)
+    return go.Box(x=[name], name=name, **_estatisticas_caixa(valores), **kwargs)
+
+
+def caixas_agrupadas(df, grupo, valor, cores, titulo=None):
+    """Box plots pré-calculados de `valor` por `grupo`, um traço e uma cor por grupo (como px.box com color=grupo)."""
+    fig = go.Figure([
+        go.Box(x=[nome], name=str(nome), marker_color=cores[i % len(cores)], **_estatisticas_caixa(parte[valor]))
+        for i, (nome, parte) in enumerate(df.groupby(grupo, sort=False))
+    ])
+    fig.update_layout(title=titulo, xaxis_title=grupo, yaxis_title=valor, legend_title_text=grupo)
+    return fig
@@ -0,0 +1,121 @@
+"""
+Intervalos de confiança para os indicadores por propagação de incerteza.
+
+A planilha traz médias (pacientes/dia, tempo médio, permanência média), não
+os registros individuais. Cada entrada de um indicador é declarada com a
+variabilidade que ela tem como estimativa:
+
+    contagem - média diária de eventos observada em `dias` dias; o total do
+               período é Poisson e a média é reamostrada como Poisson(m·d)/d;
+    media    - média de `n` observações individuais com coeficiente de
+               variação `cv` (1 para tempos exponenciais, como nas filas
+               M/M/c); reamostrada por uma gama com CV cv/√n;
+    amostra  - observações disponíveis (ex.: meses); bootstrap da média;
+    fixa     - valor sem incerteza (ex.: número de leitos).
+
+Todas as entradas são sorteadas de uma vez em arrays (N,) e a função dos
+indicadores é avaliada uma única vez sobre elas, de modo que 10 mil
+reamostras de todos os indicadores custam alguns milissegundos.
+"""
+
+import numpy as np
+
+N_REAMOSTRAS = 10_000
+
+
+# =====================================
+# Declaração das entradas
+# =====================================
+
+def contagem(valor, dias):
+    """Média diária de eventos contados em `dias` dias."""
+    return {'tipo': 'contagem', 'valor': float(valor), 'dias': float(dias)}
+
+
+def media(valor, n, cv=1.0):
+    """Média de `n` observações com coeficiente de variação individual `cv`."""
+    return {'tipo': 'media', 'valor': float(valor), 'n': float(n), 'cv': float(cv)}
+
+
+def amostra(valores):
+    """Observações individuais; a incerteza da média vem do bootstrap."""
+    valores = np.asarray(valores, dtype=float)
+    valores = valores[np.isfinite(valores)]
+    return {'tipo': 'amostra', 'valor': float(valores.mean()) if valores.size else np.nan, 'valores': valores}
+
+
+def fixa(valor):
+    """Valor tratado como exato."""
+    return {'tipo': 'fixa', 'valor': float(valor)}
+
+
+# =====================================
+# Reamostragem e propagação
+# =====================================
+
+def _sortear(entrada, rng, n):
+    tipo, valor = entrada['tipo'], entrada['valor']
+    if tipo == 'fixa' or not np.isfinite(valor):
+        return np.full(n, valor)
+    if tipo == 'contagem':
+        if valor <= 0 or entrada['dias'] <= 0:
+            return np.full(n, valor)
+        return rng.poisson(valor * entrada['dias'], n) / entrada['dias']
+    if tipo == 'media':
+        cv = entrada['cv'] / np.sqrt(max(entrada['n'], 1))
+        if valor <= 0 or cv <= 0:
+            return np.full(n, valor)
+        forma = 1 / cv ** 2
+        return rng.gamma(forma, valor / forma, n)
+    if tipo == 'amostra':
+        valores = entrada['valores']
+        if valores.size < 2:
+            return np.full(n, valor)
+        return valores[rng.integers(0, valores.size, (n, valores.size))].mean(axis=1)
+    raise ValueError(f"Tipo de entrada desconhecido: {tipo}.")
+
+
+def reamostrar(entradas, n=N_REAMOSTRAS, semente=0):
+    """Sorteia `n` valores de cada entrada declarada. Retorna {nome: array (n,)}."""
+    rng = np.random.default_rng(semente)
+    return {nome: _sortear(entrada, rng, n) for nome, entrada in entradas.items()}
+
+
+def propagar(calcular, entradas, n=N_REAMOSTRAS, nivel=0.95, semente=0):
+    """Intervalos dos indicadores calculados por `calcular` a partir das entradas.
+
+    calcular: função vetorizada que recebe as entradas como argumentos
+    nomeados (escalares ou arrays) e devolve {indicador: valor ou array}.
+    entradas: {nome: declaração} (ver `contagem`, `media`, `amostra`, `fixa`).
+
+    Retorna {indicador: {'valor', 'inferior', 'superior'}}, em que 'valor' é
+    o indicador calculado com os valores pontuais das entradas. Reamostras
+    instáveis (infinitas) entram nos quantis como valores extremos.
+    """
+    pontual = calcular(**{nome: entrada['valor'] for nome, entrada in entradas.items()})
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reamostrados = calcular(**reamostrar(entradas, n, semente))
+
+    alfa = (1 - nivel) / 2
+    intervalos = {}
+    for indicador, valor in pontual.items():
+        valores = np.broadcast_to(np.asarray(reamostrados[indicador], dtype=float), (n,))
+        valores = valores[~np.isnan(valores)]
+        if valores.size:
+            inferior, superior = np.quantile(valores, [alfa, 1 - alfa], method='inverted_cdf')
+        else:
+            inferior = superior = np.nan
+        intervalos[indicador] = {'valor': float(valor), 'inferior': float(inferior), 'superior': float(superior)}
+    return intervalos
+
+
+def faixa(intervalo, formato='{:.2f}'):
+    """Limites do intervalo como texto, ex.: '3.27 a 3.48'."""
+    def formatar(valor):
+        return 'infinito' if np.isinf(valor) else formato.format(valor)
+    return f"{formatar(intervalo['inferior'])} a {formatar(intervalo['superior'])}"
+
+
+def texto_intervalo(intervalo, formato='{:.2f}', nivel=0.95):
+    """Texto curto do intervalo (ex.: para o `help` de um st.metric)."""
+    return f"Intervalo de {nivel:.0%}: {faixa(intervalo, formato)}"
@@ -0,0 +1,71 @@
+"""
+Pré-carregamento das bibliotecas pesadas em segundo plano.
+
+A página de diagnóstico só importa pandas, Plotly, SciPy e statsmodels depois
+do upload da planilha, para que a tela inicial abra rápido em um processo
+novo. `preaquecer` importa essas bibliotecas em uma thread daemon enquanto o
+usuário escolhe o arquivo; quando a página precisar delas, já estarão em
+`sys.modules` (ou a importação em andamento é aguardada pelo próprio Python).
+
+A thread é iniciada uma única vez por processo.
+"""
+
+import importlib
+import threading
+
+MODULOS = (
+    'numpy',
+    'pandas',
+    'openpyxl',
+    'plotly.express',
+    'plotly.graph_objects',
+    'graphviz',
+    'scipy.special',
+    'scipy.stats',
+    'scipy.optimize',
+    'statsmodels.tsa.holtwinters',
+    'statsmodels.tsa.seasonal',
+    'leanflow.filas',
+    'leanflow.escalas',
+    'leanflow.agenda_cirurgica',
+    'leanflow.simulacao_cirurgica',
+    'leanflow.simulacao_leitos',
+    'leanflow.previsao',
+    'leanflow.backtest',
+    'leanflow.dimensionamento',
+    'leanflow.demanda',
+    'leanflow.tendencia',
+    'leanflow.incerteza',
+    'leanflow.anomalias',
+    'leanflow.figuras',
+    'leanflow.vsm',
+    'leanflow.graficos',
+    'leanflow.tema',
+)
+
+# Desligado por ferramentas que medem as importações da própria página
+ATIVO = True
+
+_thread = None
+_trava = threading.Lock()
+
+
+def _importar(modulos):
+    for nome in modulos:
+        try:
+            importlib.import_module(nome)
+        except ImportError:
+            # Dependência opcional ausente: a página falha (ou não usa) no ponto de uso
+            pass
+
+
+def preaquecer(modulos=MODULOS):
+    """Inicia (uma vez) a importação de `modulos` em segundo plano. Retorna a thread ou None."""
+    global _thread
+    if not ATIVO:
+        return None
+    with _trava:
+        if _thread is None:
+            _thread = threading.Thread(target=_importar, args=(modulos,), name='preaquecimento', daemon=True)
+            _thread.start()
+    return _thread
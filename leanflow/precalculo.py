@@ -0,0 +1,129 @@
+"""
+Pré-cálculo em segundo plano após o upload da planilha.
+
+Enquanto o usuário lê a primeira seção, um pequeno grupo de threads de
+trabalho executa as previsões e simulações das demais seções, em ordem de
+prioridade (as seções mais consultadas primeiro). As tarefas chamam as
+próprias funções com cache do leanflow (`prever`, `prever_lote`,
+`simular_censo`...), de modo que o resultado fica no cache do processo,
+identificado pelo hash dos dados, e a seção o encontra pronto ao ser aberta.
+Tabelas de filas e figuras custam milissegundos e são montadas (e guardadas
+nos seus caches) quando a seção é aberta; o pré-cálculo cobre só o que leva
+segundos.
+
+As sessões são atendidas em rodízio: cada thread livre pega a próxima tarefa
+da sessão seguinte, de modo que o lote de quem fez o upload por último não
+espera os lotes inteiros das outras sessões.
+
+Cada sessão tem no máximo um lote ativo, identificado pelo conjunto de dados
+(ex.: hash da planilha). Um novo upload na mesma sessão cancela as tarefas
+ainda não iniciadas do lote anterior.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+TRABALHADORES = 2
+
+_filas = OrderedDict()
+_lotes = {}
+_trava = threading.Lock()
+_tarefas_disponiveis = threading.Condition(_trava)
+_threads = []
+
+
+# =====================================
+# Execução
+# =====================================
+
+def _executar(cancelado, funcao):
+    if cancelado.is_set():
+        return None
+    try:
+        return funcao()
+    except Exception:
+        # A seção refaz o cálculo ao ser aberta e exibe o erro no lugar certo
+        return None
+
+
+def _proxima_tarefa():
+    # Chamada com a trava: a sessão atendida vai para o fim do rodízio
+    while not _filas:
+        _tarefas_disponiveis.wait()
+    sessao, fila = next(iter(_filas.items()))
+    tarefa = fila.popleft()
+    if fila:
+        _filas.move_to_end(sessao)
+    else:
+        del _filas[sessao]
+    return tarefa
+
+
+def _trabalhar():
+    while True:
+        with _trava:
+            futuro, cancelado, funcao = _proxima_tarefa()
+        if futuro.set_running_or_notify_cancel():
+            futuro.set_result(_executar(cancelado, funcao))
+
+
+def _iniciar_threads():
+    # Chamada com a trava
+    while len(_threads) < TRABALHADORES:
+        thread = threading.Thread(target=_trabalhar, name=f'precalculo-{len(_threads)}', daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def cancelar_precalculo(sessao):
+    """Cancela as tarefas ainda não iniciadas do lote da sessão."""
+    with _trava:
+        lote = _lotes.pop(sessao, None)
+        _filas.pop(sessao, None)
+    if lote is not None:
+        lote['cancelado'].set()
+        for futuro in lote['futuros']:
+            futuro.cancel()
+
+
+def agendar_precalculo(sessao, id_lote, tarefas):
+    """Agenda o pré-cálculo de um conjunto de dados para a sessão.
+
+    tarefas: lista de (nome, funcao) em ordem de prioridade; `funcao` não
+    recebe argumentos. Agendar de novo o lote atual da sessão não faz nada;
+    um `id_lote` diferente cancela o lote anterior.
+    """
+    with _trava:
+        lote = _lotes.get(sessao)
+        if lote is not None and lote['id'] == id_lote:
+            return
+    cancelar_precalculo(sessao)
+
+    cancelado = threading.Event()
+    futuros = [Future() for _ in tarefas]
+    with _trava:
+        _lotes[sessao] = {
+            'id': id_lote,
+            'nomes': [nome for nome, _ in tarefas],
+            'futuros': futuros,
+            'cancelado': cancelado,
+        }
+        if tarefas:
+            _filas[sessao] = deque((futuro, cancelado, funcao) for futuro, (_, funcao) in zip(futuros, tarefas))
+            _iniciar_threads()
+            _tarefas_disponiveis.notify_all()
+        # Sessões encerradas deixam lotes concluídos para trás
+        for outra in [s for s, l in _lotes.items() if s != sessao and all(f.done() for f in l['futuros'])]:
+            del _lotes[outra]
+
+
+def progresso_precalculo(sessao):
+    """(concluídas, total, nome da próxima tarefa ou None) do lote da sessão, ou None."""
+    with _trava:
+        lote = _lotes.get(sessao)
+    if lote is None:
+        return None
+    feitas = [futuro.done() for futuro in lote['futuros']]
+    proxima = next((nome for nome, feita in zip(lote['nomes'], feitas) if not feita), None)
+    return sum(feitas), len(feitas), proxima
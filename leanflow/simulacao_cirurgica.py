@@ -0,0 +1,101 @@
+"""
+Simulação Monte Carlo de dias cirúrgicos.
+
+Cada replicação é um dia completo do centro cirúrgico. As replicações,
+salas e cirurgias são simuladas ao mesmo tempo como arrays NumPy de forma
+(replicações, salas, cirurgias), sem laço Python por cirurgia.
+
+Em cada sala-dia:
+    - a primeira cirurgia atrasa (atraso exponencial com a média informada);
+    - cada eletiva pode ser cancelada com a probabilidade informada;
+    - urgências (Poisson por dia) são inseridas em posições aleatórias;
+    - eletivas que começariam após o fim da janela não são realizadas.
+"""
+
+import numpy as np
+
+
+def _duracoes_lognormais(rng, media, cv, forma):
+    sigma2 = np.log(1 + cv ** 2)
+    mu = np.log(media) - sigma2 / 2
+    return rng.lognormal(mu, np.sqrt(sigma2), forma)
+
+
+def simular_dias_cirurgicos(n_replicacoes, n_salas, casos_por_sala, duracao_media, janela_min,
+                            setup_min=0.0, turnover_min=0.0, atraso_medio_min=0.0,
+                            prob_cancelamento=0.0, urgencias_dia=0.0, duracao_urgencia_media=None,
+                            cv=0.4, semente=0):
+    """Simula `n_replicacoes` dias de `n_salas` salas.
+
+    Retorna um dicionário de arrays de forma (n_replicacoes, n_salas):
+        'hora_extra'          - minutos além da janela;
+        'ociosidade'          - minutos da janela sem cirurgia, setup ou turnover;
+        'realizadas'          - cirurgias realizadas (eletivas + urgências);
+        'eletivas_realizadas' - eletivas realizadas;
+        'canceladas'          - eletivas canceladas antes do início;
+        'sem_horario'         - eletivas não realizadas por falta de horário;
+        'urgencias'           - urgências inseridas;
+        'atraso'              - atraso da primeira cirurgia (min).
+    """
+    rng = np.random.default_rng(semente)
+    R, S, K = int(n_replicacoes), int(n_salas), int(casos_por_sala)
+    if duracao_urgencia_media is None:
+        duracao_urgencia_media = duracao_media
+
+    # Eletivas planejadas e cancelamentos
+    duracao_eletivas = _duracoes_lognormais(rng, duracao_media, cv, (R, S, K))
+    canceladas = rng.random((R, S, K)) < prob_cancelamento
+
+    # Urgências distribuídas uniformemente entre as salas
+    total_urgencias = rng.poisson(urgencias_dia, R)
+    urgencias = rng.multinomial(total_urgencias, np.full(S, 1 / S))
+    U = int(urgencias.max()) if urgencias.size else 0
+    duracao_urgencias = _duracoes_lognormais(rng, duracao_urgencia_media, cv, (R, S, U))
+    urgencia_valida = np.arange(U) < urgencias[..., None]
+
+    # Sequência do dia: eletivas na ordem planejada e urgências em posições aleatórias
+    duracao = np.concatenate([duracao_eletivas, duracao_urgencias], axis=2)
+    eh_urgencia = np.concatenate([np.zeros((R, S, K), bool), np.ones((R, S, U), bool)], axis=2)
+    valido = np.concatenate([~canceladas, urgencia_valida], axis=2)
+    posicao = np.concatenate([
+        np.broadcast_to(np.arange(K, dtype=float), (R, S, K)),
+        rng.uniform(0, K, (R, S, U)),
+    ], axis=2)
+    posicao = np.where(valido, posicao, np.inf)
+    ordem = np.argsort(posicao, axis=2, kind='stable')
+    duracao = np.take_along_axis(duracao, ordem, axis=2)
+    eh_urgencia = np.take_along_axis(eh_urgencia, ordem, axis=2)
+    valido = np.take_along_axis(valido, ordem, axis=2)
+
+    atraso = rng.exponential(atraso_medio_min, (R, S)) if atraso_medio_min > 0 else np.zeros((R, S))
+    tem_caso = valido.any(axis=2)
+    inicio_dia = np.where(tem_caso, atraso + setup_min, 0.0)
+
+    def inicios(realizado):
+        bloco = np.where(realizado, duracao + turnover_min, 0.0)
+        return inicio_dia[..., None] + np.cumsum(bloco, axis=2) - bloco
+
+    # 1ª passada: eletivas que começariam após a janela não são realizadas;
+    # 2ª passada: recalcula os horários sem elas (urgências sempre são feitas)
+    sem_horario = valido & ~eh_urgencia & (inicios(valido) >= janela_min)
+    realizado = valido & ~sem_horario
+    fim_casos = inicios(realizado) + duracao
+    n_realizados = realizado.sum(axis=2)
+    fim = np.where(n_realizados > 0, np.max(np.where(realizado, fim_casos, 0.0), axis=2), 0.0)
+
+    ocupado = np.where(realizado, duracao, 0.0).sum(axis=2) \
+        + np.maximum(n_realizados - 1, 0) * turnover_min \
+        + np.where(n_realizados > 0, setup_min, 0.0)
+    hora_extra = np.maximum(fim - janela_min, 0.0)
+    ociosidade = np.maximum(janela_min - (ocupado - hora_extra), 0.0)
+
+    return {
+        'hora_extra': hora_extra,
+        'ociosidade': ociosidade,
+        'realizadas': n_realizados,
+        'eletivas_realizadas': (realizado & ~eh_urgencia).sum(axis=2),
+        'canceladas': canceladas.sum(axis=2),
+        'sem_horario': sem_horario.sum(axis=2),
+        'urgencias': urgencias,
+        'atraso': np.where(tem_caso, atraso, 0.0),
+    }
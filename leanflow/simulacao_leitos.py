@@ -0,0 +1,96 @@
+"""
+Simulação Monte Carlo do censo diário de leitos por setor.
+
+Cada dia chegam Poisson(λ) pacientes e cada paciente internado recebe alta
+com probabilidade 1/TMP (permanência geométrica com média igual ao TMP
+informado), o que mantém o censo médio em λ·TMP. O censo não é limitado pela
+quantidade de leitos: pacientes acima da capacidade representam transbordo
+(macas extras, remanejamento ou espera).
+
+As replicações e os setores avançam juntos em arrays (replicações x setores);
+o único laço Python é sobre os dias. As simulações mais recentes ficam em um
+cache LRU do processo, identificadas pelas entradas e pela semente.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+TAMANHO_CACHE = 4
+
+_cache = OrderedDict()
+_trava = threading.Lock()
+
+
+def _chave(demanda_dia, tmp_dias, dias, replicacoes, semente):
+    h = hashlib.sha1(np.ascontiguousarray(demanda_dia).tobytes())
+    h.update(np.ascontiguousarray(tmp_dias).tobytes())
+    h.update(repr((int(dias), int(replicacoes), semente)).encode())
+    return h.hexdigest()
+
+
+def simular_censo(demanda_dia, tmp_dias, dias=365, replicacoes=1000, semente=0):
+    """Simula o censo diário de cada setor.
+
+    demanda_dia: média de admissões por dia em cada setor.
+    tmp_dias: tempo médio de permanência (dias) em cada setor.
+
+    O censo inicial é sorteado da distribuição estacionária Poisson(λ·TMP),
+    dispensando período de aquecimento. Retorna um array de inteiros de forma
+    (replicacoes, dias, setores), somente leitura por ser compartilhado pelo
+    cache.
+    """
+    demanda_dia = np.nan_to_num(np.asarray(demanda_dia, dtype=float))
+    tmp_dias = np.asarray(tmp_dias, dtype=float)
+    chave = _chave(demanda_dia, tmp_dias, dias, replicacoes, semente)
+    with _trava:
+        censo = _cache.get(chave)
+        if censo is not None:
+            _cache.move_to_end(chave)
+            return censo
+
+    rng = np.random.default_rng(semente)
+    R, T, S = int(replicacoes), int(dias), len(demanda_dia)
+
+    with np.errstate(divide='ignore'):
+        p_alta = np.where(tmp_dias > 1, 1 / tmp_dias, 1.0)
+    p_alta = np.nan_to_num(p_alta, nan=1.0)
+
+    censo = np.empty((R, T, S), dtype=np.int32)
+    atual = rng.poisson(demanda_dia / p_alta, (R, S))
+    for t in range(T):
+        atual = atual - rng.binomial(atual, p_alta) + rng.poisson(demanda_dia, (R, S))
+        censo[:, t] = atual
+    censo.flags.writeable = False
+
+    with _trava:
+        _cache[chave] = censo
+        while len(_cache) > TAMANHO_CACHE:
+            _cache.popitem(last=False)
+    return censo
+
+
+def resumir_censo(censo, leitos, percentis=(50, 90, 95)):
+    """Indicadores por setor a partir do censo simulado.
+
+    Retorna um dicionário com arrays por setor:
+        'percentis'          - dicionário {p: censo no percentil p};
+        'ocupacao_media'     - censo médio / leitos;
+        'prob_excesso'       - P(censo > leitos) em um dia qualquer;
+        'dias_excesso'       - média de dias com censo > leitos no horizonte;
+        'pacientes_excesso'  - média de pacientes acima da capacidade por dia.
+    """
+    leitos = np.asarray(leitos, dtype=float)
+    excesso = np.maximum(censo - leitos, 0)
+    acima = excesso > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ocupacao = censo.mean(axis=(0, 1)) / leitos
+    return {
+        'percentis': {p: v for p, v in zip(percentis, np.percentile(censo, percentis, axis=(0, 1)))},
+        'ocupacao_media': ocupacao,
+        'prob_excesso': acima.mean(axis=(0, 1)),
+        'dias_excesso': acima.sum(axis=1).mean(axis=0),
+        'pacientes_excesso': excesso.mean(axis=(0, 1)),
+    }
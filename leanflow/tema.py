@@ -0,0 +1,68 @@
+"""
+Template Plotly compartilhado da LeanFlow.
+
+Cada figura enviada ao navegador leva o template completo no próprio JSON.
+O 'plotly_white' tem cerca de 7 KB, quase todos com padrões de tipos de
+gráfico que a aplicação não usa (3D, polar, mapas, carpet...). O template
+'leanflow' é o 'plotly_white' reduzido aos tipos de traço e às partes do
+layout usados pelas páginas, com a mesma aparência nesses gráficos.
+
+`registrar_tema` registra o template em plotly.io (uma vez por processo); as
+figuras o usam pelo nome, com template=TEMA.
+"""
+
+import json
+import threading
+
+TEMA = 'leanflow'
+BASE = 'plotly_white'
+
+# Tipos de traço usados pelas páginas (go.* e px.*)
+TIPOS_TRACO = ('bar', 'box', 'funnel', 'heatmap', 'histogram', 'pie', 'scatter', 'scattergl', 'sunburst', 'treemap')
+# Partes do layout que só valem para gráficos 3D, polares, ternários e mapas
+LAYOUT_SEM_USO = ('scene', 'polar', 'ternary', 'geo', 'mapbox', 'map')
+
+_trava = threading.Lock()
+
+
+# =====================================
+# Template
+# =====================================
+
+def registrar_tema():
+    """Registra o template TEMA em plotly.io.templates, se ainda não estiver registrado."""
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    with _trava:
+        if TEMA in pio.templates:
+            return
+        base = pio.templates[BASE].to_plotly_json()
+        pio.templates[TEMA] = go.layout.Template(
+            data={tipo: tracos for tipo, tracos in base['data'].items() if tipo in TIPOS_TRACO},
+            layout={chave: valor for chave, valor in base['layout'].items() if chave not in LAYOUT_SEM_USO},
+        )
+
+
+# =====================================
+# Tamanho das figuras
+# =====================================
+
+def tamanho_figura(fig):
+    """Bytes do JSON da figura, como enviado pelo st.plotly_chart: total e por parte.
+
+    fig: figura Plotly ou o JSON já serializado. Devolve um dict com 'total',
+    'dados', 'layout' e 'template'.
+    """
+    import plotly.io as pio
+
+    texto = fig if isinstance(fig, str) else pio.to_json(fig, validate=False)
+    spec = json.loads(texto)
+    layout = spec.get('layout', {})
+    template = layout.pop('template', {})
+    return {
+        'total': len(texto.encode()),
+        'dados': len(json.dumps(spec.get('data', []), separators=(',', ':')).encode()),
+        'layout': len(json.dumps(layout, separators=(',', ':')).encode()),
+        'template': len(json.dumps(template, separators=(',', ':')).encode()),
+    }
@@ -0,0 +1,127 @@
+"""
+Linhas de tendência por fórmulas fechadas.
+
+Ajusta a reta y = a + b·x por mínimos quadrados ordinários (MQO) ou pelo
+estimador robusto de Theil–Sen (mediana das inclinações entre todos os pares
+de pontos) para muitas séries de uma vez, como operações de matriz sobre um
+eixo x comum. Substitui o statsmodels e o scikit-learn nas linhas de tendência
+da página; os modelos de previsão mais completos continuam em
+`leanflow.previsao`.
+
+Valores ausentes (NaN) em y são ignorados ponto a ponto.
+"""
+
+import numpy as np
+
+METODOS = ('mqo', 'theil-sen')
+
+
+# =====================================
+# Estimadores
+# =====================================
+
+def _mqo(x, y, validos, nivel):
+    from scipy.stats import t
+
+    n = validos.sum(axis=1)
+    x_medio = np.where(validos, x, 0).sum(axis=1) / n
+    y_medio = np.where(validos, y, 0).sum(axis=1) / n
+    dx = np.where(validos, x - x_medio[:, None], 0)
+    dy = np.where(validos, y - y_medio[:, None], 0)
+
+    sxx = (dx ** 2).sum(axis=1)
+    inclinacao = (dx * dy).sum(axis=1) / sxx
+    intercepto = y_medio - inclinacao * x_medio
+    residuos = np.where(validos, y - (intercepto[:, None] + inclinacao[:, None] * x), 0)
+
+    sqr = (residuos ** 2).sum(axis=1)
+    sqt = (dy ** 2).sum(axis=1)
+    r2 = np.where(sqt > 0, 1 - sqr / np.where(sqt > 0, sqt, 1), np.nan)
+    graus = n - 2
+    erro_padrao = np.sqrt(sqr / np.where(graus > 0, graus, np.nan) / sxx)
+    margem = t.ppf(0.5 + nivel / 2, np.where(graus > 0, graus, np.nan)) * erro_padrao
+    return inclinacao, intercepto, r2, np.stack([inclinacao - margem, inclinacao + margem], axis=-1)
+
+
+def _theil_sen(x, y, validos, nivel):
+    from scipy.stats import norm
+
+    i, j = np.triu_indices(x.shape[1], k=1)
+    dx = x[:, j] - x[:, i]
+    pares_validos = validos[:, i] & validos[:, j] & (dx != 0)
+    inclinacoes = np.where(pares_validos, (y[:, j] - y[:, i]) / np.where(dx != 0, dx, 1), np.nan)
+    inclinacoes.sort(axis=1)
+
+    inclinacao = np.nanmedian(inclinacoes, axis=1)
+    intercepto = np.nanmedian(np.where(validos, y - inclinacao[:, None] * x, np.nan), axis=1)
+
+    # Intervalo de Sen: postos das inclinações ordenadas a partir da variância
+    # da estatística de Kendall (sem correção para empates)
+    n = validos.sum(axis=1)
+    n_pares = pares_validos.sum(axis=1)
+    variancia = n * (n - 1) * (2 * n + 5) / 18
+    c = norm.ppf(0.5 + nivel / 2) * np.sqrt(variancia)
+    posto_inferior = np.clip(np.round((n_pares - c) / 2).astype(int) - 1, 0, np.maximum(n_pares - 1, 0))
+    posto_superior = np.clip(np.round((n_pares + c) / 2).astype(int), 0, np.maximum(n_pares - 1, 0))
+    linhas = np.arange(len(inclinacao))
+    ic = np.stack([inclinacoes[linhas, posto_inferior], inclinacoes[linhas, posto_superior]], axis=-1)
+    ic[n_pares == 0] = np.nan
+
+    ajustado = intercepto[:, None] + inclinacao[:, None] * x
+    sqr = np.nansum(np.where(validos, y - ajustado, np.nan) ** 2, axis=1)
+    y_medio = np.nanmean(np.where(validos, y, np.nan), axis=1)
+    sqt = np.nansum(np.where(validos, y - y_medio[:, None], np.nan) ** 2, axis=1)
+    r2 = np.where(sqt > 0, 1 - sqr / np.where(sqt > 0, sqt, 1), np.nan)
+    return inclinacao, intercepto, r2, ic
+
+
+# =====================================
+# Ajuste em lote
+# =====================================
+
+def ajustar_tendencia(y, x=None, metodo='mqo', nivel=0.95):
+    """Reta de tendência de uma ou várias séries.
+
+    y: vetor (n,) ou matriz (séries x n).
+    x: eixo comum (n,) ou um por série (séries x n); padrão 0, 1, ..., n-1.
+    metodo: 'mqo' (mínimos quadrados) ou 'theil-sen' (robusto a outliers).
+    nivel: confiança do intervalo da inclinação (t de Student no MQO,
+    intervalo de Sen no Theil–Sen).
+
+    Retorna um dicionário com 'inclinacao', 'intercepto', 'r2', 'ic_inclinacao'
+    (inferior, superior) e 'ajustado' (valores da reta em x). Para um vetor y,
+    os resultados são escalares e 'ajustado' tem o tamanho de y.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de tendência desconhecido: {metodo}. Use um de {METODOS}.")
+
+    y = np.asarray(y, dtype=float)
+    unica = y.ndim == 1
+    y = np.atleast_2d(y)
+    x = np.arange(y.shape[1], dtype=float) if x is None else np.asarray(x, dtype=float)
+    x = np.broadcast_to(x, y.shape)
+    validos = np.isfinite(y) & np.isfinite(x)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimador = _mqo if metodo == 'mqo' else _theil_sen
+        inclinacao, intercepto, r2, ic = estimador(x, y, validos, nivel)
+    ajustado = intercepto[:, None] + inclinacao[:, None] * x
+
+    resultado = {
+        'inclinacao': inclinacao,
+        'intercepto': intercepto,
+        'r2': r2,
+        'ic_inclinacao': ic,
+        'ajustado': ajustado,
+    }
+    if unica:
+        resultado = {chave: valor[0] for chave, valor in resultado.items()}
+    return resultado
+
+
+def projetar_tendencia(y, horizonte, metodo='mqo'):
+    """Prolonga a reta ajustada em 0..n-1 pelos `horizonte` períodos seguintes."""
+    y = np.asarray(y, dtype=float)
+    ajuste = ajustar_tendencia(y, metodo=metodo)
+    futuro = np.arange(y.shape[-1], y.shape[-1] + horizonte)
+    return np.asarray(ajuste['intercepto'])[..., None] + np.asarray(ajuste['inclinacao'])[..., None] * futuro
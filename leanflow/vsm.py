@@ -0,0 +1,96 @@
+"""
+Cores e renderização dos diagramas VSM (Graphviz).
+
+A escala de cores dos tempos de espera é uma interpolação linear entre duas
+cores, equivalente a `Normalize` + `LinearSegmentedColormap` (256 níveis) do
+matplotlib, sem depender dele.
+
+O SVG de cada diagrama é gerado pelo executável `dot` do Graphviz em uma
+thread de trabalho e guardado em um cache LRU do processo, identificado pelo
+hash do código DOT (que já contém etapas, tempos e cores). Enquanto o SVG não
+fica pronto, ou se o executável não estiver instalado, `svg_vsm` devolve None
+e quem chama exibe o diagrama pelo código DOT.
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+NIVEIS_COR = 256
+ESPERA_SVG = 0.5
+TAMANHO_CACHE = 64
+
+_cache = OrderedDict()
+_trava = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vsm')
+
+
+# =====================================
+# Escala de cores
+# =====================================
+
+def _rgb(cor):
+    cor = cor.lstrip('#')
+    return tuple(int(cor[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def cor_escala(valor, vmin, vmax, cores=("#FFCCCC", "#FF0000")):
+    """Cor hexadecimal de `valor` na escala linear de vmin (cores[0]) a vmax (cores[1]).
+
+    Valores fora do intervalo (inclusive infinitos) ficam na cor da ponta;
+    NaN resulta em '#000000'. Com vmin == vmax, todos os valores recebem
+    cores[0].
+    """
+    valor = float(valor)
+    if vmax == vmin:
+        posicao = 0.0
+    elif math.isnan(valor):
+        return '#000000'
+    else:
+        posicao = (valor - vmin) / (vmax - vmin)
+    # Mesmo arredondamento do matplotlib: o nível é truncado e 1.0 cai no último
+    if posicao >= 1:
+        nivel = NIVEIS_COR - 1
+    elif posicao < 0:
+        nivel = 0
+    else:
+        nivel = int(posicao * NIVEIS_COR)
+    fracao = nivel / (NIVEIS_COR - 1)
+    inicio, fim = _rgb(cores[0]), _rgb(cores[1])
+    return '#' + ''.join(f"{round((a + (b - a) * fracao) * 255):02x}" for a, b in zip(inicio, fim))
+
+
+# =====================================
+# Renderização em segundo plano
+# =====================================
+
+def _renderizar(fonte):
+    import graphviz
+
+    try:
+        return graphviz.Source(fonte).pipe(format='svg', encoding='utf-8')
+    except (graphviz.ExecutableNotFound, graphviz.CalledProcessError):
+        return None
+
+
+def svg_vsm(diagrama, espera=ESPERA_SVG):
+    """SVG do diagrama (gv.Digraph ou código DOT), ou None se ainda não estiver pronto.
+
+    A primeira chamada para um diagrama agenda a renderização e aguarda até
+    `espera` segundos; as seguintes devolvem o SVG do cache.
+    """
+    fonte = getattr(diagrama, 'source', diagrama)
+    chave = hashlib.sha1(fonte.encode()).hexdigest()
+    with _trava:
+        futuro = _cache.get(chave)
+        if futuro is None:
+            futuro = _executor.submit(_renderizar, fonte)
+            _cache[chave] = futuro
+            while len(_cache) > TAMANHO_CACHE:
+                _cache.popitem(last=False)
+        else:
+            _cache.move_to_end(chave)
+    wait([futuro], timeout=espera)
+    return futuro.result() if futuro.done() else None
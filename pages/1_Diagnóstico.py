@@ -2,28 +2,26 @@
 # Parte 1: Importações e Configurações Iniciais (Atualizado)
 # =====================================
 
-from PIL import Image
+# A tela inicial (upload) usa só bibliotecas leves. pandas, Plotly, SciPy e os
+# módulos do leanflow são importados após o upload (Parte 2) e pré-carregados
+# em segundo plano por `preaquecer`.
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import math
-import os
-import plotly.graph_objects as go
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
-from sklearn.linear_model import LinearRegression
-import numpy as np
+import io
+import uuid
 from datetime import datetime
-import matplotlib.colors as mcolors
-import graphviz as gv
-from plotly.subplots import make_subplots 
-from scipy import stats
-from scipy import special
+from functools import partial
+from leanflow.ativos import logo
+from leanflow.cache_dados import abrir_planilha, derivado, liberar_sessao
+from leanflow.precalculo import agendar_precalculo, cancelar_precalculo, progresso_precalculo
+from leanflow.preaquecimento import preaquecer
 
 #======================================
 # Título da Página
 #======================================
 
 st.set_page_config(page_title="🔎 Diagnóstico Hospitalar", layout="wide")
+preaquecer()
 
 
 # =====================================
@@ -62,6 +60,140 @@ def definir_periodo(hora):
                 return 'Indefinido'
         except ValueError:
             return 'Indefinido'
+
+# Função para montar o gráfico de histórico + previsão com intervalo
+def grafico_previsao(datas, valores, resultado, titulo, rotulo_y):
+    previsao = resultado['previsao']
+    fig = go.Figure()
+    fig.add_trace(linha(
+        datas, valores, mode='lines+markers', name='Histórico', line=dict(color='#636EFA')
+    ))
+    fig.add_trace(go.Scatter(
+        x=list(previsao.index) + list(previsao.index[::-1]),
+        y=list(previsao['superior']) + list(previsao['inferior'][::-1]),
+        fill='toself', fillcolor='rgba(239, 85, 59, 0.15)', line=dict(width=0),
+        hoverinfo='skip', name='Intervalo de 95%'
+    ))
+    fig.add_trace(go.Scatter(
+        x=[datas.iloc[-1]] + list(previsao.index), y=[valores.iloc[-1]] + list(previsao['previsao']),
+        mode='lines+markers', name='Previsão', line=dict(color='#EF553B', dash='dash')
+    ))
+    fig.update_layout(
+        title=titulo,
+        xaxis_title='Mês',
+        yaxis_title=rotulo_y,
+        xaxis=dict(tickformat='%b %Y'),
+        template=TEMA,
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    )
+    return fig
+
+# Função para marcar em um gráfico os valores atípicos e as mudanças de nível de uma série
+def destacar_anomalias(fig, x, y, anomalias):
+    x, y = list(x), list(y)
+    atipicos = anomalias[anomalias['tipo'] == 'Valor atípico']
+    if not atipicos.empty:
+        fig.add_trace(go.Scatter(
+            x=[x[p] for p in atipicos['posicao']], y=[y[p] for p in atipicos['posicao']],
+            mode='markers', name='Possível anomalia',
+            marker=dict(symbol='x', size=12, color='#D62728', line=dict(width=2)),
+            hovertext=[f"z robusto: {z:.1f}" for z in atipicos['z']]
+        ))
+    for _, mudanca in anomalias[anomalias['tipo'] != 'Valor atípico'].iterrows():
+        fig.add_vline(x=x[mudanca['posicao']], line=dict(color='#FF7F0E', width=1, dash='dot'))
+        fig.add_annotation(
+            x=x[mudanca['posicao']], y=1, yref='paper', text=mudanca['tipo'], showarrow=False,
+            xanchor='left', font=dict(color='#FF7F0E', size=10)
+        )
+    return fig
+
+# Função para descrever as anomalias de uma ou mais séries em uma frase
+def texto_anomalias(anomalias, rotulos):
+    itens = [
+        f"**{rotulos[linha['posicao']]}** ({linha['tipo'].lower()}{'' if len(anomalias['serie'].unique()) == 1 else ', ' + str(linha['serie'])})"
+        for _, linha in anomalias.sort_values('posicao').iterrows()
+    ]
+    return "Possíveis anomalias: " + "; ".join(itens) + ". Confira esses valores na planilha antes de usá-los nas previsões e nos modelos de fila."
+
+# Função para formatar colunas numéricas pela configuração da tabela, mantendo os valores como float
+# (ordenáveis e enviados ao navegador sem conversão para texto); formatos no padrão printf, ex.: '%.2f%%'
+def config_numerica(formatos, ajuda=None):
+    ajuda = ajuda or {}
+    return {
+        coluna: st.column_config.NumberColumn(format=formato, help=ajuda.get(coluna))
+        for coluna, formato in formatos.items()
+    }
+
+# Texto de ajuda das colunas de fila, que podem ser infinitas
+AJUDA_FILA_INSTAVEL = "Célula vazia indica fila instável (utilização de 100% ou mais): a fila cresce sem limite."
+
+# Função para exibir os valores infinitos das colunas de fila como células vazias (NaN), em uma cópia da tabela
+def vazio_se_infinito(df, colunas):
+    return df.assign(**{coluna: df[coluna].replace([np.inf, -np.inf], np.nan) for coluna in colunas})
+
+# Função para exibir um diagrama VSM: SVG renderizado em segundo plano ou, enquanto não fica pronto, o próprio Graphviz
+def exibir_vsm(dot):
+    svg = svg_vsm(dot)
+    if svg:
+        st.image(svg)
+    else:
+        st.graphviz_chart(dot)
+
+
+# Filas M/M/1 e M/M/c usadas nas sub-seções de Desempenho dos Processos
+def calc_Wq_MM1(lambda_, mu_):
+    rho = lambda_ / mu_
+    if rho >= 1:
+        return np.inf
+    else:
+        return rho / (mu_ * (1 - rho))
+
+def calc_Wq_MMc(lambda_, mu_, c):
+    rho = lambda_ / (c * mu_)
+    if rho >= 1:
+        return np.inf
+    else:
+        sum_terms = sum([((c * rho) ** n) / math.factorial(n) for n in range(int(c))])
+        last_term = ((c * rho) ** c) / (math.factorial(int(c)) * (1 - rho))
+        P0 = 1 / (sum_terms + last_term)
+        Lq = (((c * rho) ** c) * rho) / (math.factorial(int(c)) * ((1 - rho) ** 2)) * P0
+        return Lq / lambda_
+
+
+# Função aprimorada para calcular métricas de fila com tratamento para grandes valores de 'c'
+def calcular_metricas_fila(lambda_, mu, c):
+    rho = lambda_ / (c * mu)
+    if rho >= 1 or c == 0:
+        return np.inf, np.inf  # Sistema instável ou inválido
+
+    if c > 100:
+        # Aproximação para grandes valores de 'c'
+        Lq = rho / (1 - rho )
+    else:
+        # Cálculo exato para c <= 100
+        from scipy import special
+
+        lambda_mu = lambda_ / mu
+        c_int = int(c)
+        try:
+            log_sum_terms = [n * math.log(lambda_mu) - special.gammaln(n +1) for n in range(c_int)]
+            # Evita overflow ao calcular log_sum_exp
+            max_log = max(log_sum_terms)
+            sum_exp = sum( math.exp(x - max_log) for x in log_sum_terms )
+            log_sum = max_log + math.log(sum_exp)
+            log_last_term = c * math.log(lambda_mu) - special.gammaln(c +1) - math.log(1 - rho )
+            # P0 = 1 / (sum_{n=0}^{c-1} term_n + term_c )
+            # Utilizando log_sum_exp de forma simplificada
+            sum_total = math.exp(log_sum - log_sum) + math.exp(log_last_term - log_sum)
+            P0 = 1 / ( math.exp(log_sum) * (1 + math.exp(log_last_term - log_sum)) )
+            # Calcular Lq
+            Lq = ( (lambda_mu **c) * rho * P0 ) / ( special.gammaln(c +1) * (1 - rho )**2 )
+        except (OverflowError, ZeroDivisionError, ValueError):
+            return np.inf, np.inf  # Retorna infinito em caso de erro
+    # Cálculo de Wq usando Lq
+    Wq = Lq / lambda_ if lambda_ >0 else 0
+
+    return Lq, Wq
             
 # =====================================
 # Definir constantes para as abas e colunas (Atualizado)
@@ -289,13 +421,92 @@ COLUNAS = {
     },
 }
 
+# =====================================
+# Seções da página
+# =====================================
+
+# Só a seção escolhida é calculada e desenhada em cada execução do script
+SECOES = {
+    'porta': '🚪 Porta',
+    'triagem': '🩺 Triagem',
+    'consulta': '👨‍⚕️ Consulta',
+    'sadt': '🧪 SADT',
+    'passagem': '⏩ Passagem & Internação',
+    'centro_cirurgico': '🏩 Centro Cirúrgico',
+    'desempenho': '🔗 Desempenho dos Processos',
+}
+
+SUBSECOES_DESEMPENHO = {
+    'porta_medico': ' ⏩ Atendimento Porta/Médico',
+    'especialidade': ' ⏩ Demanda/Especialidade',
+    'setores': '⏩ Por Setores',
+}
+
+# Chaves dos widgets de cada seção e sub-seção
+WIDGETS_SECOES = {
+    'porta': ['horizonte_previsao_porta'],
+    'triagem': ['tempo_espera_alvo_triagem', 'utilizacao_maxima_triagem', 'duracoes_turno_triagem'],
+    'sadt': ['horizonte_previsao_sadt'],
+    'centro_cirurgico': [
+        'horizonte_previsao_cc', 'horizonte_backtest', 'qtd_casos_agenda', 'duracao_media_agenda', 'dias_agenda',
+        'salas_agenda', 'casos_por_sala_sim', 'prob_cancelamento_sim', 'urgencias_dia_sim', 'replicacoes_sim',
+        'tipo_leito_rpa', 'leitos_rpa', 'cirurgias_dia_rpa'
+    ],
+    'desempenho': ['subsecao_desempenho', 'mes_dimensionamento', 'dia_dimensionamento', 'tempo_espera_alvo_consulta'],
+    'especialidade': ['objetivo_alocacao_medicos'],
+    'setores': ['dias_censo', 'replicacoes_censo'],
+}
+
+
+def manter_widgets(secoes_ativas):
+    """Preserva os valores dos widgets das seções que não serão desenhadas.
+
+    O Streamlit descarta, ao fim de cada execução, o estado dos widgets que não
+    foram desenhados. Regravar o valor pela API do session_state mantém a escolha
+    do usuário ao voltar à seção e deixa os parâmetros da triagem disponíveis para
+    o dimensionamento em Desempenho dos Processos.
+    """
+    for secao, chaves in WIDGETS_SECOES.items():
+        if secao in secoes_ativas:
+            continue
+        for chave in chaves:
+            if chave in st.session_state:
+                st.session_state[chave] = st.session_state[chave]
+
+
+def ler_planilha(conteudo):
+    """Lê as abas de ABAS presentes na planilha (bytes): dict chave de ABAS -> DataFrame.
+
+    Já aplica as conversões de tipo da leitura, para que o resultado vá inteiro
+    para o cache compartilhado entre as sessões (leanflow.cache_dados).
+    """
+    xls = pd.ExcelFile(io.BytesIO(conteudo))
+    abas = {
+        # Médicos por especialidade: só as colunas A até C
+        chave: pd.read_excel(xls, sheet_name=aba, usecols="A:C" if chave == "MEDIA_MEDICOS_ESPECIALIDADE" else None)
+        for chave, aba in ABAS.items() if aba in xls.sheet_names
+    }
+
+    if "MEDIA_MEDICOS_ESPECIALIDADE" in abas:
+        df_media_medicos_especialidade = abas["MEDIA_MEDICOS_ESPECIALIDADE"]
+        # Converter a coluna 'percentual_atendimento_dia' para float
+        df_media_medicos_especialidade[COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["PERCENTUAL_ATENDIMENTO_DIA"]] = df_media_medicos_especialidade[
+            COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["PERCENTUAL_ATENDIMENTO_DIA"]
+        ].apply(porcentagem_para_float)
+
+        # Converter a coluna 'quantidade_media_dia_medicos' para numérico
+        df_media_medicos_especialidade[COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["QUANTIDADE_MEDIA_MEDICOS"]] = pd.to_numeric(
+            df_media_medicos_especialidade[COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["QUANTIDADE_MEDIA_MEDICOS"]],
+            errors='coerce'
+        ).fillna(0)
+    return abas
+
 # =====================================
 # Sidebar - Barra Lateral
 # =====================================
-image_path = 'app2.png'
-if os.path.exists(image_path):
-    image = Image.open(image_path)
-    st.sidebar.image(image, width=190)
+imagem_logo = logo(190)
+if imagem_logo:
+    st.sidebar.image(imagem_logo, width=190)
 else:
     st.sidebar.write("LeanFlow")
 
@@ -312,87 +523,103 @@ st.sidebar.markdown("""---""")
 # Inicializar missing_sheets
 missing_sheets = []
 
+# Identifica a sessão nos caches compartilhados (planilhas e pré-cálculo)
+id_sessao = st.session_state.setdefault("id_sessao", uuid.uuid4().hex)
+
 # Upload de Arquivos na Sidebar
 st.sidebar.subheader("📂 Upload de Arquivos Excel")
 uploaded_file = st.sidebar.file_uploader("Faça upload de um arquivo Excel", type=["xlsx"])
 
 # Verificação se o arquivo foi carregado
 if uploaded_file:
+    # Bibliotecas das análises (já pré-carregadas, em geral, por `preaquecer`)
+    import pandas as pd
+    import numpy as np
+    import plotly.express as px
+    import plotly.graph_objects as go
+    import graphviz as gv
+    from leanflow.filas import metricas_mmc, metricas_mmck, otimizar_alocacao
+    from leanflow.escalas import requisito_por_hora, otimizar_escala
+    from leanflow.agenda_cirurgica import agendar_casos, duracao_janela, gerar_casos
+    from leanflow.simulacao_cirurgica import simular_dias_cirurgicos
+    from leanflow.simulacao_leitos import resumir_censo, simular_censo
+    from leanflow.previsao import alocar_proporcional, hash_serie, prever, prever_lote
+    from leanflow.backtest import avaliar_previsoes
+    from leanflow.dimensionamento import CENARIOS as CENARIOS_PREVISAO, demanda_horaria, leitos_necessarios, profissionais_por_hora
+    from leanflow.demanda import JANELA_DIURNA, matriz_semana_hora, media_janela, perfil_horario
+    from leanflow.tendencia import ajustar_tendencia
+    from leanflow.incerteza import contagem, faixa, media, propagar, texto_intervalo
+    from leanflow.anomalias import detectar_lote
+    from leanflow.figuras import figura_em_cache
+    from leanflow.vsm import cor_escala, svg_vsm
+    from leanflow.graficos import LIMIAR_PONTOS, caixa, caixas_agrupadas, histograma, linha, reduzir_grupos
+    from leanflow.tema import TEMA, registrar_tema
+
+    registrar_tema()
+
     try:
-        # Ler o arquivo Excel
-        xls = pd.ExcelFile(uploaded_file)
+        # Ler o arquivo Excel: as abas são lidas uma vez por processo e compartilhadas
+        # entre as sessões que abrirem a mesma planilha. O hash do conteúdo identifica
+        # a planilha também nos caches de figuras e de pré-cálculo
+        hash_planilha, abas = abrir_planilha(id_sessao, uploaded_file.getvalue(), ler_planilha)
 
         # Verificar se as abas estão corretas
-        missing_sheets = [sheet for sheet in ABAS.values() if sheet not in xls.sheet_names]
+        missing_sheets = [aba for chave, aba in ABAS.items() if chave not in abas]
         if missing_sheets:
             st.error(f"As seguintes abas estão faltando no arquivo: {', '.join(missing_sheets)}")
         else:
             # Carregar os dados das abas usando as constantes
             # Dados Gerais
-            df_mensal = pd.read_excel(xls, sheet_name=ABAS["MENSAL"])
-            df_semana = pd.read_excel(xls, sheet_name=ABAS["SEMANAL"])
-            df_horarios = pd.read_excel(xls, sheet_name=ABAS["HORA"])
-            df_hv = pd.read_excel(xls, sheet_name=ABAS["HORIZ_VERTIC"])
-            df_pontos_cuidado = pd.read_excel(xls, sheet_name=ABAS["PONTOS_CUIDADO"])
-            df_classificacao = pd.read_excel(xls, sheet_name=ABAS["CLASSIFICACAO"])
-            df_retorno = pd.read_excel(xls, sheet_name=ABAS["RETORNO"])
-            df_saida = pd.read_excel(xls, sheet_name=ABAS["SAIDA"])
-            df_orientados = pd.read_excel(xls, sheet_name=ABAS["ORIENTADOS"])
+            df_mensal = abas["MENSAL"]
+            df_semana = abas["SEMANAL"]
+            df_horarios = abas["HORA"]
+            df_hv = abas["HORIZ_VERTIC"]
+            df_pontos_cuidado = abas["PONTOS_CUIDADO"]
+            df_classificacao = abas["CLASSIFICACAO"]
+            df_retorno = abas["RETORNO"]
+            df_saida = abas["SAIDA"]
+            df_orientados = abas["ORIENTADOS"]
 
             # Dados de Triagem
-            df_triagem_urgencia = pd.read_excel(xls, sheet_name=ABAS["TRIAGEM_URGENCIA"])
-            df_triagem_enfermeiros = pd.read_excel(xls, sheet_name=ABAS["TRIAGEM_ENFERMEIROS"])
-            df_triagem_salas = pd.read_excel(xls, sheet_name=ABAS["TRIAGEM_SALAS"])
-            df_triagem_tempo = pd.read_excel(xls, sheet_name=ABAS["TRIAGEM_TEMPO"])
+            df_triagem_urgencia = abas["TRIAGEM_URGENCIA"]
+            df_triagem_enfermeiros = abas["TRIAGEM_ENFERMEIROS"]
+            df_triagem_salas = abas["TRIAGEM_SALAS"]
+            df_triagem_tempo = abas["TRIAGEM_TEMPO"]
 
             # Dados de SADT
-            df_exames_sadt = pd.read_excel(xls, sheet_name=ABAS["EXAMES_SADT"])
+            df_exames_sadt = abas["EXAMES_SADT"]
 
             # Dados de Consulta
-            df_consulta_tempo = pd.read_excel(xls, sheet_name=ABAS["CONSULTA_TEMPO"])
-            df_media_medicos_consulta = pd.read_excel(xls, sheet_name=ABAS["MEDIA_MEDICOS_CONSULTA"])
-            df_dados_semanais_medicos = pd.read_excel(xls, sheet_name=ABAS["DADOS_SEMANAIS_MEDICOS"])
-            df_media_medicos_especialidade = pd.read_excel(
-                xls,
-                sheet_name=ABAS["MEDIA_MEDICOS_ESPECIALIDADE"],
-                usecols="A:C"  # Inclui as colunas A até C
-            )
-
-            # Converter a coluna 'percentual_atendimento_dia' para float
-            df_media_medicos_especialidade[COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["PERCENTUAL_ATENDIMENTO_DIA"]] = df_media_medicos_especialidade[
-                COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["PERCENTUAL_ATENDIMENTO_DIA"]
-            ].apply(porcentagem_para_float)
-
-            # Converter a coluna 'quantidade_media_dia_medicos' para numérico
-            df_media_medicos_especialidade[COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["QUANTIDADE_MEDIA_MEDICOS"]] = pd.to_numeric(
-                df_media_medicos_especialidade[COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["QUANTIDADE_MEDIA_MEDICOS"]],
-                errors='coerce'
-            ).fillna(0)
+            df_consulta_tempo = abas["CONSULTA_TEMPO"]
+            df_media_medicos_consulta = abas["MEDIA_MEDICOS_CONSULTA"]
+            df_dados_semanais_medicos = abas["DADOS_SEMANAIS_MEDICOS"]
+            df_media_medicos_especialidade = abas["MEDIA_MEDICOS_ESPECIALIDADE"]
 
             # Dados do Centro Cirúrgico
-            df_funcionamento_cc = pd.read_excel(xls, sheet_name=ABAS["FUNCIONAMENTO_CC"])
-            df_motivos_cancelamento = pd.read_excel(xls, sheet_name=ABAS["MOTIVOS_CANCELAMENTO"])
-            df_tempo_medio_atraso_primeira = pd.read_excel(xls, sheet_name=ABAS["TEMPO_ATRASO_CIRURGIA"])
-            df_tempo_setup_sala = pd.read_excel(xls, sheet_name=ABAS["TEMPO_SETUP_SALA"])
-            df_tempo_substit_sala = pd.read_excel(xls, sheet_name=ABAS["TEMPO_SUBSTIT_SALA"])
-            df_media_horas_agendadas = pd.read_excel(xls, sheet_name=ABAS["MEDIA_HORAS_AGENDADAS"])
-            df_media_horas_gastas = pd.read_excel(xls, sheet_name=ABAS["MEDIA_HORAS_GASTAS"])
-            df_taxa_indicadores_cc = pd.read_excel(xls, sheet_name=ABAS["TAXA_INDICADORES_CC"])
-            df_motivos_atraso_cirurgia = pd.read_excel(xls, sheet_name=ABAS["MOTIVOS_ATRASO_CIRURGIA"])
-            df_tempo_permanencia_leitos = pd.read_excel(xls, sheet_name=ABAS["TEMPO_PERMANENCIA_LEITOS"])
-            df_classificacao_salas_cirurgicas = pd.read_excel(xls, sheet_name=ABAS["CLASSIFICACAO_SALAS_CIRURGICAS"])
-            df_salas_cirurgicas_porte = pd.read_excel(xls, sheet_name=ABAS["SALAS_CIRURGICAS_PORTE"])
-            df_qtd_cirurgia_eletivas_espec = pd.read_excel(xls, sheet_name=ABAS["QTD_CIRURGIAS_ELETIVAS_ESPEC"])
-            df_qtd_cirurgias_nao_programadas = pd.read_excel(xls, sheet_name=ABAS["QTD_CIRURGIAS_NAO_PROGRAMADAS"])
-            df_tempo_medio_solicitacao_cirurgi = pd.read_excel(xls, sheet_name=ABAS["TEMPO_MEDIO_SOLICITACAO_CIRURGIA"])
-            df_media_medicos_cc = pd.read_excel(xls, sheet_name=ABAS["MEDIA_MEDICOS_CC"])
-            df_cirurgias_mes = pd.read_excel(xls, sheet_name=ABAS["CIRURGIAS_MES"])
+            df_funcionamento_cc = abas["FUNCIONAMENTO_CC"]
+            df_motivos_cancelamento = abas["MOTIVOS_CANCELAMENTO"]
+            df_tempo_medio_atraso_primeira = abas["TEMPO_ATRASO_CIRURGIA"]
+            df_tempo_setup_sala = abas["TEMPO_SETUP_SALA"]
+            df_tempo_substit_sala = abas["TEMPO_SUBSTIT_SALA"]
+            df_media_horas_agendadas = abas["MEDIA_HORAS_AGENDADAS"]
+            df_media_horas_gastas = abas["MEDIA_HORAS_GASTAS"]
+            df_taxa_indicadores_cc = abas["TAXA_INDICADORES_CC"]
+            df_motivos_atraso_cirurgia = abas["MOTIVOS_ATRASO_CIRURGIA"]
+            df_tempo_permanencia_leitos = abas["TEMPO_PERMANENCIA_LEITOS"]
+            df_motivos_tempo_permanencia_rpa = abas["MOTIVOS_TEMPO_PERMANENCIA_RPA"]
+            df_classificacao_salas_cirurgicas = abas["CLASSIFICACAO_SALAS_CIRURGICAS"]
+            df_salas_cirurgicas_porte = abas["SALAS_CIRURGICAS_PORTE"]
+            df_qtd_cirurgia_eletivas_espec = abas["QTD_CIRURGIAS_ELETIVAS_ESPEC"]
+            df_qtd_cirurgias_nao_programadas = abas["QTD_CIRURGIAS_NAO_PROGRAMADAS"]
+            df_tempo_medio_solicitacao_cirurgi = abas["TEMPO_MEDIO_SOLICITACAO_CIRURGIA"]
+            df_media_medicos_cc = abas["MEDIA_MEDICOS_CC"]
+            df_cirurgias_mes = abas["CIRURGIAS_MES"]
 
             # Passagem & Internação
-            df_passagem_setores = pd.read_excel(xls, sheet_name=ABAS["PASSAGEM_SETORES"])
-            df_internacao_demanda = pd.read_excel(xls, sheet_name=ABAS["INTERNACAO_DEMANDA"])
-            df_internacao_saida = pd.read_excel(xls, sheet_name=ABAS["INTERNACAO_SAIDA"])
-            df_taxa_internacao = pd.read_excel(xls, sheet_name=ABAS["TAXA_INTERNACAO"])
+            df_passagem_setores = abas["PASSAGEM_SETORES"]
+            df_internacao_demanda = abas["INTERNACAO_DEMANDA"]
+            df_internacao_saida = abas["INTERNACAO_SAIDA"]
+            df_taxa_internacao = abas["TAXA_INTERNACAO"]
 
     except Exception as e:
         st.error(f"Erro ao carregar o arquivo: {str(e)}")
@@ -406,15 +633,12 @@ st.title("🔎🏥 Diagnóstico de Processos Hospitalares")
 
 # Verificar se o arquivo foi carregado corretamente
 if uploaded_file and not missing_sheets:
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
-        '🚪 Porta',
-        '🩺 Triagem',
-        '👨‍⚕️ Consulta',
-        '🧪 SADT',
-        '⏩ Passagem & Internação',
-        '🏩 Centro Cirúrgico',
-        '🔗 Desempenho dos Processos'
-    ])
+    secao = st.radio(
+        "Seção", list(SECOES), format_func=SECOES.get, horizontal=True,
+        key="secao_diagnostico", label_visibility="collapsed"
+    )
+    subsecao = st.session_state.get("subsecao_desempenho", next(iter(SUBSECOES_DESEMPENHO)))
+    manter_widgets({secao, subsecao} if secao == 'desempenho' else {secao})
 else:
     st.info("Por favor, carregue o arquivo Excel com os dados necessários para visualizar as análises.")
 
@@ -424,6 +648,35 @@ else:
 
 if uploaded_file and not missing_sheets:
 
+    # Série mensal de pacientes ordenada por data (usada pelas previsões de todas as seções)
+    # Mapeamento dos meses em português para números
+    mes_map = {
+        'Jan': 1, 'Fev': 2, 'Mar': 3, 'Abr': 4, 'Mai': 5, 'Jun': 6,
+        'Jul': 7, 'Ago': 8, 'Set': 9, 'Out': 10, 'Nov': 11, 'Dez': 12
+    }
+
+    df_mensal['mes_num'] = df_mensal[COLUNAS["MENSAL"]["MES"]].map(mes_map)
+    df_mensal['ano'] = df_mensal[COLUNAS["MENSAL"]["ANO"]]
+
+    # Criar a coluna 'data' combinando ano e número do mês
+    df_mensal['data'] = pd.to_datetime(
+        df_mensal[['ano', 'mes_num']].rename(columns={'ano': 'year', 'mes_num': 'month'}).assign(day=1)
+    )
+
+    # Ordenar o DataFrame pela coluna 'data'
+    df_mensal.sort_values('data', inplace=True)
+
+    # Criar a coluna 'mes_ano_pt' com os meses em português
+    mes_num_map = {
+        1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun',
+        7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'
+    }
+    df_mensal['mes_ano_pt'] = df_mensal['data'].dt.month.map(mes_num_map) + '/' + df_mensal['data'].dt.year.astype(str)
+    serie_pacientes = derivado(
+        hash_planilha, 'serie_pacientes',
+        lambda: df_mensal.set_index('data')[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]].astype(float)
+    )
+
     # Preparar dados de 'df_horarios'
     df_horarios[COLUNAS["HORA"]["QUANTIDADE_MEDIA"]] = pd.to_numeric(
         df_horarios[COLUNAS["HORA"]["QUANTIDADE_MEDIA"]], errors='coerce').fillna(0)
@@ -447,6 +700,33 @@ if uploaded_file and not missing_sheets:
     df_triagem_enfermeiros['hora'] = pd.to_numeric(df_triagem_enfermeiros['hora'], errors='coerce')
     df_triagem_enfermeiros['Período'] = df_triagem_enfermeiros['hora'].apply(definir_periodo)
 
+    # Matriz de demanda por dia da semana e hora (7 x 24), montada uma única vez por planilha a partir
+    # das margens semanal e horária e reaproveitada pelos cálculos de filas e escalas de todas as sessões
+    df_semana[COLUNAS["SEMANAL"]["QUANTIDADE_MEDIA"]] = pd.to_numeric(
+        df_semana[COLUNAS["SEMANAL"]["QUANTIDADE_MEDIA"]], errors='coerce').fillna(0)
+
+    def montar_matriz_demanda():
+        # Horas ausentes da planilha ficam NaN: demanda nula na matriz, mas fora das médias de janela
+        demanda_por_hora = df_horarios.groupby('hora')[COLUNAS["HORA"]["QUANTIDADE_MEDIA"]].sum(min_count=1).reindex(range(24))
+        sem_demanda = demanda_por_hora.isna().to_numpy()
+        matriz = matriz_semana_hora(
+            df_semana[COLUNAS["SEMANAL"]["QUANTIDADE_MEDIA"]].to_numpy(dtype=float),
+            demanda_por_hora.to_numpy(dtype=float)
+        )
+        # Compartilhados entre as sessões: somente leitura
+        matriz.flags.writeable = False
+        sem_demanda.flags.writeable = False
+        return matriz, sem_demanda
+
+    matriz_demanda, horas_sem_demanda = derivado(hash_planilha, 'matriz_demanda', montar_matriz_demanda)
+    enfermeiros_por_hora = df_triagem_enfermeiros.groupby('hora')[
+        "quantidade_media_enfermeiros (arredondado)"].mean().reindex(range(24))
+    enfermeiros_hora_atual = df_triagem_enfermeiros.groupby('hora')[COLUNAS["TRIAGEM_ENFERMEIROS"]["MEDIA_ENFERMEIROS"]].mean().reindex(range(24), fill_value=0)
+
+    # Salas e tempo médio da triagem (usados também no dimensionamento)
+    num_salas = df_triagem_salas[COLUNAS["TRIAGEM_SALAS"]["NUM_SALAS"]].iloc[0]
+    tempo_medio_atendimento = df_triagem_tempo[COLUNAS["TRIAGEM_TEMPO"]["TEMPO_MEDIO_ATENDIMENTO"]].iloc[0]
+
     # Preparar dados de 'df_exames_sadt'
     df_exames_sadt[COLUNAS["EXAMES_SADT"]["TEMPO_MEDIO_EXAME"]] = pd.to_numeric(
         df_exames_sadt[COLUNAS["EXAMES_SADT"]["TEMPO_MEDIO_EXAME"]], errors='coerce')
@@ -484,6 +764,14 @@ if uploaded_file and not missing_sheets:
         COLUNAS["CONSULTA_TEMPO"]["TEMPO_MEDIO_ETAPA"]
     ], inplace=True)
 
+    # Tempo médio do atendimento médico (usado nas sub-seções de Desempenho e no dimensionamento)
+    df_consulta_tempo['etapa_normalizada'] = df_consulta_tempo[COLUNAS["CONSULTA_TEMPO"]["ETAPA"]].str.strip().str.lower()
+    mask_atendimento_medico = df_consulta_tempo['etapa_normalizada'] == 'atendimento médico'
+    if mask_atendimento_medico.any():
+        tempo_medio_consultorio = df_consulta_tempo.loc[mask_atendimento_medico, COLUNAS["CONSULTA_TEMPO"]["TEMPO_MEDIO_ETAPA"]].iloc[0]
+    else:
+        tempo_medio_consultorio = 0
+
     # Preparar dados de 'df_media_medicos_consulta'
     df_media_medicos_consulta[COLUNAS["MEDIA_MEDICOS_CONSULTA"]["QUANTIDADE_MEDIA_MEDICOS"]] = pd.to_numeric(
         df_media_medicos_consulta[COLUNAS["MEDIA_MEDICOS_CONSULTA"]["QUANTIDADE_MEDIA_MEDICOS"]],
@@ -497,6 +785,8 @@ if uploaded_file and not missing_sheets:
 
     # Aplicar a função 'definir_periodo' para definir o período baseado na hora
     df_media_medicos_consulta['Período'] = df_media_medicos_consulta['hora'].apply(definir_periodo)
+    medicos_consulta_por_hora = df_media_medicos_consulta.groupby('hora')[
+        COLUNAS["MEDIA_MEDICOS_CONSULTA"]["QUANTIDADE_MEDIA_MEDICOS"]].mean().reindex(range(24))
 
     # Preparar dados de 'df_dados_semanais_medicos'
     df_dados_semanais_medicos[COLUNAS["DADOS_SEMANAIS_MEDICOS"]["MEDICOS_MANHA_TARDE"]] = pd.to_numeric(
@@ -591,50 +881,236 @@ if uploaded_file and not missing_sheets:
         st.error(f"Ocorreu um erro ao calcular as métricas: {e}")
         st.stop()
 
+    # Indicadores da porta de entrada (médias diárias)
+    total_pacientes_dia = df_horarios[COLUNAS["HORA"]["QUANTIDADE_MEDIA"]].sum()
+    evasao_dia = df_saida.loc[df_saida[COLUNAS["SAIDA"]["INDICADORES"]] == 'EVASÃO', COLUNAS["SAIDA"]["QUANTIDADE_MEDIA"]].iloc[0]
+    abandono_dia = df_saida.loc[df_saida[COLUNAS["SAIDA"]["INDICADORES"]] == 'ABANDONO', COLUNAS["SAIDA"]["QUANTIDADE_MEDIA"]].iloc[0]
+    orientados_dia = df_orientados[COLUNAS["ORIENTADOS"]["QUANTIDADE_MEDIA"]].iloc[0]
+    retorno_48h_dia = df_retorno.loc[df_retorno[COLUNAS["RETORNO"]["INDICADORES"]] == 'RETORNO EM 48 HORAS', COLUNAS["RETORNO"]["QUANTIDADE_MEDIA"]].iloc[0]
+    retorno_72h_dia = df_retorno.loc[df_retorno[COLUNAS["RETORNO"]["INDICADORES"]] == 'RETORNO EM 72 HORAS', COLUNAS["RETORNO"]["QUANTIDADE_MEDIA"]].iloc[0]
+    total_pacientes_ano = df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]].sum()
+    total_pacientes_semana = df_semana[COLUNAS["SEMANAL"]["QUANTIDADE_MEDIA"]].sum()
+
+    # =====================================
+    # Intervalos de confiança dos indicadores
+    # =====================================
+
+    # As médias diárias da planilha cobrem o mesmo período da série mensal
+    dias_observacao = max(len(df_mensal), 1) * 365.25 / 12
+
+    def calcular_indicadores(pacientes_dia, evasao, abandono, orientados, retorno_48h, retorno_72h,
+                             solicitacoes_geral, solicitacoes_enfermaria, solicitacoes_uti, solicitacoes_cirurgicos,
+                             tmp_geral, tmp_pa_enf, tmp_pa_uti, tmp_pa_clinicos, tmp_pa_cirurgicos):
+        pacientes_dia = np.where(pacientes_dia > 0, pacientes_dia, 1)  # Proteção contra divisão por zero
+        return {
+            'Atendimentos/Dia': pacientes_dia,
+            'Orientados p/Rede (%)': orientados / pacientes_dia * 100,
+            'Taxa Evasão (%)': evasao / pacientes_dia * 100,
+            'Taxa Abandono (%)': abandono / pacientes_dia * 100,
+            'Retorno em 48h (%)': retorno_48h / pacientes_dia * 100,
+            'Retorno em 72h (%)': retorno_72h / pacientes_dia * 100,
+            'Fator de Utilização do Hospital – Geral': tmp_geral * solicitacoes_geral / total_leitos_geral * 100,
+            'Fator de Utilização dos Leitos P.A. (Enf.)': tmp_pa_enf * solicitacoes_enfermaria / total_leitos_pa_enf * 100,
+            'Fator de Utilização dos Leitos P.A. (Uti)': tmp_pa_uti * solicitacoes_uti / total_leitos_pa_uti * 100,
+            'Fator de Utilização dos Leitos P.A. (Clínicos)':
+                tmp_pa_clinicos * (solicitacoes_enfermaria - solicitacoes_cirurgicos) / total_leitos_pa_clinicos * 100,
+            'Fator de Utilização dos Leitos P.A. (Cirúrgicos)':
+                tmp_pa_cirurgicos * solicitacoes_cirurgicos / total_leitos_pa_cirurgicos * 100,
+        }
+
+    # Contagens diárias como Poisson no período; permanências como médias de internações
+    # com CV 1 (permanência exponencial), uma por solicitação atendida no período
+    entradas_indicadores = {
+        'pacientes_dia': contagem(total_pacientes_dia, dias_observacao),
+        'evasao': contagem(evasao_dia, dias_observacao),
+        'abandono': contagem(abandono_dia, dias_observacao),
+        'orientados': contagem(orientados_dia, dias_observacao),
+        'retorno_48h': contagem(retorno_48h_dia, dias_observacao),
+        'retorno_72h': contagem(retorno_72h_dia, dias_observacao),
+        'solicitacoes_geral': contagem(media_solicitacoes_leitos_geral, dias_observacao),
+        'solicitacoes_enfermaria': contagem(media_solicitacoes_leitos_enfermaria, dias_observacao),
+        'solicitacoes_uti': contagem(media_solicitacoes_leitos_uti, dias_observacao),
+        'solicitacoes_cirurgicos': contagem(media_solicitacoes_leitos_cirurgicos, dias_observacao),
+        'tmp_geral': media(tempo_medio_permanencia_geral, media_solicitacoes_leitos_geral * dias_observacao),
+        'tmp_pa_enf': media(tempo_medio_permanencia_pa_enf, media_solicitacoes_leitos_enfermaria * dias_observacao),
+        'tmp_pa_uti': media(tempo_medio_permanencia_pa_uti, media_solicitacoes_leitos_uti * dias_observacao),
+        'tmp_pa_clinicos': media(tempo_medio_permanencia_pa_clinicos, media_solicitacoes_leitos_clinicos * dias_observacao),
+        'tmp_pa_cirurgicos': media(tempo_medio_permanencia_pa_cirurgicos, media_solicitacoes_leitos_cirurgicos * dias_observacao),
+    }
+    intervalos_indicadores = derivado(
+        hash_planilha, 'intervalos_indicadores', partial(propagar, calcular_indicadores, entradas_indicadores)
+    )
+
+    # =====================================
+    # Leitos por setor: capacidade, utilização e fila M/M/c
+    # =====================================
+
+    # Tabela montada uma vez por planilha e compartilhada entre as sessões (não deve ser alterada)
+    def montar_df_final():
+        # Assumindo que df_passagem_setores e df_internacao_demanda são DataFrames já carregados do Excel
+        passagem_setores = df_passagem_setores.copy()
+        internacao_demanda = df_internacao_demanda.copy()
+
+        # Mapeamento de setores
+        setor_mapping = {
+            "Geral": "Leitos Geral",
+            "P.A. (ENF.)": "Leitos Enfermaria",
+            "P.A. (UTI)": "Leitos UTI",
+            "P.A. (CIRÚRGICOS)": "Leitos Cirúrgicos",
+            "P.A. (CLÍNICOS)": "Leitos para Enfermaria (Origem P.A.)"
+        }
+
+        # Criar DataFrame final
+        df_final = passagem_setores.copy()
+        df_final['Capacidade (Leitos/Dia)'] = df_final['quantidade_leitos'] / df_final['tempo_medio_permanencia_dias']
+
+        # Adicionar demanda
+        demanda_dict = dict(zip(internacao_demanda['solicitacoes_leito'], internacao_demanda['media_solicitacoes_dia']))
+        df_final['Demanda (Média Solicitações/Dia)'] = df_final['setores'].map(setor_mapping).map(demanda_dict)
+
+        # Tratar possíveis valores NaN na Demanda
+        df_final['Demanda (Média Solicitações/Dia)'] = df_final['Demanda (Média Solicitações/Dia)'].fillna(0)
+
+        # Calcular Fator de Utilização
+        df_final['Fator de Utilização (%)'] = (df_final['Demanda (Média Solicitações/Dia)'] /
+                                               df_final['Capacidade (Leitos/Dia)']) * 100
+
+        # Calcular métricas de fila
+        df_final['Lq (Solicitações na Fila)'] = 0.0  # Alterado de "Lq (Pacientes na Fila)"
+        df_final['Wq (Tempo de Espera em Dias)'] = 0.0
+        df_final['Wq (Tempo de Espera em Horas)'] = 0.0  # Nova coluna para Wq em horas
+
+        for index, row in df_final.iterrows():
+            lambda_ = row['Demanda (Média Solicitações/Dia)']
+            mu = 1 / row['tempo_medio_permanencia_dias'] if row['tempo_medio_permanencia_dias'] > 0 else np.inf
+            c = row['quantidade_leitos']
+            try:
+                lq, wq = calcular_metricas_fila(lambda_, mu, c)
+                df_final.at[index, 'Lq (Solicitações na Fila)'] = lq  # Alterado de "Pacientes na Fila"
+                df_final.at[index, 'Wq (Tempo de Espera em Dias)'] = wq
+                df_final.at[index, 'Wq (Tempo de Espera em Horas)'] = wq * 24  # Converter dias em horas
+            except (OverflowError, ZeroDivisionError, ValueError):
+                df_final.at[index, 'Lq (Solicitações na Fila)'] = np.inf  # Alterado de "Pacientes na Fila"
+                df_final.at[index, 'Wq (Tempo de Espera em Dias)'] = np.inf
+                df_final.at[index, 'Wq (Tempo de Espera em Horas)'] = np.inf
+
+        # Formatar o DataFrame final
+        df_final = df_final.rename(columns={
+            'setores': 'Setores',
+            'quantidade_leitos': 'Quantidade de Leitos',
+            'tempo_medio_permanencia_dias': 'TMP (Dias)'
+        })
+
+        df_final = df_final[[
+            'Setores', 'Quantidade de Leitos', 'TMP (Dias)', 'Capacidade (Leitos/Dia)',
+            'Demanda (Média Solicitações/Dia)', 'Fator de Utilização (%)',
+            'Lq (Solicitações na Fila)', 'Wq (Tempo de Espera em Dias)', 'Wq (Tempo de Espera em Horas)'
+        ]]
+
+        # Arredondar valores numéricos
+        df_final = df_final.round({
+            'Capacidade (Leitos/Dia)': 2,
+            'Demanda (Média Solicitações/Dia)': 2,
+            'Fator de Utilização (%)': 2,
+            'Lq (Solicitações na Fila)': 2,  # Alterado de "Pacientes na Fila"
+            'Wq (Tempo de Espera em Dias)': 4,   # Mais casas decimais para maior precisão
+            'Wq (Tempo de Espera em Horas)': 2
+        })
+        return df_final
+
+    df_final = derivado(hash_planilha, 'df_final', montar_df_final)
+
+    # =====================================
+    # Séries mensais de cirurgias
+    # =====================================
+
+    # Converter colunas numéricas
+    colunas_numericas = [
+        COLUNAS["CIRURGIAS_MES"]["ELETIVAS_SUS"],
+        COLUNAS["CIRURGIAS_MES"]["ELETIVAS_SUPLEMENTAR"],
+        COLUNAS["CIRURGIAS_MES"]["URGENCIA_SUS"],
+        COLUNAS["CIRURGIAS_MES"]["URGENCIA_SUPLEMENTAR"],
+    ]
+    
+    for coluna in colunas_numericas:
+        df_cirurgias_mes[coluna] = pd.to_numeric(df_cirurgias_mes[coluna], errors='coerce')
+    
+    # Mapear as abreviações dos meses em português para números
+    month_map = {
+        'JAN': 1,
+        'FEV': 2,
+        'MAR': 3,
+        'ABR': 4,
+        'MAI': 5,
+        'JUN': 6,
+        'JUL': 7,
+        'AGO': 8,
+        'SET': 9,
+        'OUT': 10,
+        'NOV': 11,
+        'DEZ': 12
+    }
+    
+    df_cirurgias_mes['month_num'] = df_cirurgias_mes[COLUNAS["CIRURGIAS_MES"]["MES"]].str.upper().map(month_map)
+    
+    # Criar a coluna 'Data' usando ano e número do mês
+    df_cirurgias_mes['Data'] = pd.to_datetime({
+        'year': df_cirurgias_mes[COLUNAS["CIRURGIAS_MES"]["ANO"]],
+        'month': df_cirurgias_mes['month_num'],
+        'day': 1
+    })
+    
+    # Ordenar o DataFrame por data
+    df_cirurgias_mes.sort_values('Data', inplace=True)
+    
+    # Criar coluna 'Total' que soma todos os tipos de cirurgias
+    df_cirurgias_mes['Total'] = df_cirurgias_mes[colunas_numericas].sum(axis=1)
+
+    # Séries mensais de cirurgias (total e por tipo), usadas nas previsões e no backtest;
+    # montadas uma vez por planilha e compartilhadas entre as sessões
+    def montar_series_cirurgias():
+        nomes_tipos = {
+            COLUNAS["CIRURGIAS_MES"]["ELETIVAS_SUS"]: 'Eletivas/SUS',
+            COLUNAS["CIRURGIAS_MES"]["ELETIVAS_SUPLEMENTAR"]: 'Eletivas/Suplementar',
+            COLUNAS["CIRURGIAS_MES"]["URGENCIA_SUS"]: 'Urgência/SUS',
+            COLUNAS["CIRURGIAS_MES"]["URGENCIA_SUPLEMENTAR"]: 'Urgência/Suplementar',
+        }
+        series = {
+            nome: df_cirurgias_mes.set_index('Data')[coluna].astype(float)
+            for coluna, nome in nomes_tipos.items()
+        }
+        series['Eletivas'] = series['Eletivas/SUS'] + series['Eletivas/Suplementar']
+        return df_cirurgias_mes.set_index('Data')['Total'].astype(float), series
+
+    serie_cirurgias, series_cc = derivado(hash_planilha, 'series_cirurgias', montar_series_cirurgias)
+
 # =====================================
 # Parte 5: Aba "Porta de Entrada"
 # =====================================
 
-    with tab1:
+    if secao == 'porta':
         st.markdown("Nesta seção, você poderá analisar os dados referentes à porta de entrada do hospital, incluindo a quantidade de pacientes atendidos por mês e por hora, além da distribuição entre pacientes horizontais e verticais. Essas informações são essenciais para entender o fluxo de pacientes e otimizar os recursos hospitalares.")
 
         # Cálculos principais
-        total_pacientes_ano = df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]].sum()
-        total_pacientes_dia = df_horarios[COLUNAS["HORA"]["QUANTIDADE_MEDIA"]].sum()
-        total_pacientes_semana = df_semana[COLUNAS["SEMANAL"]["QUANTIDADE_MEDIA"]].sum()
         total_pacientes_dia_safe = total_pacientes_dia if total_pacientes_dia > 0 else 1  # Proteção contra divisão por zero
 
         # Quantidade de Pontos de Cuidado
         quantidade_pontos_cuidado = df_pontos_cuidado[COLUNAS["PONTOS_CUIDADO"]["QUANTIDADE"]].sum()
 
         # Extração dos indicadores complementares
-        evasao_percent = (
-            df_saida.loc[df_saida[COLUNAS["SAIDA"]["INDICADORES"]] == 'EVASÃO', COLUNAS["SAIDA"]["QUANTIDADE_MEDIA"]].iloc[0]
-            / total_pacientes_dia_safe * 100
-        )
-        abandono_percent = (
-            df_saida.loc[df_saida[COLUNAS["SAIDA"]["INDICADORES"]] == 'ABANDONO', COLUNAS["SAIDA"]["QUANTIDADE_MEDIA"]].iloc[0]
-            / total_pacientes_dia_safe * 100
-        )
-        orientados_percent = (
-            df_orientados[COLUNAS["ORIENTADOS"]["QUANTIDADE_MEDIA"]].iloc[0]
-            / total_pacientes_dia_safe * 100
-        )
-        retorno_48h_percent = (
-            df_retorno.loc[df_retorno[COLUNAS["RETORNO"]["INDICADORES"]] == 'RETORNO EM 48 HORAS', COLUNAS["RETORNO"]["QUANTIDADE_MEDIA"]].iloc[0]
-            / total_pacientes_dia_safe * 100
-        )
-        retorno_72h_percent = (
-            df_retorno.loc[df_retorno[COLUNAS["RETORNO"]["INDICADORES"]] == 'RETORNO EM 72 HORAS', COLUNAS["RETORNO"]["QUANTIDADE_MEDIA"]].iloc[0]
-            / total_pacientes_dia_safe * 100
-        )
+        evasao_percent = evasao_dia / total_pacientes_dia_safe * 100
+        abandono_percent = abandono_dia / total_pacientes_dia_safe * 100
+        orientados_percent = orientados_dia / total_pacientes_dia_safe * 100
+        retorno_48h_percent = retorno_48h_dia / total_pacientes_dia_safe * 100
+        retorno_72h_percent = retorno_72h_dia / total_pacientes_dia_safe * 100
 
         st.markdown("#### 📊 Métricas Gerais")
 
         # Exibição das métricas
         col1, col2, col3, col4, _ = st.columns(5, gap="small")
         with col1:
-            st.metric("Atendimentos/Dia", f"{total_pacientes_dia:.2f}")
+            st.metric("Atendimentos/Dia", f"{total_pacientes_dia:.2f}",
+                      help=texto_intervalo(intervalos_indicadores['Atendimentos/Dia']))
         with col2:
             st.metric("Atendimentos/Semana", f"{total_pacientes_semana:.2f}")
         with col3:
@@ -644,15 +1120,23 @@ if uploaded_file and not missing_sheets:
 
         col5, col6, col7, col8, col9 = st.columns(5, gap="small")
         with col5:
-            st.metric("Orientados p/Rede (%)", f"{orientados_percent:.2f}%")
+            st.metric("Orientados p/Rede (%)", f"{orientados_percent:.2f}%",
+                      help=texto_intervalo(intervalos_indicadores['Orientados p/Rede (%)'], '{:.2f}%'))
         with col6:
-            st.metric("Taxa Evasão (%)", f"{evasao_percent:.2f}%")
+            st.metric("Taxa Evasão (%)", f"{evasao_percent:.2f}%",
+                      help=texto_intervalo(intervalos_indicadores['Taxa Evasão (%)'], '{:.2f}%'))
         with col7:
-            st.metric("Taxa Abandono (%)", f"{abandono_percent:.2f}%")
+            st.metric("Taxa Abandono (%)", f"{abandono_percent:.2f}%",
+                      help=texto_intervalo(intervalos_indicadores['Taxa Abandono (%)'], '{:.2f}%'))
         with col8:
-            st.metric("Retorno em 48h (%)", f"{retorno_48h_percent:.2f}%")
+            st.metric("Retorno em 48h (%)", f"{retorno_48h_percent:.2f}%",
+                      help=texto_intervalo(intervalos_indicadores['Retorno em 48h (%)'], '{:.2f}%'))
         with col9:
-            st.metric("Retorno em 72h (%)", f"{retorno_72h_percent:.2f}%")
+            st.metric("Retorno em 72h (%)", f"{retorno_72h_percent:.2f}%",
+                      help=texto_intervalo(intervalos_indicadores['Retorno em 72h (%)'], '{:.2f}%'))
+
+        st.caption("Passe o cursor sobre o ícone de ajuda de cada indicador para ver o intervalo de 95%, obtido por "
+                   f"reamostragem das contagens diárias (Poisson em {dias_observacao:.0f} dias de observação).")
 
         st.markdown("""---""")
         
@@ -665,105 +1149,91 @@ if uploaded_file and not missing_sheets:
         # Gráfico 1: Quantidade de Pacientes por Mês
         st.markdown("###### 1️⃣ Quantidade de Pacientes por Mês")
         
-        # Mapeamento dos meses em português para números
-        mes_map = {
-            'Jan': 1, 'Fev': 2, 'Mar': 3, 'Abr': 4, 'Mai': 5, 'Jun': 6,
-            'Jul': 7, 'Ago': 8, 'Set': 9, 'Out': 10, 'Nov': 11, 'Dez': 12
-        }
-        
-        # Garantir que o DataFrame possui as colunas necessárias
-        df_mensal = df_mensal.copy()
-        df_mensal['mes_num'] = df_mensal[COLUNAS["MENSAL"]["MES"]].map(mes_map)
-        df_mensal['ano'] = df_mensal[COLUNAS["MENSAL"]["ANO"]]
-        
-        # Criar a coluna 'data' combinando ano e número do mês
-        df_mensal['data'] = pd.to_datetime(
-            df_mensal[['ano', 'mes_num']].rename(columns={'ano': 'year', 'mes_num': 'month'}).assign(day=1)
-        )
-        
-        # Ordenar o DataFrame pela coluna 'data'
-        df_mensal.sort_values('data', inplace=True)
-        
-        # Criar a coluna 'mes_ano_pt' com os meses em português
-        mes_num_map = {
-            1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun',
-            7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'
-        }
-        df_mensal['mes_ano_pt'] = df_mensal['data'].dt.month.map(mes_num_map) + '/' + df_mensal['data'].dt.year.astype(str)
-        
         # Calcular a média anual
         media_anual = df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]].mean()
         
         # Calcular a linha de tendência
-        import statsmodels.api as sm
-        
-        df_mensal['x_numeric'] = range(len(df_mensal))
-        X = sm.add_constant(df_mensal['x_numeric'])
-        model = sm.OLS(df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]], X).fit()
-        df_mensal['trend'] = model.predict(X)
-        
-        # Criar o gráfico de barras
-        fig_barras = go.Figure()
-        
-        # Adicionar as barras
-        fig_barras.add_trace(go.Bar(
-            x=df_mensal['mes_ano_pt'],
-            y=df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]],
-            marker_color=df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]],
-            marker=dict(color=df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]], colorscale='Blues'),
-            name='Quantidade de Pacientes',
-            text=df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]],
-            textposition='inside',
-            texttemplate='%{text:.0f}'
-        ))
-        
-        # Adicionar a linha da média anual
-        fig_barras.add_trace(go.Scatter(
-            x=df_mensal['mes_ano_pt'],
-            y=[media_anual]*len(df_mensal),
-            mode='lines',
-            line=dict(color='Red', width=2, dash='dash'),
-            name='Média Anual'
-        ))
-        
-        # Adicionar a linha de tendência
-        fig_barras.add_trace(go.Scatter(
-            x=df_mensal['mes_ano_pt'],
-            y=df_mensal['trend'],
-            mode='lines',
-            line=dict(color='green', width=2),
-            name='Tendência'
-        ))
-        
-        # Adicionar anotação para o valor médio
-        fig_barras.add_annotation(
-            x=df_mensal['mes_ano_pt'].iloc[-1],
-            y=media_anual,
-            text=f"Média: {media_anual:.2f}",
-            showarrow=False,
-            xanchor='left',
-            yanchor='bottom',
-            yshift=10,
-            font=dict(color="Red")
-        )
+        df_mensal['trend'] = ajustar_tendencia(df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]])['ajustado']
+
+        # Anomalias das séries de pacientes (calculadas uma vez por planilha; reexecuções usam o cache)
+        perfil_chegadas_hora = perfil_horario(matriz_demanda, arredondar=True)
+        anomalias_porta = detectar_lote({
+            'Pacientes por Mês': (df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]].to_numpy(dtype=float), 12, False),
+            'Chegadas por Hora': (perfil_horario(matriz_demanda), None, True),
+        })
+        anomalias_mensal = anomalias_porta[anomalias_porta['serie'] == 'Pacientes por Mês']
+        anomalias_hora = anomalias_porta[anomalias_porta['serie'] == 'Chegadas por Hora']
         
-        # Atualizar o layout
-        fig_barras.update_layout(
-            xaxis_title='Mês/Ano',
-            yaxis_title='Quantidade de Pacientes',
-            xaxis_tickangle=-45,
-            template='plotly_white',
-            coloraxis_showscale=True,
-            legend=dict(
-                orientation='h',
+        def construir_fig_barras():
+            # Criar o gráfico de barras
+            fig_barras = go.Figure()
+            
+            # Adicionar as barras
+            fig_barras.add_trace(go.Bar(
+                x=df_mensal['mes_ano_pt'],
+                y=df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]],
+                marker_color=df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]],
+                marker=dict(color=df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]], colorscale='Blues'),
+                name='Quantidade de Pacientes',
+                textposition='inside',
+                texttemplate='%{y:.0f}'
+            ))
+            
+            # Adicionar a linha da média anual
+            fig_barras.add_trace(go.Scatter(
+                x=df_mensal['mes_ano_pt'],
+                y=[media_anual]*len(df_mensal),
+                mode='lines',
+                line=dict(color='Red', width=2, dash='dash'),
+                name='Média Anual'
+            ))
+            
+            # Adicionar a linha de tendência
+            fig_barras.add_trace(go.Scatter(
+                x=df_mensal['mes_ano_pt'],
+                y=df_mensal['trend'],
+                mode='lines',
+                line=dict(color='green', width=2),
+                name='Tendência'
+            ))
+            
+            # Adicionar anotação para o valor médio
+            fig_barras.add_annotation(
+                x=df_mensal['mes_ano_pt'].iloc[-1],
+                y=media_anual,
+                text=f"Média: {media_anual:.2f}",
+                showarrow=False,
+                xanchor='left',
                 yanchor='bottom',
-                y=1.02,
-                xanchor='right',
-                x=1
+                yshift=10,
+                font=dict(color="Red")
             )
-        )
-        
+            
+            # Atualizar o layout
+            fig_barras.update_layout(
+                xaxis_title='Mês/Ano',
+                yaxis_title='Quantidade de Pacientes',
+                xaxis_tickangle=-45,
+                template=TEMA,
+                coloraxis_showscale=True,
+                legend=dict(
+                    orientation='h',
+                    yanchor='bottom',
+                    y=1.02,
+                    xanchor='right',
+                    x=1
+                )
+            )
+            
+            destacar_anomalias(
+                fig_barras, df_mensal['mes_ano_pt'], df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]], anomalias_mensal
+            )
+            return fig_barras
+
+        fig_barras = figura_em_cache(hash_planilha, 'pacientes_mes', construir_fig_barras)
         st.plotly_chart(fig_barras, use_container_width=True)
+        if not anomalias_mensal.empty:
+            st.warning(texto_anomalias(anomalias_mensal, list(df_mensal['mes_ano_pt'])))
         
         # Observação analítica
         st.markdown("**Observação analítica:**")
@@ -788,6 +1258,33 @@ if uploaded_file and not missing_sheets:
             st.write(f"O mês com o menor volume de atendimentos foi **{', '.join(mes_min)}**, com uma queda de {media_anual - pacientes_min:.0f} pacientes em relação à média.")
         
         st.markdown("---")
+
+        # Previsão de demanda (Holt-Winters)
+        st.markdown("###### 📅 Previsão de Pacientes por Mês")
+        # Trocar o horizonte reexecuta apenas a previsão
+        @st.fragment
+        def exibir_previsao_porta():
+            horizonte_porta = st.radio(
+                "Horizonte da previsão (meses)", [3, 6, 12], index=1, horizontal=True, key="horizonte_previsao_porta"
+            )
+            try:
+                previsao_porta = prever(serie_pacientes, horizonte=horizonte_porta)
+            except ValueError as e:
+                st.warning(f"Não foi possível gerar a previsão de pacientes: {e}")
+            else:
+                st.plotly_chart(grafico_previsao(
+                    df_mensal['data'], df_mensal[COLUNAS["MENSAL"]["QUANTIDADE_PACIENTES"]], previsao_porta,
+                    f'Pacientes por Mês - Previsão para {horizonte_porta} Meses', 'Quantidade de Pacientes'
+                ), use_container_width=True)
+                tabela_porta = previsao_porta['previsao']
+                st.write(f"Modelo: **{previsao_porta['modelo']}**. A previsão para os próximos **{horizonte_porta}** meses soma "
+                         f"**{tabela_porta['previsao'].sum():.0f}** pacientes (média de **{tabela_porta['previsao'].mean():.0f}**/mês, "
+                         f"contra **{media_anual:.0f}**/mês no histórico).")
+                st.caption("A faixa sombreada é o intervalo de previsão de 95%, obtido por simulação do modelo ajustado.")
+
+        exibir_previsao_porta()
+
+        st.markdown("---")
         
         # Gráfico 2: Média de Chegada de Pacientes por Dia da Semana
         st.markdown("###### 2️⃣ Média de Chegada de Pacientes por Dia da Semana")
@@ -796,11 +1293,10 @@ if uploaded_file and not missing_sheets:
             x=COLUNAS["SEMANAL"]["DIA"],
             y=COLUNAS["SEMANAL"]["QUANTIDADE_MEDIA"],
             color=COLUNAS["SEMANAL"]["QUANTIDADE_MEDIA"],
-            color_continuous_scale='Blues',
-            text=COLUNAS["SEMANAL"]["QUANTIDADE_MEDIA"]
+            color_continuous_scale='Blues'
         )
         
-        fig_semana.update_traces(texttemplate='%{text:.1f}', textposition='inside')
+        fig_semana.update_traces(texttemplate='%{y:.1f}', textposition='inside')
         
         # Adicionar linha de tendência
         fig_semana.add_trace(
@@ -829,11 +1325,13 @@ if uploaded_file and not missing_sheets:
                 x='hora',
                 y="quantidade_media_pacientes (arredondado)",
                 color="quantidade_media_pacientes (arredondado)",
-                color_continuous_scale='Blues',
-                text="quantidade_media_pacientes (arredondado)"
+                color_continuous_scale='Blues'
             )
-            fig_horarios.update_traces(texttemplate='%{text:.1f}', textposition='inside')
+            fig_horarios.update_traces(texttemplate='%{y:.1f}', textposition='inside')
+            destacar_anomalias(fig_horarios, range(24), perfil_chegadas_hora, anomalias_hora)
             st.plotly_chart(fig_horarios, use_container_width=True)
+            if not anomalias_hora.empty:
+                st.warning(texto_anomalias(anomalias_hora, [f"{hora:02d}h" for hora in range(24)]))
         
         st.markdown("**Observação analítica:**")
         pico_hora = df_horarios.loc[df_horarios["quantidade_media_pacientes (arredondado)"].idxmax(), 'hora']
@@ -884,11 +1382,10 @@ if uploaded_file and not missing_sheets:
                 COLUNAS["CLASSIFICACAO"]["CLASSIFICACAO"]: 'Classificação',
                 COLUNAS["CLASSIFICACAO"]["QUANTIDADE_PACIENTES"]: 'Quantidade de Pacientes'
             },
-            template='plotly_white',
-            text=COLUNAS["CLASSIFICACAO"]["QUANTIDADE_PACIENTES"]
+            template=TEMA
         )
         
-        fig_classificacao.update_traces(texttemplate='%{text:.0f}', textposition='inside')
+        fig_classificacao.update_traces(texttemplate='%{y:.0f}', textposition='inside')
         fig_classificacao.update_layout(
             xaxis_title='Classificação',
             yaxis_title='Quantidade de Pacientes',
@@ -983,9 +1480,8 @@ if uploaded_file and not missing_sheets:
             mode='lines+markers+text',
             line=dict(color='blue'),
             name='Pacientes Acumulados',
-            text=df_mensal['pacientes_acumulados'],
             textposition="top center",
-            texttemplate='%{text:.0f}'
+            texttemplate='%{y:.0f}'
         ))
         
         # Atualizar o layout
@@ -993,7 +1489,7 @@ if uploaded_file and not missing_sheets:
             xaxis_title='Mês/Ano',
             yaxis_title='Pacientes Acumulados',
             xaxis_tickangle=-45,
-            template='plotly_white',
+            template=TEMA,
             showlegend=True
         )
         
@@ -1042,10 +1538,9 @@ if uploaded_file and not missing_sheets:
         fig_comparacao = px.bar(
             x=['Estimativa Anual (Média/Dia)', 'Estimativa Anual (Média/Semana)', 'Estimativa Anual (Volumetria/Mês)'],
             y=[estimativa_anual_dia, estimativa_anual_semana, estimativa_anual_mes],
-            labels={"x": "Método", "y": "Estimativa Anual de Pacientes"},
-            text=[estimativa_anual_dia, estimativa_anual_semana, estimativa_anual_mes]
+            labels={"x": "Método", "y": "Estimativa Anual de Pacientes"}
         )
-        fig_comparacao.update_traces(texttemplate='%{text:.0f}', textposition='inside')
+        fig_comparacao.update_traces(texttemplate='%{y:.0f}', textposition='inside')
         st.plotly_chart(fig_comparacao, use_container_width=True)
         
         # Observação analítica aprimorada
@@ -1074,7 +1569,7 @@ if uploaded_file and not missing_sheets:
 # Parte 7: Aba "Triagem"
 # =====================================
     
-    with tab2:
+    if secao == 'triagem':
         st.markdown("""
         Nesta seção, você vai analisar o processo de triagem dos pacientes, incluindo a distribuição por urgência, a disponibilidade média de enfermeiros por horário, o número de salas de triagem e o tempo médio de atendimento.
         """)
@@ -1082,9 +1577,6 @@ if uploaded_file and not missing_sheets:
         # Métricas Gerais - Triagem
         st.markdown("#### 📊 Métricas Gerais")
 
-        num_salas = df_triagem_salas[COLUNAS["TRIAGEM_SALAS"]["NUM_SALAS"]].iloc[0]
-        tempo_medio_atendimento = df_triagem_tempo[COLUNAS["TRIAGEM_TEMPO"]["TEMPO_MEDIO_ATENDIMENTO"]].iloc[0]
-
         # Cálculo do Percentual de Risco Maior (%)
         triagens_emergencia = df_triagem_urgencia.loc[df_triagem_urgencia[COLUNAS["TRIAGEM_URGENCIA"]["URGENCIA"]] == 'EMERGÊNCIA', COLUNAS["TRIAGEM_URGENCIA"]["QUANTIDADE_PACIENTES"]].values[0]
         triagens_muito_urgente = df_triagem_urgencia.loc[df_triagem_urgencia[COLUNAS["TRIAGEM_URGENCIA"]["URGENCIA"]] == 'MUITO URGENTE', COLUNAS["TRIAGEM_URGENCIA"]["QUANTIDADE_PACIENTES"]].values[0]
@@ -1128,58 +1620,62 @@ if uploaded_file and not missing_sheets:
             df_triagem_urgencia_sorted['percentual (%)'] = (df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["QUANTIDADE_PACIENTES"]] / total_triagens) * 100
             df_triagem_urgencia_sorted["percentual_acumulado"] = df_triagem_urgencia_sorted['percentual (%)'].cumsum()
         
-            # Criando o gráfico de barras
-            fig_pareto_triagem = go.Figure()
-        
-            # Gráfico de barras (Quantidade de Pacientes)
-            fig_pareto_triagem.add_trace(go.Bar(
-                x=df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["URGENCIA"]],
-                y=df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["QUANTIDADE_PACIENTES"]],
-                name="Quantidade de Pacientes",
-                marker_color='blue',
-                yaxis="y1",
-                text=df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["QUANTIDADE_PACIENTES"]],
-                textposition='inside'
-            ))
-        
-            # Curva de porcentagem acumulada (linha)
-            fig_pareto_triagem.add_trace(go.Scatter(
-                x=df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["URGENCIA"]],
-                y=df_triagem_urgencia_sorted["percentual_acumulado"],
-                name="Porcentagem Acumulada",
-                mode="lines+markers+text",
-                line=dict(color="orange"),
-                yaxis="y2",
-                text=[f"{x:.1f}%" for x in df_triagem_urgencia_sorted["percentual_acumulado"]],
-                textposition="top center"
-            ))
-        
-            # Atualizando o layout
-            fig_pareto_triagem.update_layout(
-                title="Gráfico de Pareto: Distribuição de Triagens por Urgência",
-                template="plotly_white",
-                yaxis=dict(
-                    title="Quantidade de Pacientes",
-                    showgrid=False,
-                ),
-                yaxis2=dict(
-                    title="Porcentagem Acumulada",
-                    overlaying="y",
-                    side="right",
-                    range=[0, 100],
-                    showgrid=False,
-                    ticksuffix="%"
-                ),
-                xaxis=dict(
-                    title="Urgência",
-                    categoryorder='total descending'
-                ),
-                legend=dict(
-                    x=1.05, y=1.0,
-                    xanchor='left',
-                    yanchor='top'
+            def construir_fig_pareto_triagem():
+                # Criando o gráfico de barras
+                fig_pareto_triagem = go.Figure()
+            
+                # Gráfico de barras (Quantidade de Pacientes)
+                fig_pareto_triagem.add_trace(go.Bar(
+                    x=df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["URGENCIA"]],
+                    y=df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["QUANTIDADE_PACIENTES"]],
+                    name="Quantidade de Pacientes",
+                    marker_color='blue',
+                    yaxis="y1",
+                    text=df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["QUANTIDADE_PACIENTES"]],
+                    textposition='inside'
+                ))
+            
+                # Curva de porcentagem acumulada (linha)
+                fig_pareto_triagem.add_trace(go.Scatter(
+                    x=df_triagem_urgencia_sorted[COLUNAS["TRIAGEM_URGENCIA"]["URGENCIA"]],
+                    y=df_triagem_urgencia_sorted["percentual_acumulado"],
+                    name="Porcentagem Acumulada",
+                    mode="lines+markers+text",
+                    line=dict(color="orange"),
+                    yaxis="y2",
+                    texttemplate='%{y:.1f}%',
+                    textposition="top center"
+                ))
+            
+                # Atualizando o layout
+                fig_pareto_triagem.update_layout(
+                    title="Gráfico de Pareto: Distribuição de Triagens por Urgência",
+                    template=TEMA,
+                    yaxis=dict(
+                        title="Quantidade de Pacientes",
+                        showgrid=False,
+                    ),
+                    yaxis2=dict(
+                        title="Porcentagem Acumulada",
+                        overlaying="y",
+                        side="right",
+                        range=[0, 100],
+                        showgrid=False,
+                        ticksuffix="%"
+                    ),
+                    xaxis=dict(
+                        title="Urgência",
+                        categoryorder='total descending'
+                    ),
+                    legend=dict(
+                        x=1.05, y=1.0,
+                        xanchor='left',
+                        yanchor='top'
+                    )
                 )
-            )
+                return fig_pareto_triagem
+
+            fig_pareto_triagem = figura_em_cache(hash_planilha, 'pareto_triagem', construir_fig_pareto_triagem)
         
             # Exibindo o gráfico no Streamlit
             st.plotly_chart(fig_pareto_triagem, use_container_width=True)
@@ -1239,15 +1735,25 @@ if uploaded_file and not missing_sheets:
         st.markdown("###### Análise Complementar: Distribuição de Enfermeiros por Período")
 
         with st.container():
-            fig_box_enfermeiros = px.box(
-                df_triagem_enfermeiros,
-                x='Período',
-                y="quantidade_media_enfermeiros (arredondado)",
-                color='Período',
-                title="Box-Plot da Quantidade de Enfermeiros por Período",
-                points="all",
-                color_discrete_sequence=px.colors.qualitative.Plotly
-            )
+            if len(df_triagem_enfermeiros) > LIMIAR_PONTOS:
+                # Muitas linhas: quartis calculados aqui, sem enviar cada ponto ao navegador
+                fig_box_enfermeiros = caixas_agrupadas(
+                    df_triagem_enfermeiros,
+                    'Período',
+                    "quantidade_media_enfermeiros (arredondado)",
+                    px.colors.qualitative.Plotly,
+                    titulo="Box-Plot da Quantidade de Enfermeiros por Período"
+                )
+            else:
+                fig_box_enfermeiros = px.box(
+                    df_triagem_enfermeiros,
+                    x='Período',
+                    y="quantidade_media_enfermeiros (arredondado)",
+                    color='Período',
+                    title="Box-Plot da Quantidade de Enfermeiros por Período",
+                    points="all",
+                    color_discrete_sequence=px.colors.qualitative.Plotly
+                )
             st.plotly_chart(fig_box_enfermeiros, use_container_width=True)
 
         # Observação analítica
@@ -1255,6 +1761,118 @@ if uploaded_file and not missing_sheets:
         st.write("O box-plot permite visualizar a distribuição da quantidade de enfermeiros em cada período, identificando variações e possíveis necessidades de ajuste na alocação de pessoal.")
         st.write("Isso é crucial para garantir a eficiência no atendimento e a satisfação dos pacientes.")
 
+        st.markdown("---")
+
+        # Otimização da Escala de Enfermeiros da Triagem
+        st.markdown("###### 4️⃣ Otimização da Escala de Enfermeiros da Triagem")
+        st.markdown("""
+        Calcula, para cada hora, o número de enfermeiros necessário para atender à meta de espera (modelo M/M/c),
+        limitado ao número de salas de triagem, e escolhe os turnos que cobrem esse requisito com o menor total de horas-enfermeiro.
+        """)
+
+        # Os parâmetros da escala reexecutam apenas este trecho
+        @st.fragment
+        def exibir_escala_triagem():
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                tempo_espera_alvo_triagem = st.number_input(
+                    "Tempo de espera alvo na triagem (min)", min_value=1.0, max_value=120.0, value=10.0, step=1.0,
+                    key="tempo_espera_alvo_triagem"
+                )
+            with col2:
+                utilizacao_maxima_triagem = st.slider(
+                    "Utilização máxima (%)", min_value=50, max_value=99, value=85, key="utilizacao_maxima_triagem"
+                )
+            with col3:
+                duracoes_turno = st.multiselect(
+                    "Durações de turno (h)", [4, 6, 8, 12], default=[6, 12], key="duracoes_turno_triagem"
+                )
+
+            # Série horária completa (0h-23h)
+            demanda_hora_triagem = pd.Series(perfil_horario(matriz_demanda), index=range(24))
+
+            if not duracoes_turno:
+                st.warning("Selecione ao menos uma duração de turno.")
+            elif tempo_medio_atendimento <= 0:
+                st.warning("O tempo médio de atendimento da triagem precisa ser maior que zero.")
+            else:
+                requisito_enfermeiros, horas_sem_meta = requisito_por_hora(
+                    demanda_hora_triagem.to_numpy(),
+                    float(tempo_medio_atendimento),
+                    tempo_espera_alvo_triagem,
+                    rho_maximo=utilizacao_maxima_triagem / 100,
+                    limite=int(num_salas)
+                )
+                escala = otimizar_escala(requisito_enfermeiros, duracoes=tuple(sorted(duracoes_turno)), limite=int(num_salas))
+
+                horas_enfermeiro_atual = enfermeiros_hora_atual.sum()
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Horas-Enfermeiro/Dia (Atual)", f"{horas_enfermeiro_atual:.1f}")
+                with col2:
+                    st.metric(
+                        "Horas-Enfermeiro/Dia (Proposta)", f"{escala['horas']:.0f}",
+                        delta=f"{escala['horas'] - horas_enfermeiro_atual:.1f}", delta_color="inverse"
+                    )
+                with col3:
+                    st.metric("Turnos na Escala", f"{sum(q for _, _, q in escala['turnos'])}")
+
+                fig_escala = go.Figure()
+                fig_escala.add_trace(go.Bar(
+                    x=list(range(24)),
+                    y=escala['cobertura'],
+                    name='Cobertura Proposta',
+                    marker_color='lightblue'
+                ))
+                fig_escala.add_trace(go.Scatter(
+                    x=list(range(24)),
+                    y=requisito_enfermeiros,
+                    mode='lines+markers',
+                    name='Requisito (M/M/c)',
+                    line=dict(color='red', width=2, shape='hv')
+                ))
+                fig_escala.add_trace(go.Scatter(
+                    x=list(range(24)),
+                    y=enfermeiros_hora_atual,
+                    mode='lines',
+                    name='Enfermeiros Atuais',
+                    line=dict(color='green', width=2, dash='dash', shape='hv')
+                ))
+                fig_escala.add_hline(
+                    y=int(num_salas), line_dash="dot", line_color="gray",
+                    annotation_text="Salas de Triagem", annotation_position="top left"
+                )
+                fig_escala.update_layout(
+                    title='Requisito vs Cobertura de Enfermeiros por Hora',
+                    xaxis_title='Hora',
+                    yaxis_title='Enfermeiros',
+                    xaxis=dict(tickmode='linear', dtick=1)
+                )
+                st.plotly_chart(fig_escala, use_container_width=True)
+
+                df_turnos = pd.DataFrame(escala['turnos'], columns=['Hora de Início', 'Duração (h)', 'Enfermeiros'])
+                df_turnos['Horário'] = df_turnos.apply(
+                    lambda row: f"{row['Hora de Início']:02d}:00 - {(row['Hora de Início'] + row['Duração (h)']) % 24:02d}:00", axis=1
+                ) if not df_turnos.empty else []
+                st.dataframe(df_turnos[['Horário', 'Duração (h)', 'Enfermeiros']])
+                st.caption(f"Escala resolvida pelo método {escala['metodo']}.")
+                if escala['excede_limite']:
+                    st.warning(f"Com as durações de turno escolhidas, nenhuma escala cobre o requisito sem passar de {int(num_salas)} "
+                               "enfermeiro(s) por hora (uma por sala de triagem); a escala proposta ultrapassa o número de salas "
+                               "em algumas horas. Inclua turnos mais curtos para respeitar o limite.")
+
+                st.markdown("**Observação analítica:**")
+                if horas_sem_meta.any():
+                    horas_lista = ', '.join(f"{h}h" for h in np.flatnonzero(horas_sem_meta))
+                    st.write(f"Nas horas {horas_lista} a meta de espera não é atingível com {int(num_salas)} sala(s) de triagem; o requisito foi limitado ao número de salas.")
+                horas_descobertas = np.flatnonzero(enfermeiros_hora_atual.to_numpy() < requisito_enfermeiros)
+                if len(horas_descobertas) > 0:
+                    st.write(f"A escala atual fica abaixo do requisito em {len(horas_descobertas)} hora(s) do dia: {', '.join(f'{h}h' for h in horas_descobertas)}.")
+                else:
+                    st.write("A escala atual cobre o requisito em todas as horas do dia.")
+
+        exibir_escala_triagem()
+
         st.markdown("---")
         
         with st.container():
@@ -1299,7 +1917,7 @@ if uploaded_file and not missing_sheets:
 # Parte 7: Aba "Consulta"
 # =====================================
     
-    with tab3:
+    if secao == 'consulta':
         st.markdown("""
         Nesta seção, você poderá analisar os dados referentes às consultas médicas, incluindo o tempo médio por etapa da consulta, a distribuição de médicos por horário, dia da semana e especialidade. Essas informações são essenciais para otimizar o fluxo de consultas e a alocação de recursos humanos.
         """)
@@ -1359,10 +1977,9 @@ if uploaded_file and not missing_sheets:
                         x=COLUNAS["CONSULTA_TEMPO"]["ETAPA"],
                         y=COLUNAS["CONSULTA_TEMPO"]["TEMPO_MEDIO_ETAPA"],
                         color=COLUNAS["CONSULTA_TEMPO"]["TEMPO_MEDIO_ETAPA"],
-                        color_continuous_scale='Blues',
-                        text=COLUNAS["CONSULTA_TEMPO"]["TEMPO_MEDIO_ETAPA"]  # Adiciona o texto para os rótulos
+                        color_continuous_scale='Blues'
                     )
-                    fig_etapas.update_traces(texttemplate='%{text:.1f}', textposition='inside')  # Formata e posiciona os rótulos
+                    fig_etapas.update_traces(texttemplate='%{y:.1f}', textposition='inside')  # Formata e posiciona os rótulos
                     st.plotly_chart(fig_etapas, use_container_width=True)
             
                     # Observação analítica
@@ -1388,10 +2005,9 @@ if uploaded_file and not missing_sheets:
                         x='hora',
                         y=COLUNAS["MEDIA_MEDICOS_CONSULTA"]["QUANTIDADE_MEDIA_MEDICOS"],
                         color=COLUNAS["MEDIA_MEDICOS_CONSULTA"]["QUANTIDADE_MEDIA_MEDICOS"],
-                        color_continuous_scale='Blues',
-                        text=COLUNAS["MEDIA_MEDICOS_CONSULTA"]["QUANTIDADE_MEDIA_MEDICOS"]  # Adiciona o texto para os rótulos
+                        color_continuous_scale='Blues'
                     )
-                    fig_medicos_horario.update_traces(texttemplate='%{text:.1f}', textposition='inside')  # Formata e posiciona os rótulos
+                    fig_medicos_horario.update_traces(texttemplate='%{y:.1f}', textposition='inside')  # Formata e posiciona os rótulos
                     st.plotly_chart(fig_medicos_horario, use_container_width=True)
             
                     # Observação analítica
@@ -1431,10 +2047,9 @@ if uploaded_file and not missing_sheets:
                         y='Quantidade de Médicos',
                         color='Período',
                         barmode='group',
-                        color_discrete_sequence=px.colors.qualitative.Plotly,
-                        text='Quantidade de Médicos'  # Adiciona o texto para os rótulos
+                        color_discrete_sequence=px.colors.qualitative.Plotly
                     )
-                    fig_medicos_semana.update_traces(texttemplate='%{text:.1f}', textposition='inside')  # Formata e posiciona os rótulos
+                    fig_medicos_semana.update_traces(texttemplate='%{y:.1f}', textposition='inside')  # Formata e posiciona os rótulos
                     st.plotly_chart(fig_medicos_semana, use_container_width=True)
                 
                         
@@ -1487,7 +2102,7 @@ if uploaded_file and not missing_sheets:
 # Parte 8: "SADT" 
 # =====================================
     
-    with tab4:
+    if secao == 'sadt':
         st.markdown("""
         Nesta seção, você vai analisar os dados relacionados aos exames realizados (SADT), incluindo o tempo médio de realização de cada tipo de exame e a quantidade de pacientes que realizaram esses exames.
         """)
@@ -1509,12 +2124,11 @@ if uploaded_file and not missing_sheets:
                     orientation='h',
                     color=COLUNAS["EXAMES_SADT"]["TEMPO_MEDIO_EXAME"],
                     color_continuous_scale='Blues',
-                    template="plotly_white",
-                    text=COLUNAS["EXAMES_SADT"]["TEMPO_MEDIO_EXAME"]  # Adiciona o texto nas barras
+                    template=TEMA
                 )
                 
                 # Configurar o layout para melhorar a aparência
-                fig_tempo_barras.update_traces(texttemplate='%{text:.1f}', textposition='inside')
+                fig_tempo_barras.update_traces(texttemplate='%{x:.1f}', textposition='inside')
                 fig_tempo_barras.update_layout(uniformtext_minsize=8, uniformtext_mode='hide')
                 
                 # Ajustar as margens para garantir que os rótulos externos sejam visíveis
@@ -1566,13 +2180,13 @@ if uploaded_file and not missing_sheets:
                     mode="lines+markers+text",
                     line=dict(color="orange"),
                     yaxis="y2",
-                    text=[f"{x:.1f}%" for x in df_exames_sadt_sorted["Porcentagem_Acumulada"]],
+                    texttemplate='%{y:.1f}%',
                     textposition="top center"
                 ))
             
                 # Updating the layout
                 fig_pareto.update_layout(
-                    template="plotly_white",
+                    template=TEMA,
                     yaxis=dict(
                         title="Quantidade de Pacientes",
                         showgrid=False,
@@ -1634,12 +2248,52 @@ if uploaded_file and not missing_sheets:
                 st.write(f"3. **Concentração**: Os três exames mais frequentes juntos representam **{percentual_top_3:.2f}%** do total. " +
                          ("Isso sugere uma alta concentração em poucos tipos de exames." if percentual_top_3 > 50 else "Isso indica uma distribuição relativamente equilibrada entre os tipos de exames."))
 
+            st.markdown("---")
 
-# =====================================
+            st.markdown("###### 4️⃣ Previsão de Exames por Tipo")
+            # Trocar o horizonte reexecuta apenas a previsão
+            @st.fragment
+            def exibir_previsao_exames():
+                horizonte_sadt = st.radio(
+                    "Horizonte da previsão (meses)", [3, 6, 12], index=1, horizontal=True, key="horizonte_previsao_sadt"
+                )
+                # Sem histórico mensal por exame: rateio da previsão de pacientes pela razão exames/paciente
+                previsao_pacientes_lote = prever_lote({'Pacientes': serie_pacientes}, horizonte=horizonte_sadt)
+                exames_por_paciente = {
+                    tipo: quantidade / serie_pacientes.mean()
+                    for tipo, quantidade in zip(
+                        df_exames_sadt[COLUNAS["EXAMES_SADT"]["TIPO_EXAME"]],
+                        df_exames_sadt[COLUNAS["EXAMES_SADT"]["QUANTIDADE_PACIENTE_EXAME_MES"]]
+                    )
+                } if serie_pacientes.mean() > 0 else {}
+                previsao_exames = alocar_proporcional(previsao_pacientes_lote, exames_por_paciente, normalizar=False)
+
+                if previsao_exames.empty:
+                    st.info("Não há dados suficientes para prever os exames.")
+                else:
+                    fig_previsao_exames = px.line(
+                        previsao_exames, x='data', y='previsao', color='serie', markers=True,
+                        labels={'data': 'Mês', 'previsao': 'Pacientes Previstos', 'serie': 'Exame'},
+                        template=TEMA
+                    )
+                    fig_previsao_exames.update_layout(xaxis=dict(tickformat='%b %Y'))
+                    st.plotly_chart(fig_previsao_exames, use_container_width=True)
+
+                    resumo_exames = previsao_exames.groupby('serie', sort=False)[['previsao', 'inferior', 'superior']].mean().round(0)
+                    resumo_exames.index.name = 'Exame'
+                    resumo_exames.columns = ['Média Prevista/Mês', 'Limite Inferior', 'Limite Superior']
+                    st.dataframe(resumo_exames)
+                    st.caption("Sem histórico mensal por exame, a previsão de cada exame acompanha a previsão de pacientes da Porta de Entrada, "
+                               "mantendo a razão atual de exames por paciente.")
+
+            exibir_previsao_exames()
+
+
+# =====================================
 # Parte 9: "Passagem & Internação" com Todas as Visualizações
 # =====================================
 
-    with tab5:
+    if secao == 'passagem':
         st.markdown("""
         ## 🏥 Passagem & Internação
         Nesta seção, você poderá analisar os dados referentes à Passagem de Setores e Internação, incluindo métricas de utilização de leitos, tempo médio de permanência e taxa de ocupação.
@@ -1682,12 +2336,11 @@ if uploaded_file and not missing_sheets:
                 COLUNAS["PASSAGEM_SETORES"]["SETORES"]: "Setores",
                 COLUNAS["PASSAGEM_SETORES"]["QUANTIDADE_LEITOS"]: "Quantidade de Leitos"
             },
-            template='plotly_white',
+            template=TEMA,
             color=COLUNAS["PASSAGEM_SETORES"]["QUANTIDADE_LEITOS"],
-            color_continuous_scale='Blues',
-            text=COLUNAS["PASSAGEM_SETORES"]["QUANTIDADE_LEITOS"]
+            color_continuous_scale='Blues'
         )
-        fig_leitos_setor.update_traces(textposition='inside', texttemplate='%{text:.0f}')
+        fig_leitos_setor.update_traces(textposition='inside', texttemplate='%{y:.0f}')
         st.plotly_chart(fig_leitos_setor, use_container_width=True)
     
         # Gráfico: Tempo Médio de Permanência por Setor
@@ -1703,12 +2356,11 @@ if uploaded_file and not missing_sheets:
                 COLUNAS["PASSAGEM_SETORES"]["SETORES"]: "Setores",
                 COLUNAS["PASSAGEM_SETORES"]["TEMPO_MEDIO_PERMANENCIA_DIAS"]: "Tempo Médio de Permanência (dias)"
             },
-            template='plotly_white',
+            template=TEMA,
             color=COLUNAS["PASSAGEM_SETORES"]["TEMPO_MEDIO_PERMANENCIA_DIAS"],
-            color_continuous_scale='Blues',
-            text=COLUNAS["PASSAGEM_SETORES"]["TEMPO_MEDIO_PERMANENCIA_DIAS"]
+            color_continuous_scale='Blues'
         )
-        fig_tempo_permanencia.update_traces(textposition='inside', texttemplate='%{text:.1f}')
+        fig_tempo_permanencia.update_traces(textposition='inside', texttemplate='%{y:.1f}')
         st.plotly_chart(fig_tempo_permanencia, use_container_width=True)
     
         # Gráfico: Taxa de Ocupação por Setor
@@ -1725,12 +2377,11 @@ if uploaded_file and not missing_sheets:
                 COLUNAS["PASSAGEM_SETORES"]["SETORES"]: "Setores",
                 taxa_ocupacao_col: "Taxa de Ocupação (%)"
             },
-            template='plotly_white',
+            template=TEMA,
             color=taxa_ocupacao_col,
-            color_continuous_scale='Blues',
-            text=taxa_ocupacao_col
+            color_continuous_scale='Blues'
         )
-        fig_taxa_ocupacao.update_traces(texttemplate='%{text:.1f}%', textposition='inside')
+        fig_taxa_ocupacao.update_traces(texttemplate='%{y:.1f}%', textposition='inside')
         st.plotly_chart(fig_taxa_ocupacao, use_container_width=True)
     
         st.markdown("---")
@@ -1772,11 +2423,10 @@ if uploaded_file and not missing_sheets:
                 COLUNAS["TEMPO_PERMANENCIA_LEITOS"]["TEMPO_MEDIO_PERMANENCIA_LEITO"]: "Tempo Médio de Permanência (min)",
                 COLUNAS["TEMPO_PERMANENCIA_LEITOS"]["CLASSIFICACAO_SALAS_CIRURGICAS"]: "Classificação"
             },
-            template='plotly_white',
-            color_discrete_sequence=color_sequence,
-            text=COLUNAS["TEMPO_PERMANENCIA_LEITOS"]["TEMPO_MEDIO_PERMANENCIA_LEITO"]
+            template=TEMA,
+            color_discrete_sequence=color_sequence
         )
-        fig_tempo_leitos.update_traces(textposition='inside', texttemplate='%{text:.0f}')
+        fig_tempo_leitos.update_traces(textposition='inside', texttemplate='%{y:.0f}')
         fig_tempo_leitos.update_layout(
             xaxis_tickangle=-45,
             xaxis=dict(title='Tipo de Leito'),
@@ -1815,12 +2465,11 @@ if uploaded_file and not missing_sheets:
                 COLUNAS["INTERNACAO_DEMANDA"]["SOLICITACOES_LEITO"]: "Solicitações de Leito",
                 COLUNAS["INTERNACAO_DEMANDA"]["MEDIA_SOLICITACOES_DIA"]: "Média de Solicitações por Dia"
             },
-            template='plotly_white',
+            template=TEMA,
             color=COLUNAS["INTERNACAO_DEMANDA"]["MEDIA_SOLICITACOES_DIA"],
-            color_continuous_scale='Blues',
-            text=COLUNAS["INTERNACAO_DEMANDA"]["MEDIA_SOLICITACOES_DIA"]
+            color_continuous_scale='Blues'
         )
-        fig_solicitacoes_leitos.update_traces(texttemplate='%{text:.1f}', textposition='inside')
+        fig_solicitacoes_leitos.update_traces(texttemplate='%{y:.1f}', textposition='inside')
         fig_solicitacoes_leitos.update_layout(xaxis_tickangle=-45)
         st.plotly_chart(fig_solicitacoes_leitos, use_container_width=True)
     
@@ -1845,7 +2494,7 @@ if uploaded_file and not missing_sheets:
             df_internacao_saida_selecionado,
             names=COLUNAS["INTERNACAO_SAIDA"]["SAIDA_INTERNACAO"],
             values=COLUNAS["INTERNACAO_SAIDA"]["MEDIA_SAIDA_DIA"],
-            template='plotly_white',
+            template=TEMA,
             color_discrete_sequence=px.colors.sequential.Blues
         )
         fig_saidas_internacao.update_traces(textposition='inside', textinfo='percent+label')
@@ -1906,13 +2555,17 @@ if uploaded_file and not missing_sheets:
             ]
         }
         df_fatores_utilizacao = pd.DataFrame(dados_fatores_utilizacao)
+        intervalos_fatores = [intervalos_indicadores[indicador] for indicador in df_fatores_utilizacao['Indicador']]
     
-        df_fatores_utilizacao['Resultado'] = df_fatores_utilizacao['Resultado'].map("{:.1f}%".format)
+        df_fatores_utilizacao['Intervalo de 95%'] = [
+            faixa(intervalo, '{:.1f}%') for intervalo in intervalos_fatores
+        ]
     
-        st.dataframe(df_fatores_utilizacao)
+        st.dataframe(df_fatores_utilizacao, column_config=config_numerica({'Resultado': '%.1f%%'}))
     
         df_fatores_utilizacao_graph = df_fatores_utilizacao.copy()
-        df_fatores_utilizacao_graph['Resultado'] = df_fatores_utilizacao_graph['Resultado'].str.rstrip('%').astype('float')
+        df_fatores_utilizacao_graph['Erro Superior'] = [intervalo['superior'] - intervalo['valor'] for intervalo in intervalos_fatores]
+        df_fatores_utilizacao_graph['Erro Inferior'] = [intervalo['valor'] - intervalo['inferior'] for intervalo in intervalos_fatores]
     
         df_fatores_utilizacao_sorted = df_fatores_utilizacao_graph.sort_values(by='Resultado', ascending=False)
     
@@ -1926,12 +2579,13 @@ if uploaded_file and not missing_sheets:
                 "Indicador": "Indicador",
                 "Resultado": "Resultado (%)"
             },
-            template='plotly_white',
+            template=TEMA,
             color='Resultado',
             color_continuous_scale='Blues',
-            text='Resultado'
+            error_y='Erro Superior',
+            error_y_minus='Erro Inferior'
         )
-        fig_fatores_utilizacao.update_traces(texttemplate='%{text:.1f}%', textposition='inside')
+        fig_fatores_utilizacao.update_traces(texttemplate='%{y:.1f}%', textposition='inside')
     
         fig_fatores_utilizacao.update_layout(
             xaxis_tickangle=-45,
@@ -1945,7 +2599,7 @@ if uploaded_file and not missing_sheets:
 # Parte 10: "Centro Cirúrgico" (Atualizado)
 # =====================================
 
-    with tab6:
+    if secao == 'centro_cirurgico':
         st.markdown("""
         Nesta seção, você poderá analisar os dados referentes ao Centro Cirúrgico, incluindo a eficiência global, agendamento, desempenho, além de métricas relacionadas ao tempo médio de cirurgia e atrasos.
         """)
@@ -2019,69 +2673,24 @@ if uploaded_file and not missing_sheets:
         # ==========================
         st.markdown("#### 📈 Visualizações Gráficas")
     
-        # Preparação dos Dados para os Gráficos
-        # Converter colunas numéricas
-        colunas_numericas = [
-            COLUNAS["CIRURGIAS_MES"]["ELETIVAS_SUS"],
-            COLUNAS["CIRURGIAS_MES"]["ELETIVAS_SUPLEMENTAR"],
-            COLUNAS["CIRURGIAS_MES"]["URGENCIA_SUS"],
-            COLUNAS["CIRURGIAS_MES"]["URGENCIA_SUPLEMENTAR"],
-        ]
-        
-        for coluna in colunas_numericas:
-            df_cirurgias_mes[coluna] = pd.to_numeric(df_cirurgias_mes[coluna], errors='coerce')
-        
-        # Mapear as abreviações dos meses em português para números
-        month_map = {
-            'JAN': 1,
-            'FEV': 2,
-            'MAR': 3,
-            'ABR': 4,
-            'MAI': 5,
-            'JUN': 6,
-            'JUL': 7,
-            'AGO': 8,
-            'SET': 9,
-            'OUT': 10,
-            'NOV': 11,
-            'DEZ': 12
-        }
-        
-        df_cirurgias_mes['month_num'] = df_cirurgias_mes[COLUNAS["CIRURGIAS_MES"]["MES"]].str.upper().map(month_map)
-        
-        # Verificar se houve algum mês não mapeado
+        # Verificar se houve algum mês não mapeado (a preparação das séries fica na Parte 3)
         if df_cirurgias_mes['month_num'].isnull().any():
             st.error("Há meses não reconhecidos na coluna 'mes'. Verifique se todos os meses estão corretamente abreviados em português.")
         
-        # Criar a coluna 'Data' usando ano e número do mês
-        df_cirurgias_mes['Data'] = pd.to_datetime({
-            'year': df_cirurgias_mes[COLUNAS["CIRURGIAS_MES"]["ANO"]],
-            'month': df_cirurgias_mes['month_num'],
-            'day': 1
-        })
-        
-        # Ordenar o DataFrame por data
-        df_cirurgias_mes.sort_values('Data', inplace=True)
-        
-        # Criar coluna 'Total' que soma todos os tipos de cirurgias
-        df_cirurgias_mes['Total'] = df_cirurgias_mes[colunas_numericas].sum(axis=1)
-        
         # Gráfico 1: Evolução Mensal do Total de Cirurgias com Linha de Tendência
         st.markdown("###### 1️⃣ Evolução Mensal do Total de Cirurgias com Linha de Tendência")
         
         # Converter 'Data' para numérico para a regressão
         df_cirurgias_mes['Data_Num'] = df_cirurgias_mes['Data'].map(datetime.toordinal)
         
-        # Preparar os dados para o modelo de regressão
-        X = df_cirurgias_mes['Data_Num'].values.reshape(-1, 1)
-        y = df_cirurgias_mes['Total'].values
-        
-        # Ajustar o modelo de regressão linear
-        model = LinearRegression()
-        model.fit(X, y)
+        # Ajustar a reta de mínimos quadrados e a de Theil-Sen (robusta a meses atípicos) de uma vez
+        tendencia_cirurgias = {
+            metodo: ajustar_tendencia(df_cirurgias_mes['Total'], x=df_cirurgias_mes['Data_Num'], metodo=metodo)
+            for metodo in ('mqo', 'theil-sen')
+        }
         
-        # Prever valores para a linha de tendência
-        df_cirurgias_mes['Trendline'] = model.predict(X)
+        # Valores da linha de tendência
+        df_cirurgias_mes['Trendline'] = tendencia_cirurgias['mqo']['ajustado']
         
         # Criar a figura
         fig_total_cirurgias = go.Figure()
@@ -2094,9 +2703,8 @@ if uploaded_file and not missing_sheets:
             name='Número Total de Cirurgias',
             line=dict(color='#636EFA'),
             marker=dict(color='#636EFA'),
-            text=df_cirurgias_mes['Total'],
             textposition='top center',
-            texttemplate='%{text:.0f}'
+            texttemplate='%{y:.0f}'
         ))
         
         # Adicionar a linha de tendência
@@ -2114,7 +2722,7 @@ if uploaded_file and not missing_sheets:
             xaxis_title='Mês',
             yaxis_title='Número Total de Cirurgias',
             xaxis=dict(tickformat='%b %Y'),
-            template='plotly_white',
+            template=TEMA,
             legend=dict(
                 orientation="h",
                 yanchor="bottom",
@@ -2125,7 +2733,18 @@ if uploaded_file and not missing_sheets:
             margin=dict(l=40, r=40, t=80, b=40)
         )
         
+        # Anomalias por tipo de cirurgia e no total (calculadas uma vez por planilha)
+        anomalias_cc = detectar_lote({
+            coluna: (df_cirurgias_mes[coluna].to_numpy(dtype=float), 12, False) for coluna in colunas_numericas + ['Total']
+        })
+        destacar_anomalias(
+            fig_total_cirurgias, df_cirurgias_mes['Data'], df_cirurgias_mes['Total'],
+            anomalias_cc[anomalias_cc['serie'] == 'Total']
+        )
+        
         st.plotly_chart(fig_total_cirurgias, use_container_width=True)
+        if not anomalias_cc.empty:
+            st.warning(texto_anomalias(anomalias_cc, list(df_cirurgias_mes['Data'].dt.strftime('%b %Y'))))
         
         # Observação analítica
         st.markdown("**Observação analítica:**")
@@ -2139,9 +2758,8 @@ if uploaded_file and not missing_sheets:
         st.write(f"O mês com o maior número de cirurgias foi **{mes_maior_cirurgias}**, com um total de **{int(valor_maior_cirurgias)}** cirurgias.")
         
         # Interpretar a linha de tendência
-        slope = model.coef_[0]
-        intercept = model.intercept_
-        r_squared = model.score(X, y)
+        slope = tendencia_cirurgias['mqo']['inclinacao']
+        r_squared = tendencia_cirurgias['mqo']['r2']
         
         if slope > 0:
             tendencia = "aumentando"
@@ -2150,8 +2768,131 @@ if uploaded_file and not missing_sheets:
         
         st.write(f"A linha de tendência indica que o número total de cirurgias está **{tendencia}** ao longo do tempo.")
         st.write(f"O coeficiente de determinação (R²) do modelo é **{r_squared:.2f}**, indicando que aproximadamente **{r_squared*100:.1f}%** da variação no número total de cirurgias pode ser explicada pelo tempo.")
+        # Inclinações por dia convertidas para a média de dias de um mês
+        ic_mensal = tendencia_cirurgias['mqo']['ic_inclinacao'] * 30.44
+        st.write(f"Variação estimada de **{slope * 30.44:+.1f}** cirurgias por mês (IC 95%: {ic_mensal[0]:+.1f} a {ic_mensal[1]:+.1f}); "
+                 f"pela estimativa robusta de Theil-Sen, **{tendencia_cirurgias['theil-sen']['inclinacao'] * 30.44:+.1f}** cirurgias por mês.")
         
         st.markdown("---")
+
+        # Previsão de cirurgias (Holt-Winters)
+        st.markdown("###### 📅 Previsão do Total de Cirurgias por Mês")
+        # Trocar o horizonte reexecuta apenas as previsões de cirurgias
+        @st.fragment
+        def exibir_previsao_cirurgias():
+            horizonte_cc = st.radio(
+                "Horizonte da previsão (meses)", [3, 6, 12], index=1, horizontal=True, key="horizonte_previsao_cc"
+            )
+            try:
+                previsao_cc = prever(serie_cirurgias, horizonte=horizonte_cc)
+            except ValueError as e:
+                st.warning(f"Não foi possível gerar a previsão de cirurgias: {e}")
+            else:
+                st.plotly_chart(grafico_previsao(
+                    df_cirurgias_mes['Data'], df_cirurgias_mes['Total'], previsao_cc,
+                    f'Total de Cirurgias - Previsão para {horizonte_cc} Meses', 'Número Total de Cirurgias'
+                ), use_container_width=True)
+                tabela_cc = previsao_cc['previsao']
+                st.write(f"Modelo: **{previsao_cc['modelo']}**. São previstas **{tabela_cc['previsao'].sum():.0f}** cirurgias nos próximos "
+                         f"**{horizonte_cc}** meses, com o mês de maior volume em **{tabela_cc['previsao'].idxmax().strftime('%b %Y')}** "
+                         f"(**{tabela_cc['previsao'].max():.0f}** cirurgias; entre {tabela_cc.loc[tabela_cc['previsao'].idxmax(), 'inferior']:.0f} "
+                         f"e {tabela_cc.loc[tabela_cc['previsao'].idxmax(), 'superior']:.0f}).")
+                st.caption("A faixa sombreada é o intervalo de previsão de 95%, obtido por simulação do modelo ajustado.")
+
+            # Previsão em lote por tipo de cirurgia e por especialidade
+            st.markdown("###### 📅 Previsão por Tipo de Cirurgia e Especialidade")
+            previsao_lote_cc = prever_lote(series_cc, horizonte=horizonte_cc)
+
+            # Especialidades não têm série mensal: rateio da previsão de eletivas
+            proporcoes_especialidade = dict(zip(
+                df_qtd_cirurgia_eletivas_espec[COLUNAS["QTD_CIRURGIAS_ELETIVAS_ESPEC"]["ESPECIALIDADE_CIRURGIA"]],
+                pd.to_numeric(df_qtd_cirurgia_eletivas_espec[COLUNAS["QTD_CIRURGIAS_ELETIVAS_ESPEC"]["QTD_ELETIVAS_ESPEC"]], errors='coerce').fillna(0)
+            ))
+            previsao_especialidades = alocar_proporcional(
+                previsao_lote_cc[previsao_lote_cc['serie'] == 'Eletivas'], proporcoes_especialidade
+            )
+
+            previsao_tipos = previsao_lote_cc[previsao_lote_cc['serie'] != 'Eletivas']
+            if previsao_tipos.empty:
+                st.info("Não há dados suficientes para prever as cirurgias por tipo.")
+            else:
+                fig_previsao_tipos = px.line(
+                    previsao_tipos, x='data', y='previsao', color='serie', markers=True,
+                    labels={'data': 'Mês', 'previsao': 'Cirurgias Previstas', 'serie': 'Tipo de Cirurgia'},
+                    template=TEMA
+                )
+                fig_previsao_tipos.update_layout(xaxis=dict(tickformat='%b %Y'))
+                st.plotly_chart(fig_previsao_tipos, use_container_width=True)
+
+                tabela_previsao_cc = pd.concat([previsao_tipos, previsao_especialidades], ignore_index=True)
+                resumo_previsao_cc = tabela_previsao_cc.groupby(['serie', 'modelo'], sort=False).agg(
+                    previsao=('previsao', 'sum'), inferior=('inferior', 'sum'), superior=('superior', 'sum')
+                ).round(0).reset_index()
+                resumo_previsao_cc.columns = ['Série', 'Modelo', f'Total Previsto ({horizonte_cc} meses)', 'Soma dos Limites Inferiores', 'Soma dos Limites Superiores']
+                st.dataframe(resumo_previsao_cc, hide_index=True)
+                st.caption("Cada tipo de cirurgia tem seu modelo escolhido pelo menor AIC entre variantes com e sem tendência e sazonalidade. "
+                           "As especialidades são obtidas por rateio da previsão de eletivas conforme a participação atual de cada uma.")
+
+        exibir_previsao_cirurgias()
+
+        # Backtest de origem móvel dos modelos de previsão
+        st.markdown("###### 🧪 Precisão das Previsões (Backtest)")
+        st.markdown("""
+        Avalia os modelos em todas as séries mensais da planilha com origem móvel: cada modelo é ajustado apenas com os
+        meses anteriores a cada origem e comparado com o que de fato ocorreu. Compare a precisão (MASE < 1 supera o
+        método ingênuo) com o tempo de ajuste para escolher o modelo usado no dimensionamento.
+        """)
+        series_backtest = {'Pacientes (Porta)': serie_pacientes, 'Total de Cirurgias': serie_cirurgias}
+        series_backtest.update({nome: serie for nome, serie in series_cc.items() if nome != 'Eletivas'})
+
+        # O backtest e seu horizonte reexecutam apenas este trecho
+        @st.fragment
+        def exibir_backtest():
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                horizonte_backtest = st.radio("Horizonte avaliado (meses)", [1, 3, 6], index=1, horizontal=True, key="horizonte_backtest")
+            chave_backtest = (tuple(hash_serie(serie) for serie in series_backtest.values()), horizonte_backtest)
+            with col2:
+                executar_backtest = st.button("Executar backtest", key="executar_backtest")
+            if executar_backtest:
+                with st.spinner("Executando backtest de origem móvel..."):
+                    st.session_state['backtest_previsao'] = (
+                        chave_backtest, avaliar_previsoes(series_backtest, horizonte=horizonte_backtest)
+                    )
+
+            backtest_salvo = st.session_state.get('backtest_previsao')
+            if backtest_salvo is None or backtest_salvo[0] != chave_backtest:
+                st.info("Clique em **Executar backtest** para avaliar os modelos com os dados e o horizonte atuais.")
+            elif backtest_salvo[1]['por_modelo'].empty:
+                st.warning("As séries são curtas demais para o backtest: são necessários pelo menos 12 meses de treino mais o horizonte avaliado.")
+            else:
+                resultado_backtest = backtest_salvo[1]
+                df_backtest_modelos = resultado_backtest['por_modelo'].rename(columns={
+                    'modelo': 'Modelo', 'dobras': 'Dobras', 'tempo_total_s': 'Tempo Total (s)', 'tempo_por_ajuste_ms': 'Tempo por Ajuste (ms)'
+                }).round(2)
+                st.dataframe(df_backtest_modelos, hide_index=True)
+
+                fig_backtest = px.scatter(
+                    df_backtest_modelos, x='Tempo por Ajuste (ms)', y='MASE', text='Modelo', log_x=True,
+                    template=TEMA, title='Precisão vs. Tempo de Ajuste por Modelo'
+                )
+                fig_backtest.update_traces(textposition='top center', marker=dict(size=12, color='#636EFA'))
+                fig_backtest.add_hline(y=1, line_dash='dash', line_color='gray', annotation_text='Método ingênuo')
+                st.plotly_chart(fig_backtest, use_container_width=True)
+
+                with st.expander("Resultados por série"):
+                    st.dataframe(resultado_backtest['por_serie'].rename(columns={
+                        'serie': 'Série', 'modelo': 'Modelo', 'dobras': 'Dobras'
+                    }).round(2), hide_index=True)
+
+                melhor_backtest = df_backtest_modelos.iloc[0]
+                st.write(f"O modelo mais preciso foi **{melhor_backtest['Modelo']}** (MASE de **{melhor_backtest['MASE']:.2f}**, "
+                         f"sMAPE de **{melhor_backtest['sMAPE (%)']:.1f}%**), com **{melhor_backtest['Tempo por Ajuste (ms)']:.1f} ms** por ajuste. "
+                         f"O backtest completo levou **{resultado_backtest['tempo_total']:.1f} s**.")
+
+        exibir_backtest()
+
+        st.markdown("---")
         
         # Reorganizar o DataFrame para o formato longo
         df_cirurgias_mes_melted = df_cirurgias_mes.melt(
@@ -2174,7 +2915,7 @@ if uploaded_file and not missing_sheets:
         
         # Criar o gráfico de linhas refinado
         fig_cirurgias_mes = px.line(
-            df_cirurgias_mes_melted,
+            reduzir_grupos(df_cirurgias_mes_melted, 'Data', 'Quantidade', 'Tipo de Cirurgia'),
             x='Data',
             y='Quantidade',
             color='Tipo de Cirurgia',
@@ -2184,7 +2925,7 @@ if uploaded_file and not missing_sheets:
                 'Quantidade': 'Número de Cirurgias',
                 'Tipo de Cirurgia': 'Tipo de Cirurgia'
             },
-            template='plotly_white',
+            template=TEMA,
             color_discrete_sequence=px.colors.qualitative.Set2,
             hover_data={'Data': '|%b %Y'}
         )
@@ -2217,49 +2958,52 @@ if uploaded_file and not missing_sheets:
         # Gráfico 3: Distribuição Mensal das Cirurgias por Classificação
         st.markdown("###### 3️⃣ Distribuição Mensal das Cirurgias por Classificação")
         
-        # Calcular o total de cirurgias por data para adicionar os rótulos
-        df_totals = df_cirurgias_mes_melted.groupby('Data')['Quantidade'].sum().reset_index()
-        
-        fig_cirurgias_empilhadas = px.bar(
-            df_cirurgias_mes_melted,
-            x='Data',
-            y='Quantidade',
-            color='Tipo de Cirurgia',
-            labels={
-                'Data': 'Mês',
-                'Quantidade': 'Número de Cirurgias',
-                'Tipo de Cirurgia': 'Tipo de Cirurgia'
-            },
-            barmode='stack',
-            template='plotly_white',
-            color_discrete_sequence=px.colors.qualitative.Set2,
-            hover_data={'Data': '|%b %Y'},
-            text='Quantidade'
-        )
-        fig_cirurgias_empilhadas.update_traces(texttemplate='%{text:.0f}', textposition='inside')
-        fig_cirurgias_empilhadas.update_layout(
-            xaxis_tickformat='%b %Y',
-            xaxis_title='Mês',
-            yaxis_title='Número de Cirurgias',
-            legend_title='Tipo de Cirurgia',
-            margin=dict(l=40, r=40, t=80, b=40),
-            height=500
-        )
-        
-        # Adicionar rótulos de total em cima de cada barra
-        for i, total in enumerate(df_totals['Quantidade']):
-            fig_cirurgias_empilhadas.add_annotation(
-                x=df_totals['Data'][i],
-                y=total,
-                text=str(int(total)),
-                showarrow=False,
-                yshift=5,
-                font=dict(
-                    color='black',
-                    size=12
-                ),
-                align='center'
+        def construir_fig_cirurgias_empilhadas():
+            # Calcular o total de cirurgias por data para adicionar os rótulos
+            df_totals = df_cirurgias_mes_melted.groupby('Data')['Quantidade'].sum().reset_index()
+            
+            fig_cirurgias_empilhadas = px.bar(
+                df_cirurgias_mes_melted,
+                x='Data',
+                y='Quantidade',
+                color='Tipo de Cirurgia',
+                labels={
+                    'Data': 'Mês',
+                    'Quantidade': 'Número de Cirurgias',
+                    'Tipo de Cirurgia': 'Tipo de Cirurgia'
+                },
+                barmode='stack',
+                template=TEMA,
+                color_discrete_sequence=px.colors.qualitative.Set2,
+                hover_data={'Data': '|%b %Y'}
             )
+            fig_cirurgias_empilhadas.update_traces(texttemplate='%{y:.0f}', textposition='inside')
+            fig_cirurgias_empilhadas.update_layout(
+                xaxis_tickformat='%b %Y',
+                xaxis_title='Mês',
+                yaxis_title='Número de Cirurgias',
+                legend_title='Tipo de Cirurgia',
+                margin=dict(l=40, r=40, t=80, b=40),
+                height=500
+            )
+            
+            # Adicionar rótulos de total em cima de cada barra
+            for i, total in enumerate(df_totals['Quantidade']):
+                fig_cirurgias_empilhadas.add_annotation(
+                    x=df_totals['Data'][i],
+                    y=total,
+                    text=str(int(total)),
+                    showarrow=False,
+                    yshift=5,
+                    font=dict(
+                        color='black',
+                        size=12
+                    ),
+                    align='center'
+                )
+            return fig_cirurgias_empilhadas
+
+        fig_cirurgias_empilhadas = figura_em_cache(hash_planilha, 'cirurgias_empilhadas', construir_fig_cirurgias_empilhadas)
         
         st.plotly_chart(fig_cirurgias_empilhadas, use_container_width=True)
         
@@ -2275,7 +3019,7 @@ if uploaded_file and not missing_sheets:
                 x=['Eficiência Global', 'Eficiência de Agendamento', 'Eficiência de Desempenho'],
                 y=[eficiencia_global * 100, eficiencia_agendamento * 100, eficiencia_desempenho * 100],
                 marker_color=['#636EFA', '#EF553B', '#00CC96'],
-                text=[f"{eficiencia_global * 100:.2f}%", f"{eficiencia_agendamento * 100:.2f}%", f"{eficiencia_desempenho * 100:.2f}%"],
+                texttemplate='%{y:.2f}%',
                 textposition='inside',
                 insidetextanchor='middle'
             ))
@@ -2285,7 +3029,7 @@ if uploaded_file and not missing_sheets:
                 yaxis=dict(title='Eficiência (%)', range=[0, 100]),
                 xaxis=dict(title='Tipo de Eficiência'),
                 showlegend=False,
-                template='plotly_white',
+                template=TEMA,
                 margin=dict(l=40, r=40, t=80, b=80)
             )
         
@@ -2351,7 +3095,7 @@ if uploaded_file and not missing_sheets:
                     'Tipo de Cirurgia': "Tipo de Cirurgia"
                 },
                 barmode="group",
-                template='plotly_white',
+                template=TEMA,
                 color_discrete_sequence=px.colors.qualitative.Set2,
                 text='Quantidade'
             )
@@ -2433,7 +3177,7 @@ if uploaded_file and not missing_sheets:
                 go.Bar(
                     x=labels_tempos,
                     y=tempos_medios,
-                    text=[f'{t:.2f} min' for t in tempos_medios],
+                    texttemplate='%{y:.2f} min',
                     textposition='inside',
                     marker_color=px.colors.qualitative.Set2,
                 )
@@ -2442,7 +3186,7 @@ if uploaded_file and not missing_sheets:
             fig_atraso_substituicao.update_layout(
                 yaxis_title='Tempo Médio (min)',
                 xaxis_title='Atividade',
-                template='plotly_white',
+                template=TEMA,
                 margin=dict(l=40, r=40, t=80, b=80)
             )
             st.plotly_chart(fig_atraso_substituicao, use_container_width=True)
@@ -2478,7 +3222,7 @@ if uploaded_file and not missing_sheets:
                 y=df_motivos_cancelamento_sorted[COLUNAS["MOTIVOS_CANCELAMENTO"]["QTD_CANCELAMENTO_MEDIA"]],
                 name='Quantidade',
                 marker_color='#1f77b4',
-                text=df_motivos_cancelamento_sorted[COLUNAS["MOTIVOS_CANCELAMENTO"]["QTD_CANCELAMENTO_MEDIA"]].round(1),
+                texttemplate='%{y:.1~f}',
                 textposition='inside',
                 textfont=dict(color='white'),
             ))
@@ -2491,7 +3235,7 @@ if uploaded_file and not missing_sheets:
                 mode='lines+markers+text',
                 line=dict(color='red'),
                 yaxis='y2',
-                text=[f'{p:.1f}%' for p in df_motivos_cancelamento_sorted['Percentual_Acumulado']],
+                texttemplate='%{y:.1f}%',
                 textposition='top center',
             ))
         
@@ -2552,7 +3296,7 @@ if uploaded_file and not missing_sheets:
                 },
                 line_shape="spline",
                 markers=True,
-                template='plotly_white',
+                template=TEMA,
                 color_discrete_sequence=px.colors.qualitative.Set2
             )
             fig_medicos_cc.update_traces(textposition='top center', texttemplate='%{y:.1f}')
@@ -2563,49 +3307,414 @@ if uploaded_file and not missing_sheets:
                 margin=dict(l=40, r=40, t=80, b=80)
             )
             st.plotly_chart(fig_medicos_cc, use_container_width=True)
-        
+
+        st.markdown("---")
+
+        # Gráfico 12: Programação Otimizada das Salas Cirúrgicas
+        st.markdown("###### 1️⃣1️⃣ Programação Otimizada das Salas Cirúrgicas")
+        st.markdown("""
+        Distribui uma lista de cirurgias eletivas do mês nas salas e na janela de funcionamento do centro cirúrgico,
+        considerando o setup de abertura da sala e o tempo de substituição entre cirurgias. A alocação inicial usa
+        *First Fit Decreasing* e é refinada por busca local para eliminar hora extra e liberar salas-dia pouco utilizadas.
+        """)
+
+        # Janela de funcionamento por sala-dia
+        try:
+            janela_cc_min = duracao_janela(
+                df_funcionamento_cc[COLUNAS["FUNCIONAMENTO_CC"]["HORARIO_INICIO"]].dropna(),
+                df_funcionamento_cc[COLUNAS["FUNCIONAMENTO_CC"]["HORARIO_TERMINO"]].dropna()
+            )
+        except (ValueError, IndexError, KeyError):
+            janela_cc_min = 0
+        if janela_cc_min <= 0:
+            janela_cc_min = 12 * 60  # Mesmo padrão de 12h usado nas eficiências
+
+        tempo_setup_sala = df_tempo_setup_sala[COLUNAS["TEMPO_SETUP_SALA"]["TEMPO_SETUP"]].mean()
+        tempo_substituicao_sala = df_tempo_substit_sala[COLUNAS["TEMPO_SUBSTIT_SALA"]["TEMPO_SUBSTITUICAO"]].mean()
+        salas_eletivas = int(pd.to_numeric(
+            df_salas_cirurgicas_porte[COLUNAS["SALAS_CIRURGICAS_PORTE"]["QTD_ELETIVAS"]], errors='coerce'
+        ).fillna(0).sum()) or int(total_salas)
+
+        # Volume e duração média estimados a partir do último mês e das horas gastas por dia
+        eletivas_ultimo_mes = int(df_cirurgias_mes[[
+            COLUNAS["CIRURGIAS_MES"]["ELETIVAS_SUS"],
+            COLUNAS["CIRURGIAS_MES"]["ELETIVAS_SUPLEMENTAR"]
+        ]].iloc[-1].fillna(0).sum())
+        cirurgias_dia_estimadas = df_cirurgias_mes['Total'].iloc[-1] / 22
+        horas_gastas_dia = df_media_horas_gastas[COLUNAS["MEDIA_HORAS_GASTAS"]["HORAS_GASTAS"]].mean()
+        if cirurgias_dia_estimadas > 0 and pd.notna(horas_gastas_dia) and horas_gastas_dia > 0:
+            duracao_media_estimada = float(np.clip(horas_gastas_dia * 60 / cirurgias_dia_estimadas, 30, 600))
+        else:
+            duracao_media_estimada = 120.0
+
+        # Programação e simulação reexecutam juntas (a simulação parte da agenda), sem o restante da página
+        @st.fragment
+        def exibir_programacao_cirurgica():
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                qtd_casos_agenda = st.number_input(
+                    "Cirurgias eletivas no mês", min_value=1, max_value=20000,
+                    value=max(eletivas_ultimo_mes, 1), step=10, key="qtd_casos_agenda"
+                )
+            with col2:
+                duracao_media_agenda = st.number_input(
+                    "Duração média por cirurgia (min)", min_value=10.0, max_value=720.0,
+                    value=float(round(duracao_media_estimada)), step=5.0, key="duracao_media_agenda"
+                )
+            with col3:
+                dias_agenda = st.number_input(
+                    "Dias de funcionamento no mês", min_value=1, max_value=31, value=22, key="dias_agenda"
+                )
+            with col4:
+                salas_agenda = st.number_input(
+                    "Salas para eletivas", min_value=1, max_value=200, value=max(salas_eletivas, 1), key="salas_agenda"
+                )
+
+            duracoes_casos = gerar_casos(qtd_casos_agenda, duracao_media_agenda, cv=0.4)
+            agenda = agendar_casos(
+                duracoes_casos,
+                n_salas=salas_agenda,
+                n_dias=dias_agenda,
+                janela_min=janela_cc_min,
+                setup_min=float(np.nan_to_num(tempo_setup_sala)),
+                turnover_min=float(np.nan_to_num(tempo_substituicao_sala))
+            )
+
+            salas_dia_disponiveis = int(salas_agenda) * int(dias_agenda)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Utilização das Salas Abertas (%)", f"{agenda['utilizacao'] * 100:.1f}%")
+            with col2:
+                st.metric("Utilização da Capacidade Total (%)", f"{agenda['utilizacao_total'] * 100:.1f}%")
+            with col3:
+                st.metric("Salas-Dia Utilizadas", f"{agenda['salas_dia_abertas']} / {salas_dia_disponiveis}")
+            with col4:
+                st.metric("Hora Extra no Mês (h)", f"{agenda['hora_extra'].sum() / 60:.1f}")
+
+            fig_agenda = go.Figure(data=go.Heatmap(
+                z=agenda['ocupacao'] / janela_cc_min * 100,
+                x=[f"Dia {d + 1}" for d in range(int(dias_agenda))],
+                y=[f"Sala {s + 1}" for s in range(int(salas_agenda))],
+                colorscale='Blues',
+                zmin=0,
+                zmax=max(100, float((agenda['ocupacao'] / janela_cc_min * 100).max())),
+                colorbar=dict(title='Ocupação (%)'),
+                hovertemplate='%{y} - %{x}<br>Ocupação: %{z:.1f}%<extra></extra>'
+            ))
+            fig_agenda.update_layout(
+                title='Ocupação Programada por Sala e Dia (% da janela)',
+                xaxis_title='Dia',
+                yaxis_title='Sala',
+                template=TEMA,
+                height=max(300, 30 * int(salas_agenda) + 150)
+            )
+            st.plotly_chart(fig_agenda, use_container_width=True)
+
+            st.markdown("**Observação analítica:**")
+            st.write(f"A janela considerada é de **{janela_cc_min / 60:.1f} h** por sala-dia, com setup de **{np.nan_to_num(tempo_setup_sala):.0f} min** "
+                     f"e substituição de **{np.nan_to_num(tempo_substituicao_sala):.0f} min** entre cirurgias.")
+            salas_dia_extra = int((agenda['hora_extra'] > 0).sum())
+            if salas_dia_extra > 0:
+                st.write(f"Mesmo após a otimização, **{salas_dia_extra}** sala(s)-dia ficam em hora extra: a demanda de eletivas excede a capacidade programável.")
+            else:
+                st.write(f"Toda a demanda cabe na janela sem hora extra, usando **{agenda['salas_dia_abertas']}** das **{salas_dia_disponiveis}** salas-dia disponíveis.")
+            st.caption("A lista de cirurgias é estimada (durações log-normais com CV de 40% em torno da duração média informada).")
+
+            st.markdown("---")
+
+            # Gráfico 13: Simulação Monte Carlo do Dia Cirúrgico
+            st.markdown("###### 1️⃣2️⃣ Simulação do Dia Cirúrgico (Monte Carlo)")
+            st.markdown("""
+            Simula milhares de dias do centro cirúrgico considerando o atraso da primeira cirurgia, os cancelamentos de
+            eletivas e a inserção de cirurgias não programadas ao longo do dia. O resultado mostra a variabilidade esperada
+            de hora extra, ociosidade e cirurgias realizadas por dia, e não apenas o valor médio.
+            """)
+
+            # Probabilidade de cancelamento: cancelamentos/mês sobre eletivas/mês
+            cancelamentos_mes = pd.to_numeric(
+                df_motivos_cancelamento[COLUNAS["MOTIVOS_CANCELAMENTO"]["QTD_CANCELAMENTO_MEDIA"]], errors='coerce'
+            ).fillna(0).sum()
+            prob_cancelamento = float(np.clip(cancelamentos_mes / max(eletivas_ultimo_mes, 1), 0, 0.95))
+
+            casos_abertos = agenda['casos'][agenda['casos'] > 0]
+            casos_por_sala_padrao = int(np.ceil(casos_abertos.mean())) if casos_abertos.size else 1
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                casos_por_sala_sim = st.number_input(
+                    "Eletivas programadas por sala-dia", min_value=1, max_value=50,
+                    value=casos_por_sala_padrao, key="casos_por_sala_sim"
+                )
+            with col2:
+                prob_cancelamento_sim = st.slider(
+                    "Probabilidade de cancelamento (%)", min_value=0.0, max_value=95.0,
+                    value=round(prob_cancelamento * 100, 1), step=0.5, key="prob_cancelamento_sim"
+                ) / 100
+            with col3:
+                urgencias_dia_sim = st.number_input(
+                    "Cirurgias não programadas/dia", min_value=0.0, max_value=100.0,
+                    value=float(np.nan_to_num(qtd_cirurgias_nao_programadas)), step=0.5, key="urgencias_dia_sim"
+                )
+            with col4:
+                replicacoes_sim = st.number_input(
+                    "Dias simulados", min_value=100, max_value=50000, value=5000, step=500, key="replicacoes_sim"
+                )
+
+            simulacao = simular_dias_cirurgicos(
+                n_replicacoes=replicacoes_sim,
+                n_salas=salas_agenda,
+                casos_por_sala=casos_por_sala_sim,
+                duracao_media=duracao_media_agenda,
+                janela_min=janela_cc_min,
+                setup_min=float(np.nan_to_num(tempo_setup_sala)),
+                turnover_min=float(np.nan_to_num(tempo_substituicao_sala)),
+                atraso_medio_min=float(np.nan_to_num(tempo_medio_atraso_primeira)),
+                prob_cancelamento=prob_cancelamento_sim,
+                urgencias_dia=urgencias_dia_sim
+            )
+
+            # Totais por dia (soma das salas)
+            hora_extra_dia = simulacao['hora_extra'].sum(axis=1) / 60
+            ociosidade_dia = simulacao['ociosidade'].sum(axis=1) / 60
+            realizadas_dia = simulacao['realizadas'].sum(axis=1)
+            canceladas_dia = simulacao['canceladas'].sum(axis=1)
+            sem_horario_dia = simulacao['sem_horario'].sum(axis=1)
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Dias com Hora Extra (%)", f"{(hora_extra_dia > 0).mean() * 100:.1f}%")
+            with col2:
+                st.metric("Hora Extra/Dia (h) - média | P90", f"{hora_extra_dia.mean():.1f} | {np.percentile(hora_extra_dia, 90):.1f}")
+            with col3:
+                st.metric("Ociosidade/Dia (h) - média", f"{ociosidade_dia.mean():.1f}")
+            with col4:
+                st.metric("Cirurgias Realizadas/Dia - média", f"{realizadas_dia.mean():.1f}")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                fig_sim_horas = go.Figure()
+                fig_sim_horas.add_trace(histograma(hora_extra_dia, name='Hora extra', marker_color='#e74c3c', opacity=0.7))
+                fig_sim_horas.add_trace(histograma(ociosidade_dia, name='Ociosidade', marker_color='#3498db', opacity=0.7))
+                fig_sim_horas.update_layout(
+                    title='Distribuição de Hora Extra e Ociosidade por Dia',
+                    xaxis_title='Horas no dia (todas as salas)',
+                    yaxis_title='Dias simulados',
+                    barmode='overlay',
+                    template=TEMA,
+                    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+                )
+                st.plotly_chart(fig_sim_horas, use_container_width=True)
+            with col2:
+                valores, frequencias = np.unique(realizadas_dia, return_counts=True)
+                fig_sim_casos = go.Figure(go.Bar(
+                    x=valores, y=frequencias / len(realizadas_dia) * 100,
+                    marker_color='#2ecc71',
+                    hovertemplate='%{x} cirurgias: %{y:.1f}% dos dias<extra></extra>'
+                ))
+                fig_sim_casos.update_layout(
+                    title='Cirurgias Realizadas por Dia',
+                    xaxis_title='Cirurgias realizadas',
+                    yaxis_title='% dos dias simulados',
+                    template=TEMA
+                )
+                st.plotly_chart(fig_sim_casos, use_container_width=True)
+
+            # Impacto esperado por motivo (rateio pelas proporções informadas)
+            col1, col2 = st.columns(2)
+            with col1:
+                df_sim_cancelamento = df_motivos_cancelamento_agregado.rename(columns={
+                    COLUNAS["MOTIVOS_CANCELAMENTO"]["MOTIVO_CANCELAMENTO"]: 'Motivo'
+                })
+                qtd_motivos = df_sim_cancelamento[COLUNAS["MOTIVOS_CANCELAMENTO"]["QTD_CANCELAMENTO_MEDIA"]]
+                df_sim_cancelamento['Cancelamentos/Dia'] = (
+                    qtd_motivos / qtd_motivos.sum() * canceladas_dia.mean() if qtd_motivos.sum() > 0 else 0.0
+                )
+                df_sim_cancelamento = df_sim_cancelamento[['Motivo', 'Cancelamentos/Dia']].sort_values('Cancelamentos/Dia', ascending=False)
+                st.markdown("**Cancelamentos esperados por motivo**")
+                st.dataframe(df_sim_cancelamento, column_config=config_numerica({'Cancelamentos/Dia': '%.2f'}), hide_index=True, use_container_width=True)
+            with col2:
+                df_sim_atraso = pd.DataFrame({
+                    'Motivo': df_motivos_atraso_cirurgia[COLUNAS["MOTIVOS_ATRASO_CIRURGIA"]["MOTIVOS_ATRASO"]],
+                    'Percentual': df_motivos_atraso_cirurgia[COLUNAS["MOTIVOS_ATRASO_CIRURGIA"]["PERCENTUAL_MOTIVOS"]].apply(porcentagem_para_float)
+                }).dropna()
+                atraso_total_dia = simulacao['atraso'].sum(axis=1).mean()
+                df_sim_atraso['Minutos de Atraso/Dia'] = (
+                    df_sim_atraso['Percentual'] / df_sim_atraso['Percentual'].sum() * atraso_total_dia
+                    if df_sim_atraso['Percentual'].sum() > 0 else 0.0
+                )
+                df_sim_atraso = df_sim_atraso[['Motivo', 'Minutos de Atraso/Dia']].sort_values('Minutos de Atraso/Dia', ascending=False)
+                st.markdown("**Atraso da 1ª cirurgia por motivo**")
+                st.dataframe(df_sim_atraso, column_config=config_numerica({'Minutos de Atraso/Dia': '%.1f'}), hide_index=True, use_container_width=True)
+
+            st.markdown("**Observação analítica:**")
+            st.write(f"Com **{int(casos_por_sala_sim)}** eletiva(s) programada(s) por sala em **{int(salas_agenda)}** sala(s), "
+                     f"em média **{canceladas_dia.mean():.1f}** eletivas são canceladas por dia e **{sem_horario_dia.mean():.1f}** "
+                     f"deixam de ser realizadas por falta de horário após atrasos e cirurgias não programadas.")
+            st.write(f"Em **{(hora_extra_dia > 0).mean() * 100:.1f}%** dos dias há hora extra em ao menos uma sala; nos 10% piores dias, "
+                     f"a hora extra passa de **{np.percentile(hora_extra_dia, 90):.1f} h**.")
+            st.caption("Durações log-normais (CV de 40%), atraso da 1ª cirurgia exponencial e cirurgias não programadas com chegada de Poisson, "
+                       "distribuídas igualmente entre as salas. Os motivos são rateados pelas proporções informadas na planilha.")
+
+        exibir_programacao_cirurgica()
+
+        st.markdown("---")
+
+        # Gráfico 14: Capacidade da Recuperação Pós-Anestésica (RPA)
+        st.markdown("###### 1️⃣3️⃣ Capacidade da Recuperação Pós-Anestésica (RPA)")
+        st.markdown("""
+        Modela a RPA como uma fila M/M/c/K: os leitos de RPA são os servidores e, quando estão todos ocupados, o paciente
+        permanece na sala cirúrgica aguardando vaga. As salas funcionam como a área de espera (K = leitos de RPA + salas),
+        de modo que a espera na fila corresponde ao tempo em que a sala fica bloqueada sem poder iniciar a próxima cirurgia.
+        """)
+
+        # Os parâmetros da RPA reexecutam apenas este trecho
+        @st.fragment
+        def exibir_capacidade_rpa():
+            col_tipo = COLUNAS["TEMPO_PERMANENCIA_LEITOS"]["TIPO_DE_LEITO"]
+            col_qtd_leito = COLUNAS["TEMPO_PERMANENCIA_LEITOS"]["QUANTIDADE_DE_LEITO"]
+            col_tempo_leito = COLUNAS["TEMPO_PERMANENCIA_LEITOS"]["TEMPO_MEDIO_PERMANENCIA_LEITO"]
+            tipos_leito = df_tempo_permanencia_leitos[col_tipo].dropna().astype(str).unique().tolist()
+
+            if not tipos_leito:
+                st.warning("A aba de tempo de permanência nos leitos não possui tipos de leito para modelar a RPA.")
+            else:
+                indice_rpa = next((i for i, t in enumerate(tipos_leito) if 'RPA' in t.upper()), 0)
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    tipo_rpa = st.selectbox("Tipo de leito da RPA", tipos_leito, index=indice_rpa, key="tipo_leito_rpa")
+
+                df_rpa = df_tempo_permanencia_leitos[df_tempo_permanencia_leitos[col_tipo].astype(str) == tipo_rpa]
+                leitos_rpa_atual = int(df_rpa[col_qtd_leito].fillna(0).sum())
+                pesos_rpa = df_rpa[col_qtd_leito].fillna(0)
+                tempo_rpa_min = (
+                    float(np.average(df_rpa[col_tempo_leito].fillna(0), weights=pesos_rpa))
+                    if pesos_rpa.sum() > 0 else float(df_rpa[col_tempo_leito].mean())
+                )
+                tempo_rpa_min = tempo_rpa_min if pd.notna(tempo_rpa_min) and tempo_rpa_min > 0 else 60.0
+
+                with col2:
+                    leitos_rpa = st.number_input(
+                        "Leitos de RPA", min_value=1, max_value=200, value=max(leitos_rpa_atual, 1), key="leitos_rpa"
+                    )
+                with col3:
+                    cirurgias_dia_rpa = st.number_input(
+                        "Cirurgias/dia", min_value=0.0, max_value=1000.0,
+                        value=float(round(df_cirurgias_mes['Total'].iloc[-1] / int(st.session_state.get("dias_agenda", 22)), 1)), step=1.0, key="cirurgias_dia_rpa"
+                    )
+
+                # Chegadas à RPA concentradas na janela de funcionamento do centro cirúrgico (pacientes/hora)
+                horas_janela = janela_cc_min / 60
+                lambda_rpa = cirurgias_dia_rpa / horas_janela
+                mu_rpa = 60 / tempo_rpa_min
+                salas_bloqueio = int(total_salas)
+
+                rpa = metricas_mmck(lambda_rpa, mu_rpa, leitos_rpa, leitos_rpa + salas_bloqueio)
+                rpa_sem_limite = metricas_mmc(lambda_rpa, mu_rpa, leitos_rpa)
+
+                # p_espera e p_bloqueio são frações de todas as chegadas, e Wq é a média por paciente
+                # admitido: entre os admitidos, aguardam p_espera / (1 - p_bloqueio)
+                p_admitido = 1 - float(rpa['p_bloqueio'])
+                p_aguarda = float(rpa['p_espera']) / p_admitido if p_admitido > 0 else 1.0
+
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Utilização da RPA (%)", f"{float(rpa['rho']) * 100:.1f}%")
+                with col2:
+                    st.metric("Pacientes Aguardando RPA na Sala (%)", f"{p_aguarda * 100:.1f}%")
+                with col3:
+                    # Tempo de bloqueio condicionado aos pacientes que de fato aguardam vaga
+                    bloqueio_condicional = float(rpa['Wq']) / p_aguarda if p_aguarda > 0 else 0.0
+                    st.metric("Tempo na Sala Aguardando RPA (min)", f"{bloqueio_condicional * 60:.1f}")
+                with col4:
+                    st.metric("Horas-Sala Bloqueadas/Dia", f"{float(rpa['Lq']) * horas_janela:.1f}")
+
+                # Sensibilidade ao número de leitos de RPA (avaliação vetorizada)
+                leitos_cenarios = np.arange(max(1, int(leitos_rpa) - 3), int(leitos_rpa) + 6)
+                cenarios = metricas_mmck(lambda_rpa, mu_rpa, leitos_cenarios, leitos_cenarios + salas_bloqueio)
+                fig_rpa = go.Figure()
+                fig_rpa.add_trace(go.Bar(
+                    x=leitos_cenarios, y=cenarios['Lq'] * horas_janela, name='Horas-sala bloqueadas/dia',
+                    marker_color=['#e74c3c' if c == leitos_rpa else '#95a5a6' for c in leitos_cenarios],
+                    hovertemplate='%{x} leitos: %{y:.1f} h/dia<extra></extra>'
+                ))
+                fig_rpa.add_trace(go.Scatter(
+                    x=leitos_cenarios, y=cenarios['rho'] * 100, name='Utilização da RPA (%)',
+                    mode='lines+markers', yaxis='y2', line=dict(color='#3498db')
+                ))
+                fig_rpa.update_layout(
+                    title='Bloqueio das Salas Cirúrgicas por Número de Leitos de RPA',
+                    xaxis=dict(title='Leitos de RPA', dtick=1),
+                    yaxis=dict(title='Horas-sala bloqueadas por dia'),
+                    yaxis2=dict(title='Utilização (%)', overlaying='y', side='right', range=[0, 105]),
+                    template=TEMA,
+                    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+                )
+                st.plotly_chart(fig_rpa, use_container_width=True)
+
+                # Motivos de permanência prolongada na RPA
+                df_motivos_rpa = pd.DataFrame({
+                    'Motivo': df_motivos_tempo_permanencia_rpa[COLUNAS["MOTIVOS_TEMPO_PERMANENCIA_RPA"]["MOTIVOS_RPA"]],
+                    'Percentual': df_motivos_tempo_permanencia_rpa[COLUNAS["MOTIVOS_TEMPO_PERMANENCIA_RPA"]["PERCENTUAL_MOTIVOS"]].apply(porcentagem_para_float)
+                }).dropna().sort_values('Percentual', ascending=False)
+
+                st.markdown("**Observação analítica:**")
+                st.write(f"Com **{int(leitos_rpa)}** leito(s) de RPA e permanência média de **{tempo_rpa_min:.0f} min**, chegam cerca de "
+                         f"**{lambda_rpa:.1f}** pacientes/hora à RPA durante a janela de **{horas_janela:.1f} h**.")
+                if not np.isfinite(float(rpa_sem_limite['Wq'])):
+                    st.write("A carga excede a capacidade da RPA: sem a retenção dos pacientes nas salas, a fila cresceria indefinidamente. "
+                             f"Na prática, as salas ficam bloqueadas e **{float(rpa['p_bloqueio']) * 100:.1f}%** das cirurgias encontrariam todas as salas ocupadas por pacientes aguardando RPA.")
+                elif float(rpa['Lq']) * horas_janela >= 1:
+                    st.write(f"As salas cirúrgicas ficam bloqueadas por cerca de **{float(rpa['Lq']) * horas_janela:.1f} h** por dia aguardando vaga na RPA, "
+                             "tempo que deixa de ser usado para novas cirurgias.")
+                else:
+                    st.write("O bloqueio das salas por falta de vaga na RPA é pequeno com a capacidade atual.")
+                if not df_motivos_rpa.empty:
+                    principal = df_motivos_rpa.iloc[0]
+                    st.write(f"O principal motivo de permanência acima de 3h na RPA é **'{principal['Motivo']}'**, com "
+                             f"**{principal['Percentual'] * 100:.1f}%** dos casos: reduzi-lo diminui o tempo de permanência e, com ele, o bloqueio das salas.")
+                st.caption("Chegadas de Poisson à RPA distribuídas uniformemente na janela de funcionamento e permanência exponencial; "
+                           "as salas cirúrgicas (todas as salas do centro cirúrgico) servem de área de espera para a RPA.")
+
+        exibir_capacidade_rpa()
+
         st.markdown("---")
                     
 # =====================================
 # Parte 11: Aba "Fluxo do Processo"
 # =====================================
 
-    with tab7:
+    if secao == 'desempenho':
         st.markdown("## Desempenho dos Processos")
         st.markdown("""
         Nesta seção, você poderá analisar o macrofluxo de processos hospitalares utilizando conceitos da teoria das restrições e Lean.
         """)
     
         # Criar as sub-abas
-        subtab1, subtab2, subtab3 = st.tabs([" ⏩ Atendimento Porta/Médico", " ⏩ Demanda/Especialidade", "⏩ Por Setores"])
+        subsecao = st.radio(
+            "Análise", list(SUBSECOES_DESEMPENHO), format_func=SUBSECOES_DESEMPENHO.get, horizontal=True,
+            key="subsecao_desempenho", label_visibility="collapsed"
+        )
     
         # ==========================
         # Sub-aba 1: Atendimento Porta/Médico
         # ==========================
-        with subtab1:
+        if subsecao == 'porta_medico':
             st.markdown("### Atendimento Porta/Médico")
     
             # ==========================
             # 1. Demanda de Pacientes por Hora (07:00 às 18:00)
             # ==========================
-            df_horarios_filtered = df_horarios[(df_horarios['hora'] >= 7) & (df_horarios['hora'] <= 18)]
-            demand_paciente_hora = df_horarios_filtered['quantidade_media_pacientes (arredondado)'].mean()
+            demand_paciente_hora = media_janela(perfil_horario(matriz_demanda, arredondar=True, sem_dado=horas_sem_demanda))
     
             # ==========================
             # 2. Headcount em Triagem (07:00 às 18:00)
             # ==========================
-            df_triagem_enfermeiros_filtered = df_triagem_enfermeiros[
-                (df_triagem_enfermeiros['hora'] >= 7) & (df_triagem_enfermeiros['hora'] <= 18)
-            ]
-            hc_triagem = math.ceil(df_triagem_enfermeiros_filtered['quantidade_media_enfermeiros (arredondado)'].mean())
+            hc_triagem = math.ceil(media_janela(enfermeiros_por_hora))
     
             # ==========================
             # 3. Headcount em Consultório (07:00 às 18:00)
             # ==========================
-            df_medicos_consulta_filtered = df_media_medicos_consulta[
-                (df_media_medicos_consulta['hora'] >= 7) & (df_media_medicos_consulta['hora'] <= 18)
-            ]
-            hc_consultorio = math.ceil(df_medicos_consulta_filtered[COLUNAS["MEDIA_MEDICOS_CONSULTA"]["QUANTIDADE_MEDIA_MEDICOS"]].mean())
+            hc_consultorio = math.ceil(media_janela(medicos_consulta_por_hora))
     
             # ==========================
             # 4. Tempo Médio de Atendimento na Triagem
@@ -2615,16 +3724,8 @@ if uploaded_file and not missing_sheets:
             # ==========================
             # 5. Tempo Médio de Atendimento no Consultório
             # ==========================
-            df_consulta_tempo['etapa_normalizada'] = df_consulta_tempo[COLUNAS["CONSULTA_TEMPO"]["ETAPA"]].str.strip().str.lower()
-            etapa_busca = 'atendimento médico'.lower()
-    
-            mask = df_consulta_tempo['etapa_normalizada'] == etapa_busca
-    
-            if mask.any():
-                tempo_medio_consultorio = df_consulta_tempo.loc[mask, COLUNAS["CONSULTA_TEMPO"]["TEMPO_MEDIO_ETAPA"]].iloc[0]
-            else:
+            if not mask_atendimento_medico.any():
                 st.error("A etapa 'ATENDIMENTO MÉDICO' não foi encontrada em 'df_consulta_tempo'.")
-                tempo_medio_consultorio = 0
     
             # ==========================
             # 6. Tempo Porta Médico
@@ -2658,27 +3759,6 @@ if uploaded_file and not missing_sheets:
             tempo_servico_horas = {etapa: tempo / 60 for etapa, tempo in tempo_servico_etapas.items()}
             demanda_etapas = {etapa: demand_paciente_hora for etapa in etapas}
     
-            # ==========================
-            # Funções para calcular Wq em M/M/1 e M/M/c
-            # ==========================
-            def calc_Wq_MM1(lambda_, mu_):
-                rho = lambda_ / mu_
-                if rho >= 1:
-                    return np.inf
-                else:
-                    return rho / (mu_ * (1 - rho))
-    
-            def calc_Wq_MMc(lambda_, mu_, c):
-                rho = lambda_ / (c * mu_)
-                if rho >= 1:
-                    return np.inf
-                else:
-                    sum_terms = sum([((c * rho) ** n) / math.factorial(n) for n in range(int(c))])
-                    last_term = ((c * rho) ** c) / (math.factorial(int(c)) * (1 - rho))
-                    P0 = 1 / (sum_terms + last_term)
-                    Lq = (((c * rho) ** c) * rho) / (math.factorial(int(c)) * ((1 - rho) ** 2)) * P0
-                    return Lq / lambda_
-    
             # ==========================
             # Cálculo das Variáveis, TE e Lq para cada Etapa
             # ==========================
@@ -2721,6 +3801,21 @@ if uploaded_file and not missing_sheets:
     
                 TE_etapas[etapa] = TE
                 Lq_etapas[etapa] = Lq
+
+            # Intervalo do TE: demanda contada na janela diurna ao longo do período e tempos de
+            # serviço como médias de atendimentos exponenciais (premissa do próprio M/M/c)
+            atendimentos_periodo = demand_paciente_hora * (JANELA_DIURNA[1] - JANELA_DIURNA[0] + 1) * dias_observacao
+
+            def calcular_te_etapas(demanda, **tempos):
+                return {
+                    etapa: metricas_mmc(demanda, 60 / tempos[etapa], max(1, math.ceil(headcount_etapas[etapa])))['Wq'] * 60
+                    for etapa in etapas
+                }
+
+            intervalos_te = propagar(calcular_te_etapas, {
+                'demanda': contagem(demand_paciente_hora, (JANELA_DIURNA[1] - JANELA_DIURNA[0] + 1) * dias_observacao),
+                **{etapa: media(tempo_servico_etapas[etapa], atendimentos_periodo) for etapa in etapas},
+            })
     
             # ==========================
             # Exibição dos Resultados Calculados
@@ -2735,26 +3830,25 @@ if uploaded_file and not missing_sheets:
                 'Tempo Médio de Serviço (min)': [tempo_servico_etapas[etapa] for etapa in etapas],
                 'Tempo Médio de Serviço (h)': [tempo_servico_horas[etapa] for etapa in etapas],
                 'TAF - Taxa de Atendimento Pctes/h (μ_total)': [capacidade_etapas[etapa] for etapa in etapas],
-                'Fator de Utilização % (ρ)': [fator_utilizacao[etapa] for etapa in etapas],
-                'Número de Clientes na Fila (Lq)': [Lq_etapas[etapa] if not np.isinf(Lq_etapas[etapa]) else 'Infinito' for etapa in etapas],
-                'Tempo de Espera (TE) (min)': [TE_etapas[etapa] if not np.isinf(TE_etapas[etapa]) else 'Infinito' for etapa in etapas],
+                'Fator de Utilização % (ρ)': [fator_utilizacao[etapa] * 100 for etapa in etapas],
+                'Número de Clientes na Fila (Lq)': [Lq_etapas[etapa] for etapa in etapas],
+                'Tempo de Espera (TE) (min)': [TE_etapas[etapa] for etapa in etapas],
+                'TE - Intervalo de 95% (min)': [faixa(intervalos_te[etapa]) for etapa in etapas],
             })
     
-            # Exibição da Tabela Formatada
-            df_tabela_display = df_tabela.copy()
-            df_tabela_display['Fator de Utilização % (ρ)'] = df_tabela_display['Fator de Utilização % (ρ)'].apply(lambda x: f"{x:.2%}")
-            df_tabela_display['Número de Clientes na Fila (Lq)'] = df_tabela_display['Número de Clientes na Fila (Lq)'].apply(
-                lambda x: f"{x:.2f}" if isinstance(x, (int, float)) else x
-            )
-            df_tabela_display['Tempo de Espera (TE) (min)'] = df_tabela_display['Tempo de Espera (TE) (min)'].apply(
-                lambda x: f"{x:.2f}" if isinstance(x, (int, float)) else x
-            )
-            st.dataframe(df_tabela_display.style.format({
-                'Headcount': '{:.2f}',
-                'Demanda – Pacientes/Hora (λ)': '{:.2f}',
-                'Tempo Médio de Serviço (min)': '{:.2f}',
-                'Tempo Médio de Serviço (h)': '{:.4f}',
-                'TAF - Taxa de Atendimento Pctes/h (μ_total)': '{:.2f}',
+            # Exibição da Tabela Formatada (colunas numéricas; o formato fica na configuração da tabela)
+            st.dataframe(vazio_se_infinito(df_tabela, ['Número de Clientes na Fila (Lq)', 'Tempo de Espera (TE) (min)']), column_config=config_numerica({
+                'Headcount': '%.2f',
+                'Demanda – Pacientes/Hora (λ)': '%.2f',
+                'Tempo Médio de Serviço (min)': '%.2f',
+                'Tempo Médio de Serviço (h)': '%.4f',
+                'TAF - Taxa de Atendimento Pctes/h (μ_total)': '%.2f',
+                'Fator de Utilização % (ρ)': '%.2f%%',
+                'Número de Clientes na Fila (Lq)': '%.2f',
+                'Tempo de Espera (TE) (min)': '%.2f',
+            }, ajuda={
+                'Número de Clientes na Fila (Lq)': AJUDA_FILA_INSTAVEL,
+                'Tempo de Espera (TE) (min)': AJUDA_FILA_INSTAVEL,
             }))
     
             st.markdown("---")
@@ -2773,8 +3867,7 @@ if uploaded_file and not missing_sheets:
     
             # Preparar escala de cores para os tempos de espera
             TE_values = [te for te in TE_etapas.values() if not np.isinf(te)] + [TE_recepcao]
-            norm = mcolors.Normalize(vmin=min(TE_values), vmax=max(TE_values))
-            cmap = mcolors.LinearSegmentedColormap.from_list("", ["#FFCCCC", "#FF0000"])
+            te_min, te_max = min(TE_values), max(TE_values)
     
             # Criar o diagrama VSM usando Graphviz
             dot = gv.Digraph(format='png')
@@ -2792,7 +3885,7 @@ if uploaded_file and not missing_sheets:
             )
     
             # Adicionar nó de TE Recepção
-            color_te_recepcao = mcolors.to_hex(cmap(norm(TE_recepcao)))
+            color_te_recepcao = cor_escala(TE_recepcao, te_min, te_max)
             dot.node(
                 'TE_Recepção',
                 f"TE Recepção\n{TE_recepcao:.2f} min",
@@ -2815,7 +3908,7 @@ if uploaded_file and not missing_sheets:
     
             for etapa in etapas:
                 tempo_espera = TE_etapas[etapa]
-                color = mcolors.to_hex(cmap(norm(tempo_espera)))
+                color = cor_escala(tempo_espera, te_min, te_max)
                 te_node = f"TE_{etapa}"
                 dot.node(
                     te_node,
@@ -2854,39 +3947,43 @@ if uploaded_file and not missing_sheets:
             dot.edge('Início', 'Consultório', label=f'Tempo Porta Médico\n{tempo_porta_medico:.2f} min', style='dashed', color='black', fontsize='14')
     
             # Renderizar o diagrama no Streamlit
-            st.graphviz_chart(dot)
+            exibir_vsm(dot)
     
             st.markdown("#### 2️⃣ Análise de Capacidade, Demanda e Takt Time")
     
             col1, col2 = st.columns(2)
     
             with col1:
-                # Gráfico de Capacidade vs Demanda
-                fig_cap_dem = go.Figure()
-                fig_cap_dem.add_trace(go.Bar(
-                    x=etapas,
-                    y=[capacidade_etapas[e] for e in etapas],
-                    name='TAF - Taxa de Atendimento (μ_total)',
-                    marker_color='blue',
-                    text=[f"{capacidade_etapas[e]:.2f}" for e in etapas],
-                    textposition='inside',
-                    insidetextanchor='middle',
-                    textfont=dict(color='white')
-                ))
-                fig_cap_dem.add_trace(go.Scatter(
-                    x=etapas,
-                    y=[demanda_etapas[e] for e in etapas],
-                    mode='lines+markers+text',
-                    name='Demanda – Pacientes/Hora (λ)',
-                    line=dict(color='red', width=2),
-                    text=[f"{demanda_etapas[e]:.2f}" for e in etapas],
-                    textposition='top center'
-                ))
-                fig_cap_dem.update_layout(
-                    title='Capacidade vs Demanda',
-                    xaxis_title='Etapas',
-                    yaxis_title='Pacientes/Hora'
-                )
+                def construir_fig_cap_dem():
+                    # Gráfico de Capacidade vs Demanda
+                    fig_cap_dem = go.Figure()
+                    fig_cap_dem.add_trace(go.Bar(
+                        x=etapas,
+                        y=[capacidade_etapas[e] for e in etapas],
+                        name='TAF - Taxa de Atendimento (μ_total)',
+                        marker_color='blue',
+                        texttemplate='%{y:.2f}',
+                        textposition='inside',
+                        insidetextanchor='middle',
+                        textfont=dict(color='white')
+                    ))
+                    fig_cap_dem.add_trace(go.Scatter(
+                        x=etapas,
+                        y=[demanda_etapas[e] for e in etapas],
+                        mode='lines+markers+text',
+                        name='Demanda – Pacientes/Hora (λ)',
+                        line=dict(color='red', width=2),
+                        texttemplate='%{y:.2f}',
+                        textposition='top center'
+                    ))
+                    fig_cap_dem.update_layout(
+                        title='Capacidade vs Demanda',
+                        xaxis_title='Etapas',
+                        yaxis_title='Pacientes/Hora'
+                    )
+                    return fig_cap_dem
+
+                fig_cap_dem = figura_em_cache(hash_planilha, 'capacidade_demanda_etapas', construir_fig_cap_dem)
                 st.plotly_chart(fig_cap_dem, use_container_width=True)
     
             with col2:
@@ -2898,7 +3995,7 @@ if uploaded_file and not missing_sheets:
                     y=[tempo_servico_etapas[e] for e in etapas],
                     name='Tempo de Serviço (TS)',
                     marker_color='lightblue',
-                    text=[f"{tempo_servico_etapas[e]:.2f}" for e in etapas],
+                    texttemplate='%{y:.2f}',
                     textposition='inside',
                     insidetextanchor='middle',
                     textfont=dict(color='black')
@@ -2915,9 +4012,7 @@ if uploaded_file and not missing_sheets:
                     y=[60/capacidade_etapas[e] for e in etapas],
                     mode='markers',
                     name='TAF (min/paciente)',
-                    marker=dict(color='green', size=10, symbol='diamond'),
-                    text=[f"{(60/capacidade_etapas[e]):.2f}" for e in etapas],
-                    textposition='top center'
+                    marker=dict(color='green', size=10, symbol='diamond')
                 ))
                 fig_ts_takt.update_layout(
                     title='TS vs Takt Time vs TAF',
@@ -2928,35 +4023,39 @@ if uploaded_file and not missing_sheets:
     
             st.markdown("#### 3️⃣ Fator de Utilização por Etapa")
     
-            fig_utilizacao = go.Figure(data=[
-                go.Bar(
-                    x=etapas,
-                    y=[fator_utilizacao[e] * 100 for e in etapas],
-                    text=[f"{fator_utilizacao[e]*100:.2f}%" for e in etapas],
-                    textposition='inside',
-                    insidetextanchor='middle',
-                    marker_color='lightblue'
+            def construir_fig_utilizacao():
+                fig_utilizacao = go.Figure(data=[
+                    go.Bar(
+                        x=etapas,
+                        y=[fator_utilizacao[e] * 100 for e in etapas],
+                        texttemplate='%{y:.2f}%',
+                        textposition='inside',
+                        insidetextanchor='middle',
+                        marker_color='lightblue'
+                    )
+                ])
+        
+                # Adicionar a linha pontilhada vermelha em 85%
+                fig_utilizacao.add_hline(
+                    y=85,
+                    line_dash="dash",
+                    line_color="red",
+                    annotation_text="85% (ideal)",
+                    annotation_position="bottom right",
+                    annotation=dict(
+                        font=dict(color="black")
+                    )
                 )
-            ])
-    
-            # Adicionar a linha pontilhada vermelha em 85%
-            fig_utilizacao.add_hline(
-                y=85,
-                line_dash="dash",
-                line_color="red",
-                annotation_text="85% (ideal)",
-                annotation_position="bottom right",
-                annotation=dict(
-                    font=dict(color="black")
+        
+                fig_utilizacao.update_layout(
+                    title='Fator de Utilização por Etapa',
+                    xaxis_title='Etapas',
+                    yaxis_title='Fator de Utilização (%)',
+                    yaxis_range=[0, 100]
                 )
-            )
-    
-            fig_utilizacao.update_layout(
-                title='Fator de Utilização por Etapa',
-                xaxis_title='Etapas',
-                yaxis_title='Fator de Utilização (%)',
-                yaxis_range=[0, 100]
-            )
+                return fig_utilizacao
+
+            fig_utilizacao = figura_em_cache(hash_planilha, 'utilizacao_etapas', construir_fig_utilizacao)
     
             st.plotly_chart(fig_utilizacao, use_container_width=True)
     
@@ -2971,12 +4070,16 @@ if uploaded_file and not missing_sheets:
         # ==========================
         # Sub-aba 2: Demanda/Especialidade
         # ==========================
-        with subtab2:
+        if subsecao == 'especialidade':
             st.markdown("### Demanda/Especialidade")
             st.markdown("#### 📊 Métricas do Processo - Demanda/Especialidade")
     
             # Filtrar o intervalo de 07:00 às 18:00
-            df_horarios_intervalo = df_horarios[(df_horarios['hora'] >= 7) & (df_horarios['hora'] <= 18)]
+            hora_inicio, hora_fim = JANELA_DIURNA
+            df_horarios_intervalo = pd.DataFrame({
+                'hora': range(hora_inicio, hora_fim + 1),
+                'quantidade_media_pacientes': perfil_horario(matriz_demanda, sem_dado=horas_sem_demanda)[hora_inicio:hora_fim + 1],
+            })
     
             # Garantir que 'percentual_atendimento_dia' está em formato decimal
             df_media_medicos_especialidade[COLUNAS["MEDIA_MEDICOS_ESPECIALIDADE"]["PERCENTUAL_ATENDIMENTO_DIA"]] = df_media_medicos_especialidade[
@@ -3100,24 +4203,24 @@ if uploaded_file and not missing_sheets:
             # Converter 'Taxa de Atendimento (%)' para percentual
             df_especialidades_display['Taxa de Atendimento (%)'] = df_especialidades_display['Taxa de Atendimento (%)'] * 100
     
-            # Formatar os valores para exibição
-            df_especialidades_display['Fator de Utilização % (rho)'] = df_especialidades_display['Fator de Utilização % (rho)'].apply(lambda x: f"{x:.2%}")
-            df_especialidades_display['Número de Clientes na Fila (Lq)'] = df_especialidades_display['Número de Clientes na Fila (Lq)'].apply(
-                lambda x: f"{x:.2f}" if not np.isinf(x) else 'Infinito'
-            )
-            df_especialidades_display['Tempo de Espera (TE) (min)'] = df_especialidades_display['Tempo de Espera (TE) (min)'].apply(
-                lambda x: f"{x:.2f}" if not np.isinf(x) else 'Infinito'
-            )
+            # Fator de utilização em % (continua numérico; o formato fica na configuração da tabela)
+            df_especialidades_display['Fator de Utilização % (rho)'] = df_especialidades_display['Fator de Utilização % (rho)'] * 100
     
             # Exibir a tabela no Streamlit
-            st.dataframe(df_especialidades_display.style.format({
-                'Headcount': '{:.2f}',
-                'Taxa de Atendimento (%)': '{:.2f}%',
-                'Pctes/dia': '{:.0f}',
-                'Demanda (Pacientes/Hora)': '{:.2f}',
-                'Tempo Médio de Serviço (min)': '{:.2f}',
-                'Tempo Médio de Serviço (h)': '{:.4f}',
-                'TAF - Taxa de Atendimento Pctes/h (mu_total)': '{:.2f}',
+            st.dataframe(vazio_se_infinito(df_especialidades_display, ['Número de Clientes na Fila (Lq)', 'Tempo de Espera (TE) (min)']), column_config=config_numerica({
+                'Headcount': '%.2f',
+                'Taxa de Atendimento (%)': '%.2f%%',
+                'Pctes/dia': '%.0f',
+                'Demanda (Pacientes/Hora)': '%.2f',
+                'Tempo Médio de Serviço (min)': '%.2f',
+                'Tempo Médio de Serviço (h)': '%.4f',
+                'TAF - Taxa de Atendimento Pctes/h (mu_total)': '%.2f',
+                'Fator de Utilização % (rho)': '%.2f%%',
+                'Número de Clientes na Fila (Lq)': '%.2f',
+                'Tempo de Espera (TE) (min)': '%.2f',
+            }, ajuda={
+                'Número de Clientes na Fila (Lq)': AJUDA_FILA_INSTAVEL,
+                'Tempo de Espera (TE) (min)': AJUDA_FILA_INSTAVEL,
             }))
     
             st.markdown("---")
@@ -3149,11 +4252,9 @@ if uploaded_file and not missing_sheets:
             gargalo_esp = df_especialidades_display.loc[gargalo_idx, 'Especialidade']
     
             # Criar escala de cores para TE
-            te_values = df_especialidades_display['Tempo de Espera (TE) (min)'].replace('Infinito', np.inf).astype(float)
+            te_values = df_especialidades_display['Tempo de Espera (TE) (min)']
             te_values_finite = te_values[te_values != np.inf]
             vmin, vmax = te_values_finite.min(), te_values_finite.max()
-            norm = mcolors.Normalize(vmin=vmin, vmax=vmax)
-            cmap = mcolors.LinearSegmentedColormap.from_list("", ["#FFCCCC", "#FF0000"])
     
             # Criar nós para cada especialidade
             for idx, row in df_especialidades_display.iterrows():
@@ -3162,11 +4263,13 @@ if uploaded_file and not missing_sheets:
                 ts = row['Tempo Médio de Serviço (min)']
     
                 # Nó de TE
-                if te == 'Infinito':
+                if np.isinf(te):
                     color = '#FF0000'  # Vermelho escuro para TE infinito
+                    texto_te = 'Infinito'
                 else:
-                    color = mcolors.to_hex(cmap(norm(float(te))))
-                dot.node(f'te_{esp}', f'TE: {te} min', shape='note', style='filled', fillcolor=color)
+                    color = cor_escala(te, vmin, vmax)
+                    texto_te = f"{te:.2f}"
+                dot.node(f'te_{esp}', f'TE: {texto_te} min', shape='note', style='filled', fillcolor=color)
     
                 # Nó da especialidade
                 color = 'purple' if esp == gargalo_esp else 'lightblue'
@@ -3179,37 +4282,41 @@ if uploaded_file and not missing_sheets:
                 dot.edge('start', f'te_{esp}')
                 dot.edge(f'te_{esp}', esp)
     
-            st.graphviz_chart(dot)
+            exibir_vsm(dot)
     
             # Gráficos de Análise
     
             st.markdown("##### 2️⃣ Análise de Capacidade vs Demanda")
     
-            # Gráfico de Capacidade vs Demanda
-            fig_cap_dem = go.Figure()
-            fig_cap_dem.add_trace(go.Bar(
-                x=df_especialidades_display['Especialidade'],
-                y=df_especialidades_display['TAF - Taxa de Atendimento Pctes/h (mu_total)'],
-                name='Capacidade (TAF)',
-                text=df_especialidades_display['TAF - Taxa de Atendimento Pctes/h (mu_total)'].round(2),
-                textposition='inside',
-                insidetextanchor='middle',
-                textfont=dict(color='black')
-            ))
-            fig_cap_dem.add_trace(go.Scatter(
-                x=df_especialidades_display['Especialidade'],
-                y=df_especialidades_display['Demanda (Pacientes/Hora)'],
-                mode='lines+markers+text',
-                name='Demanda',
-                text=df_especialidades_display['Demanda (Pacientes/Hora)'].round(2),
-                textposition='top center'
-            ))
-            fig_cap_dem.update_layout(
-                title='Capacidade vs Demanda',
-                xaxis_title='Especialidade',
-                yaxis_title='Pacientes/Hora',
-                barmode='group'
-            )
+            def construir_fig_cap_dem():
+                # Gráfico de Capacidade vs Demanda
+                fig_cap_dem = go.Figure()
+                fig_cap_dem.add_trace(go.Bar(
+                    x=df_especialidades_display['Especialidade'],
+                    y=df_especialidades_display['TAF - Taxa de Atendimento Pctes/h (mu_total)'],
+                    name='Capacidade (TAF)',
+                    texttemplate='%{y:.2~f}',
+                    textposition='inside',
+                    insidetextanchor='middle',
+                    textfont=dict(color='black')
+                ))
+                fig_cap_dem.add_trace(go.Scatter(
+                    x=df_especialidades_display['Especialidade'],
+                    y=df_especialidades_display['Demanda (Pacientes/Hora)'],
+                    mode='lines+markers+text',
+                    name='Demanda',
+                    texttemplate='%{y:.2~f}',
+                    textposition='top center'
+                ))
+                fig_cap_dem.update_layout(
+                    title='Capacidade vs Demanda',
+                    xaxis_title='Especialidade',
+                    yaxis_title='Pacientes/Hora',
+                    barmode='group'
+                )
+                return fig_cap_dem
+
+            fig_cap_dem = figura_em_cache(hash_planilha, 'capacidade_demanda_especialidades', construir_fig_cap_dem)
             st.plotly_chart(fig_cap_dem, use_container_width=True)
     
             st.markdown("##### 3️⃣ Análise de TS vs Takt Time vs TAF")
@@ -3222,7 +4329,7 @@ if uploaded_file and not missing_sheets:
                 x=df_especialidades_display['Especialidade'],
                 y=df_especialidades_display['Tempo Médio de Serviço (min)'],
                 name='Tempo de Serviço (TS)',
-                text=df_especialidades_display['Tempo Médio de Serviço (min)'].round(2),
+                texttemplate='%{y:.2~f}',
                 textposition='inside',
                 insidetextanchor='middle',
                 textfont=dict(color='black')
@@ -3254,10 +4361,10 @@ if uploaded_file and not missing_sheets:
             fig_util = go.Figure()
             fig_util.add_trace(go.Bar(
                 x=df_especialidades_display['Especialidade'],
-                y=df_especialidades_display['Fator de Utilização % (rho)'].str.rstrip('%').astype(float),
-                marker_color=df_especialidades_display['Fator de Utilização % (rho)'].str.rstrip('%').astype(float),
+                y=df_especialidades_display['Fator de Utilização % (rho)'],
+                marker_color=df_especialidades_display['Fator de Utilização % (rho)'],
                 marker_colorscale='Blues',
-                text=df_especialidades_display['Fator de Utilização % (rho)'],
+                texttemplate='%{y:.2f}%',
                 textposition='inside',
                 insidetextanchor='middle',
                 textfont=dict(color='black')
@@ -3281,13 +4388,13 @@ if uploaded_file and not missing_sheets:
             seria necessário considerar tempos específicos para cada especialidade.
             """)
     
-            potenciais_gargalos = df_especialidades_display[df_especialidades_display['Fator de Utilização % (rho)'].str.rstrip('%').astype(float) > 85]['Especialidade'].tolist()
+            potenciais_gargalos = df_especialidades_display[df_especialidades_display['Fator de Utilização % (rho)'] > 85]['Especialidade'].tolist()
             if potenciais_gargalos:
                 st.write("1. **Especialidades com Alta Utilização:** As seguintes especialidades apresentam um fator de utilização superior a 85%, o que pode indicar sobrecarga:")
                 for esp in potenciais_gargalos:
                     st.write(f"   - {esp}")
     
-            baixa_utilizacao = df_especialidades_display[df_especialidades_display['Fator de Utilização % (rho)'].str.rstrip('%').astype(float) < 50]['Especialidade'].tolist()
+            baixa_utilizacao = df_especialidades_display[df_especialidades_display['Fator de Utilização % (rho)'] < 50]['Especialidade'].tolist()
             if baixa_utilizacao:
                 st.write("2. **Especialidades com Baixa Utilização:** As seguintes especialidades apresentam um fator de utilização inferior a 50%, o que pode sugerir capacidade ociosa:")
                 for esp in baixa_utilizacao:
@@ -3300,7 +4407,128 @@ if uploaded_file and not missing_sheets:
                 st.write("   - *O que isso pode indicar?* O sistema pode estar sob pressão, pois o Takt Time é menor que o TS médio.")
             else:
                 st.write("   - *O que isso pode indicar?* O sistema parece ter capacidade para atender à demanda atual, pois o Takt Time é maior que o TS médio.")
-    
+
+            st.markdown("---")
+
+            # ==========================
+            # Otimização da Alocação de Médicos por Especialidade
+            # ==========================
+            st.markdown("##### 5️⃣ Otimização da Alocação de Médicos por Especialidade")
+            st.markdown("""
+            Redistribui o mesmo total de médicos entre as especialidades para reduzir o tempo de espera,
+            usando análise marginal sobre o modelo M/M/c (cada médico adicional é alocado onde reduz mais a espera).
+            """)
+
+            # Trocar o objetivo reexecuta apenas a otimização
+            @st.fragment
+            def exibir_alocacao_medicos():
+                objetivo_alocacao = st.radio(
+                    "Objetivo da otimização",
+                    ["Minimizar a espera total", "Minimizar a maior espera"],
+                    horizontal=True,
+                    key="objetivo_alocacao_medicos"
+                )
+
+                # Headcount atual no mesmo critério da tabela (médicos inteiros, mínimo de 1)
+                headcount_atual = np.maximum(1, np.ceil(df_especialidades_grouped['Headcount'].to_numpy(dtype=float))).astype(int)
+                demanda_especialidades = df_especialidades_grouped['Pacientes_Especialidade'].fillna(0).to_numpy(dtype=float)
+                total_medicos_pool = int(headcount_atual.sum())
+
+                if tempo_medio_consultorio <= 0:
+                    st.warning("Não é possível otimizar a alocação sem o tempo médio da etapa 'ATENDIMENTO MÉDICO'.")
+                else:
+                    mu_medico = 60 / tempo_medio_consultorio
+                    try:
+                        headcount_proposto = otimizar_alocacao(
+                            demanda_especialidades,
+                            mu_medico,
+                            total_medicos_pool,
+                            objetivo='total' if objetivo_alocacao == "Minimizar a espera total" else 'maximo'
+                        )
+                    except ValueError as e:
+                        st.warning(f"Não foi possível otimizar a alocação: {e}")
+                    else:
+                        te_atual = metricas_mmc(demanda_especialidades, mu_medico, headcount_atual)['Wq'] * 60
+                        te_proposto = metricas_mmc(demanda_especialidades, mu_medico, headcount_proposto)['Wq'] * 60
+
+                        df_alocacao = pd.DataFrame({
+                            'Especialidade': df_especialidades_grouped['Especialidade'],
+                            'Headcount Atual': headcount_atual,
+                            'Headcount Proposto': headcount_proposto,
+                            'Variação': headcount_proposto - headcount_atual,
+                            'TE Atual (min)': te_atual,
+                            'TE Proposto (min)': te_proposto,
+                        })
+
+                        demanda_total = demanda_especialidades.sum()
+                        if demanda_total > 0:
+                            te_medio_atual = (demanda_especialidades * te_atual).sum() / demanda_total
+                            te_medio_proposto = (demanda_especialidades * te_proposto).sum() / demanda_total
+                        else:
+                            te_medio_atual = te_medio_proposto = 0.0
+
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Total de Médicos (fixo)", f"{total_medicos_pool}")
+                        with col2:
+                            st.metric(
+                                "TE Médio Ponderado (min)",
+                                f"{te_medio_proposto:.2f}" if np.isfinite(te_medio_proposto) else "Infinito",
+                                delta=f"{te_medio_proposto - te_medio_atual:.2f}" if np.isfinite(te_medio_atual) else None,
+                                delta_color="inverse"
+                            )
+                        with col3:
+                            st.metric(
+                                "Maior TE (min)",
+                                f"{te_proposto.max():.2f}" if np.isfinite(te_proposto.max()) else "Infinito",
+                                delta=f"{te_proposto.max() - te_atual.max():.2f}" if np.isfinite(te_atual.max()) else None,
+                                delta_color="inverse"
+                            )
+
+                        st.dataframe(vazio_se_infinito(df_alocacao, ['TE Atual (min)', 'TE Proposto (min)']), column_config=config_numerica({
+                            'TE Atual (min)': '%.2f',
+                            'TE Proposto (min)': '%.2f',
+                        }, ajuda={
+                            'TE Atual (min)': AJUDA_FILA_INSTAVEL,
+                            'TE Proposto (min)': AJUDA_FILA_INSTAVEL,
+                        }))
+
+                        fig_alocacao = go.Figure()
+                        fig_alocacao.add_trace(go.Bar(
+                            x=df_alocacao['Especialidade'],
+                            y=df_alocacao['Headcount Atual'],
+                            name='Atual',
+                            marker_color='lightblue',
+                            text=df_alocacao['Headcount Atual'],
+                            textposition='inside'
+                        ))
+                        fig_alocacao.add_trace(go.Bar(
+                            x=df_alocacao['Especialidade'],
+                            y=df_alocacao['Headcount Proposto'],
+                            name='Proposto',
+                            marker_color='blue',
+                            text=df_alocacao['Headcount Proposto'],
+                            textposition='inside'
+                        ))
+                        fig_alocacao.update_layout(
+                            title='Alocação de Médicos: Atual vs Proposta',
+                            xaxis_title='Especialidade',
+                            yaxis_title='Médicos',
+                            barmode='group'
+                        )
+                        st.plotly_chart(fig_alocacao, use_container_width=True)
+
+                        especialidades_alteradas = df_alocacao[df_alocacao['Variação'] != 0]
+                        st.markdown("**Observação analítica:**")
+                        if especialidades_alteradas.empty:
+                            st.write("A alocação atual já é a melhor possível para o objetivo escolhido com o total de médicos disponível.")
+                        else:
+                            for _, row in especialidades_alteradas.iterrows():
+                                acao = "receber" if row['Variação'] > 0 else "ceder"
+                                st.write(f"- **{row['Especialidade']}** deve {acao} {abs(int(row['Variação']))} médico(s).")
+
+            exibir_alocacao_medicos()
+
             st.markdown("---")
             
 
@@ -3308,119 +4536,16 @@ if uploaded_file and not missing_sheets:
         # Sub-aba 3: Setor
         # ==========================
   
-        with subtab3:
+        if subsecao == 'setores':
             st.markdown("### Setor")
             st.markdown("#### 📊 Métricas do Processo - Demanda/Setor")
         
-            # Função aprimorada para calcular métricas de fila com tratamento para grandes valores de 'c'
-            def calcular_metricas_fila(lambda_, mu, c):
-                rho = lambda_ / (c * mu)
-                if rho >= 1 or c == 0:
-                    return np.inf, np.inf  # Sistema instável ou inválido
-                
-                if c > 100:
-                    # Aproximação para grandes valores de 'c'
-                    Lq = rho / (1 - rho )
-                else:
-                    # Cálculo exato para c <= 100
-                    lambda_mu = lambda_ / mu
-                    c_int = int(c)
-                    try:
-                        log_sum_terms = [n * math.log(lambda_mu) - special.gammaln(n +1) for n in range(c_int)]
-                        # Evita overflow ao calcular log_sum_exp
-                        max_log = max(log_sum_terms)
-                        sum_exp = sum( math.exp(x - max_log) for x in log_sum_terms )
-                        log_sum = max_log + math.log(sum_exp)
-                        log_last_term = c * math.log(lambda_mu) - special.gammaln(c +1) - math.log(1 - rho )
-                        # P0 = 1 / (sum_{n=0}^{c-1} term_n + term_c )
-                        # Utilizando log_sum_exp de forma simplificada
-                        sum_total = math.exp(log_sum - log_sum) + math.exp(log_last_term - log_sum)
-                        P0 = 1 / ( math.exp(log_sum) * (1 + math.exp(log_last_term - log_sum)) )
-                        # Calcular Lq
-                        Lq = ( (lambda_mu **c) * rho * P0 ) / ( special.gammaln(c +1) * (1 - rho )**2 )
-                    except (OverflowError, ZeroDivisionError, ValueError):
-                        return np.inf, np.inf  # Retorna infinito em caso de erro
-                # Cálculo de Wq usando Lq
-                Wq = Lq / lambda_ if lambda_ >0 else 0
-                
-                return Lq, Wq
-        
             # Função para converter horas decimais para horas e minutos
             def converter_horas_para_horas_minutos(decimal_horas):
                 horas = int(decimal_horas)
                 minutos = int(round((decimal_horas - horas) * 60))
                 return f"{horas} hora{'s' if horas !=1 else ''} e {minutos} minuto{'s' if minutos !=1 else ''}"
         
-            # Assumindo que df_passagem_setores e df_internacao_demanda são DataFrames já carregados do Excel
-            passagem_setores = df_passagem_setores.copy()
-            internacao_demanda = df_internacao_demanda.copy()
-            
-            # Mapeamento de setores
-            setor_mapping = {
-                "Geral": "Leitos Geral",
-                "P.A. (ENF.)": "Leitos Enfermaria",
-                "P.A. (UTI)": "Leitos UTI",
-                "P.A. (CIRÚRGICOS)": "Leitos Cirúrgicos",
-                "P.A. (CLÍNICOS)": "Leitos para Enfermaria (Origem P.A.)"
-            }
-            
-            # Criar DataFrame final
-            df_final = passagem_setores.copy()
-            df_final['Capacidade (Leitos/Dia)'] = df_final['quantidade_leitos'] / df_final['tempo_medio_permanencia_dias']
-            
-            # Adicionar demanda
-            demanda_dict = dict(zip(internacao_demanda['solicitacoes_leito'], internacao_demanda['media_solicitacoes_dia']))
-            df_final['Demanda (Média Solicitações/Dia)'] = df_final['setores'].map(setor_mapping).map(demanda_dict)
-            
-            # Tratar possíveis valores NaN na Demanda
-            df_final['Demanda (Média Solicitações/Dia)'] = df_final['Demanda (Média Solicitações/Dia)'].fillna(0)
-            
-            # Calcular Fator de Utilização
-            df_final['Fator de Utilização (%)'] = (df_final['Demanda (Média Solicitações/Dia)'] / 
-                                                   df_final['Capacidade (Leitos/Dia)']) * 100
-            
-            # Calcular métricas de fila
-            df_final['Lq (Solicitações na Fila)'] = 0.0  # Alterado de "Lq (Pacientes na Fila)"
-            df_final['Wq (Tempo de Espera em Dias)'] = 0.0
-            df_final['Wq (Tempo de Espera em Horas)'] = 0.0  # Nova coluna para Wq em horas
-            
-            for index, row in df_final.iterrows():
-                lambda_ = row['Demanda (Média Solicitações/Dia)']
-                mu = 1 / row['tempo_medio_permanencia_dias'] if row['tempo_medio_permanencia_dias'] > 0 else np.inf
-                c = row['quantidade_leitos']
-                try:
-                    lq, wq = calcular_metricas_fila(lambda_, mu, c)
-                    df_final.at[index, 'Lq (Solicitações na Fila)'] = lq  # Alterado de "Pacientes na Fila"
-                    df_final.at[index, 'Wq (Tempo de Espera em Dias)'] = wq
-                    df_final.at[index, 'Wq (Tempo de Espera em Horas)'] = wq * 24  # Converter dias em horas
-                except (OverflowError, ZeroDivisionError, ValueError):
-                    df_final.at[index, 'Lq (Solicitações na Fila)'] = np.inf  # Alterado de "Pacientes na Fila"
-                    df_final.at[index, 'Wq (Tempo de Espera em Dias)'] = np.inf
-                    df_final.at[index, 'Wq (Tempo de Espera em Horas)'] = np.inf
-        
-            # Formatar o DataFrame final
-            df_final = df_final.rename(columns={
-                'setores': 'Setores',
-                'quantidade_leitos': 'Quantidade de Leitos',
-                'tempo_medio_permanencia_dias': 'TMP (Dias)'
-            })
-        
-            df_final = df_final[[
-                'Setores', 'Quantidade de Leitos', 'TMP (Dias)', 'Capacidade (Leitos/Dia)',
-                'Demanda (Média Solicitações/Dia)', 'Fator de Utilização (%)',
-                'Lq (Solicitações na Fila)', 'Wq (Tempo de Espera em Dias)', 'Wq (Tempo de Espera em Horas)'
-            ]]
-        
-            # Arredondar valores numéricos
-            df_final = df_final.round({
-                'Capacidade (Leitos/Dia)': 2,
-                'Demanda (Média Solicitações/Dia)': 2,
-                'Fator de Utilização (%)': 2,
-                'Lq (Solicitações na Fila)': 2,  # Alterado de "Pacientes na Fila"
-                'Wq (Tempo de Espera em Dias)': 4,   # Mais casas decimais para maior precisão
-                'Wq (Tempo de Espera em Horas)': 2
-            })
-        
             # Exibir o DataFrame final
             st.dataframe(df_final)
         
@@ -3452,13 +4577,17 @@ if uploaded_file and not missing_sheets:
         
             # Gráfico de barras para Fator de Utilização
             st.subheader("Fator de Utilização por Setor")
-            fig_utilizacao = px.bar(df_final, x='Setores', y='Fator de Utilização (%)',
-                                    text='Fator de Utilização (%)',
-                                    color='Fator de Utilização (%)',
-                                    color_continuous_scale=px.colors.sequential.Reds)
-            fig_utilizacao.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-            fig_utilizacao.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="100% Utilização")
-            fig_utilizacao.update_layout(height=500, xaxis_tickangle=-45)
+            def construir_fig_utilizacao():
+                fig_utilizacao = px.bar(df_final, x='Setores', y='Fator de Utilização (%)',
+                                        text='Fator de Utilização (%)',
+                                        color='Fator de Utilização (%)',
+                                        color_continuous_scale=px.colors.sequential.Reds)
+                fig_utilizacao.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                fig_utilizacao.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="100% Utilização")
+                fig_utilizacao.update_layout(height=500, xaxis_tickangle=-45)
+                return fig_utilizacao
+
+            fig_utilizacao = figura_em_cache(hash_planilha, 'utilizacao_setores', construir_fig_utilizacao)
             st.plotly_chart(fig_utilizacao, use_container_width=True)
         
             # Gráfico de dispersão para Demanda vs Capacidade
@@ -3515,13 +4644,13 @@ if uploaded_file and not missing_sheets:
             # Gráfico adicional: Distribuição das Demandas e Capacidades
             st.subheader("Distribuição das Demandas e Capacidades")
             fig_dist = go.Figure()
-            fig_dist.add_trace(go.Box(
-                y=df_final['Demanda (Média Solicitações/Dia)'],
+            fig_dist.add_trace(caixa(
+                df_final['Demanda (Média Solicitações/Dia)'],
                 name='Demanda',
                 marker_color='orange'
             ))
-            fig_dist.add_trace(go.Box(
-                y=df_final['Capacidade (Leitos/Dia)'],
+            fig_dist.add_trace(caixa(
+                df_final['Capacidade (Leitos/Dia)'],
                 name='Capacidade',
                 marker_color='green'
             ))
@@ -3531,6 +4660,74 @@ if uploaded_file and not missing_sheets:
             )
             st.plotly_chart(fig_dist, use_container_width=True)
             st.write("Este gráfico mostra a distribuição das demandas e capacidades entre os setores, permitindo identificar variações e possíveis outliers.")
+
+            # Simulação do censo diário de leitos
+            st.subheader("Simulação do Censo Diário de Leitos (Monte Carlo)")
+            st.markdown("""
+            Simula o número de pacientes internados em cada setor dia a dia, com chegadas de Poisson na média de solicitações
+            e altas compatíveis com o TMP. Diferente da média, a simulação mostra com que frequência o censo ultrapassa os
+            leitos disponíveis e quantos dias por ano o setor opera em transbordo.
+            """)
+
+            # Os parâmetros da simulação reexecutam apenas este trecho
+            @st.fragment
+            def exibir_simulacao_censo():
+                col1, col2 = st.columns(2)
+                with col1:
+                    dias_censo = st.number_input("Horizonte simulado (dias)", min_value=30, max_value=730, value=365, step=30, key="dias_censo")
+                with col2:
+                    replicacoes_censo = st.number_input("Replicações", min_value=100, max_value=5000, value=1000, step=100, key="replicacoes_censo")
+
+                censo = simular_censo(
+                    df_final['Demanda (Média Solicitações/Dia)'].to_numpy(),
+                    df_final['TMP (Dias)'].to_numpy(),
+                    dias=dias_censo,
+                    replicacoes=replicacoes_censo
+                )
+                resumo_censo = resumir_censo(censo, df_final['Quantidade de Leitos'].to_numpy())
+
+                df_censo = pd.DataFrame({
+                    'Setores': df_final['Setores'],
+                    'Leitos': df_final['Quantidade de Leitos'],
+                    'Censo P50': resumo_censo['percentis'][50],
+                    'Censo P90': resumo_censo['percentis'][90],
+                    'Censo P95': resumo_censo['percentis'][95],
+                    'Ocupação Média (%)': resumo_censo['ocupacao_media'] * 100,
+                    'P(Censo > Leitos) (%)': resumo_censo['prob_excesso'] * 100,
+                    'Dias em Transbordo': resumo_censo['dias_excesso'],
+                    'Pacientes Excedentes/Dia': resumo_censo['pacientes_excesso']
+                }).round(2)
+                st.dataframe(df_censo, hide_index=True)
+
+                fig_censo = go.Figure()
+                for percentil, cor in zip((50, 90, 95), ('#3498db', '#f39c12', '#e74c3c')):
+                    fig_censo.add_trace(go.Bar(
+                        x=df_censo['Setores'], y=df_censo[f'Censo P{percentil}'],
+                        name=f'Censo P{percentil}', marker_color=cor
+                    ))
+                fig_censo.add_trace(go.Scatter(
+                    x=df_censo['Setores'], y=df_censo['Leitos'], name='Leitos',
+                    mode='markers', marker=dict(symbol='line-ew', size=40, line=dict(width=3, color='black'))
+                ))
+                fig_censo.update_layout(
+                    barmode='group',
+                    yaxis_title='Pacientes internados',
+                    template=TEMA,
+                    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+                    height=500
+                )
+                st.plotly_chart(fig_censo, use_container_width=True)
+
+                setores_transbordo = df_censo[df_censo['P(Censo > Leitos) (%)'] > 5]
+                if not setores_transbordo.empty:
+                    for _, row in setores_transbordo.iterrows():
+                        st.write(f"- **{row['Setores']}**: o censo excede os **{row['Leitos']:.0f}** leitos em **{row['P(Censo > Leitos) (%)']:.1f}%** dos dias "
+                                 f"(cerca de **{row['Dias em Transbordo']:.0f}** dias em {int(dias_censo)}), com **{row['Pacientes Excedentes/Dia']:.1f}** paciente(s) excedente(s) por dia em média.")
+                else:
+                    st.write("Nenhum setor excede a capacidade de leitos em mais de 5% dos dias simulados.")
+                st.caption("Permanência geométrica com média igual ao TMP; o censo não é limitado pelos leitos, de modo que o excedente representa transbordo.")
+
+            exibir_simulacao_censo()
         
             # Considerações finais
             st.markdown("### ⚠️ Considerações Finais")
@@ -3544,6 +4741,174 @@ if uploaded_file and not missing_sheets:
         
             Utilize estas informações como um componente de um processo de tomada de decisão mais amplo, sempre priorizando a segurança e o bem-estar dos pacientes e da equipe de saúde.
             """)
-        
-                    
-                
+
+        st.markdown("---")
+
+        # =====================================
+        # Dimensionamento a partir da Previsão de Demanda
+        # =====================================
+        st.markdown("#### 🔮 Dimensionamento a partir da Previsão de Demanda")
+        st.markdown("""
+        Converte a previsão mensal de pacientes em demanda por dia da semana e hora (matriz dia × hora reconstruída dos perfis semanal e horário)
+        e calcula, para os limites inferior e superior do intervalo de previsão e para o valor central, os enfermeiros da
+        triagem e os médicos do consultório necessários por hora (M/M/c) e os leitos por setor. Trocar o mês ou o dia
+        exibido reaproveita o modelo de previsão já ajustado.
+        """)
+
+        # Meta de espera e utilização máxima dos enfermeiros escolhidas na escala da seção Triagem (os médicos têm as suas abaixo)
+        tempo_espera_alvo_triagem = st.session_state.get("tempo_espera_alvo_triagem", 10.0)
+        utilizacao_maxima_triagem = st.session_state.get("utilizacao_maxima_triagem", 85)
+
+        previsao_dimensionamento = prever(serie_pacientes, horizonte=12)['previsao']
+        meses_previstos = list(previsao_dimensionamento.index)
+        dias_semana = df_semana[COLUNAS["SEMANAL"]["DIA"]].astype(str).tolist()
+        perfil_semana = matriz_demanda.sum(axis=1)
+
+        # Mês, dia e meta de espera reexecutam apenas o dimensionamento
+        @st.fragment
+        def exibir_dimensionamento():
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                mes_dimensionamento = st.selectbox(
+                    "Mês previsto", meses_previstos, format_func=lambda data: data.strftime('%m/%Y'), key="mes_dimensionamento"
+                )
+            with col2:
+                dia_dimensionamento = st.selectbox(
+                    "Dia da semana", dias_semana, index=int(np.argmax(perfil_semana)) if len(perfil_semana) else 0,
+                    key="dia_dimensionamento"
+                )
+            with col3:
+                tempo_espera_alvo_consulta = st.number_input(
+                    "Tempo de espera alvo para o médico (min)", min_value=1.0, max_value=240.0, value=30.0, step=5.0,
+                    key="tempo_espera_alvo_consulta"
+                )
+            with col4:
+                utilizacao_maxima_consulta = st.slider(
+                    "Utilização máxima dos médicos (%)", min_value=50, max_value=99, value=85,
+                    key="utilizacao_maxima_consulta"
+                )
+
+            volumes_mes = previsao_dimensionamento.loc[mes_dimensionamento, list(CENARIOS_PREVISAO)].to_numpy(dtype=float)
+            demanda_prevista = demanda_horaria(
+                volumes_mes, mes_dimensionamento.days_in_month, matriz_demanda
+            )
+            indice_dia = dias_semana.index(dia_dimensionamento)
+
+            equipes = {
+                'Enfermeiros da Triagem': dict(
+                    tempo=float(tempo_medio_atendimento), alvo=tempo_espera_alvo_triagem,
+                    rho_maximo=utilizacao_maxima_triagem / 100, limite=int(num_salas),
+                    atual=enfermeiros_hora_atual.to_numpy(dtype=float)
+                ),
+                'Médicos do Consultório': dict(
+                    tempo=float(tempo_medio_consultorio), alvo=tempo_espera_alvo_consulta,
+                    rho_maximo=utilizacao_maxima_consulta / 100, limite=None,
+                    atual=df_media_medicos_consulta.groupby('hora')[COLUNAS["MEDIA_MEDICOS_CONSULTA"]["QUANTIDADE_MEDIA_MEDICOS"]].mean().reindex(range(24), fill_value=0).to_numpy(dtype=float)
+                ),
+            }
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Pacientes Previstos no Mês", f"{volumes_mes[1]:.0f}", help=f"Intervalo de 95%: {volumes_mes[0]:.0f} a {volumes_mes[2]:.0f}")
+
+            colunas_graficos = st.columns(2)
+            for (nome_equipe, equipe), coluna_grafico, coluna_metrica in zip(equipes.items(), colunas_graficos, (col2, col3)):
+                if equipe['tempo'] <= 0:
+                    with coluna_grafico:
+                        st.warning(f"Tempo de atendimento indisponível para {nome_equipe.lower()}.")
+                    continue
+                requisito = profissionais_por_hora(
+                    demanda_prevista, equipe['tempo'], equipe['alvo'],
+                    rho_maximo=equipe['rho_maximo'], limite=equipe['limite']
+                )[:, indice_dia, :]
+                with coluna_metrica:
+                    st.metric(f"Pico de {nome_equipe}", f"{requisito[1].max()}", help=f"Faixa: {requisito[0].max()} a {requisito[2].max()}")
+                with coluna_grafico:
+                    fig_dimensionamento = go.Figure()
+                    fig_dimensionamento.add_trace(go.Scatter(
+                        x=list(range(24)) + list(range(23, -1, -1)),
+                        y=list(requisito[2]) + list(requisito[0][::-1]),
+                        fill='toself', fillcolor='rgba(239, 85, 59, 0.15)', line=dict(width=0, shape='hv'),
+                        hoverinfo='skip', name='Faixa da previsão'
+                    ))
+                    fig_dimensionamento.add_trace(go.Scatter(
+                        x=list(range(24)), y=requisito[1], mode='lines', name='Necessário (previsão central)',
+                        line=dict(color='#EF553B', width=2, shape='hv')
+                    ))
+                    fig_dimensionamento.add_trace(go.Scatter(
+                        x=list(range(24)), y=equipe['atual'], mode='lines', name='Atual',
+                        line=dict(color='green', width=2, dash='dash', shape='hv')
+                    ))
+                    fig_dimensionamento.update_layout(
+                        title=f"{nome_equipe} por Hora - {dia_dimensionamento}",
+                        xaxis=dict(title='Hora', tickmode='linear', dtick=2),
+                        yaxis_title='Profissionais',
+                        template=TEMA,
+                        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+                    )
+                    st.plotly_chart(fig_dimensionamento, use_container_width=True)
+
+            # Leitos por setor: demanda histórica escalada pela razão previsão / média histórica
+            media_historica_pacientes = serie_pacientes.mean()
+            fatores_demanda = volumes_mes / media_historica_pacientes if media_historica_pacientes > 0 else np.ones(len(volumes_mes))
+            leitos_previstos = leitos_necessarios(
+                df_final['Demanda (Média Solicitações/Dia)'].to_numpy(dtype=float),
+                df_final['TMP (Dias)'].to_numpy(dtype=float),
+                fatores_demanda
+            )
+            df_leitos_previstos = pd.DataFrame({
+                'Setores': df_final['Setores'],
+                'Leitos Atuais': df_final['Quantidade de Leitos'],
+                'Necessários (Limite Inferior)': leitos_previstos[0],
+                'Necessários (Previsão Central)': leitos_previstos[1],
+                'Necessários (Limite Superior)': leitos_previstos[2],
+            })
+            df_leitos_previstos['Diferença (Central)'] = df_leitos_previstos['Necessários (Previsão Central)'] - df_leitos_previstos['Leitos Atuais']
+            with col4:
+                st.metric("Leitos Necessários (Central)", f"{int(leitos_previstos[1].sum())}",
+                          delta=f"{int(df_leitos_previstos['Diferença (Central)'].sum())} vs atual", delta_color="inverse")
+            st.dataframe(df_leitos_previstos, hide_index=True)
+
+            st.markdown("**Observação analítica:**")
+            st.write(f"Para **{mes_dimensionamento.strftime('%m/%Y')}** são previstos **{volumes_mes[1]:.0f}** pacientes "
+                     f"(**{fatores_demanda[1] * 100 - 100:+.1f}%** em relação à média histórica).")
+            setores_deficit = df_leitos_previstos[df_leitos_previstos['Diferença (Central)'] > 0]
+            if not setores_deficit.empty:
+                st.write("Setores com leitos insuficientes para o cenário central: " + ', '.join(
+                    f"**{row['Setores']}** (+{row['Diferença (Central)']})" for _, row in setores_deficit.iterrows()
+                ) + ".")
+            else:
+                st.write("Os leitos atuais comportam o censo previsto em todos os setores no cenário central.")
+            st.caption("Leitos dimensionados para comportar o censo em 95% dos dias (censo Poisson com média λ·TMP). "
+                       "Os profissionais usam a mesma utilização máxima definida na escala da triagem.")
+
+        exibir_dimensionamento()
+
+# =====================================
+# Parte 12: Pré-cálculo das demais seções em segundo plano
+# =====================================
+
+# Depois de desenhar a seção atual, agenda as previsões e a simulação de censo das
+# outras seções (das mais consultadas para as menos). Os resultados ficam nos caches
+# do leanflow, identificados pelos dados, e a seção os encontra prontos ao ser aberta.
+# Um novo upload (ou a remoção do arquivo) cancela o que ainda não começou.
+if uploaded_file and not missing_sheets:
+    agendar_precalculo(id_sessao, hash_planilha, [
+        ('Previsão de pacientes', partial(prever, serie_pacientes)),
+        ('Previsão de exames', partial(prever_lote, {'Pacientes': serie_pacientes})),
+        ('Previsão de cirurgias', partial(prever, serie_cirurgias)),
+        ('Previsão por tipo de cirurgia', partial(prever_lote, series_cc)),
+        ('Simulação do censo de leitos', partial(
+            simular_censo,
+            df_final['Demanda (Média Solicitações/Dia)'].to_numpy(),
+            df_final['TMP (Dias)'].to_numpy(),
+            dias=st.session_state.get("dias_censo", 365),
+            replicacoes=st.session_state.get("replicacoes_censo", 1000)
+        )),
+    ])
+    progresso = progresso_precalculo(id_sessao)
+    if progresso and progresso[0] < progresso[1]:
+        st.sidebar.caption(f"⏳ Preparando as demais seções ({progresso[0]} de {progresso[1]}): {progresso[2]}")
+else:
+    cancelar_precalculo(id_sessao)
+    liberar_sessao(id_sessao)
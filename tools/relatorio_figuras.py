@@ -0,0 +1,107 @@
+"""
+Relatório do tamanho das figuras Plotly da página de diagnóstico.
+
+Executa a página com uma planilha, seção por seção, e lista o JSON de cada
+gráfico enviado ao navegador (o mesmo que o st.plotly_chart serializa),
+separado em dados, layout e template, das figuras maiores para as menores.
+
+Uso (na raiz do repositório):
+    python tools/relatorio_figuras.py planilha.xlsx [--limite 20]
+"""
+
+import argparse
+import ast
+import io
+import json
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINA = os.path.join('pages', '1_Diagnóstico.py')
+
+
+# =====================================
+# Execução da página
+# =====================================
+
+def _constante(nome):
+    # Lê um dict literal da página (ex.: SECOES) sem executá-la
+    with open(os.path.join(RAIZ, PAGINA), encoding='utf-8') as arquivo:
+        arvore = ast.parse(arquivo.read())
+    for no in arvore.body:
+        if isinstance(no, ast.Assign) and any(getattr(alvo, 'id', None) == nome for alvo in no.targets):
+            return ast.literal_eval(no.value)
+    raise KeyError(nome)
+
+
+def _figuras(app, secao):
+    from leanflow.tema import tamanho_figura
+
+    figuras = []
+    for grafico in app.get('plotly_chart'):
+        titulo = json.loads(grafico.proto.spec).get('layout', {}).get('title', {})
+        figuras.append({
+            'secao': secao,
+            'titulo': (titulo.get('text') if isinstance(titulo, dict) else titulo) or '(sem título)',
+            **tamanho_figura(grafico.proto.spec),
+        })
+    return figuras
+
+
+def medir(planilha):
+    """Lista de dicts (secao, titulo, total, dados, layout, template) por gráfico desenhado."""
+    from streamlit.delta_generator import DeltaGenerator
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, RAIZ)
+    with open(planilha, 'rb') as arquivo:
+        conteudo = arquivo.read()
+
+    # O AppTest não simula o upload: o file_uploader devolve a planilha informada
+    class Arquivo(io.BytesIO):
+        name = os.path.basename(planilha)
+
+    DeltaGenerator.file_uploader = lambda *args, **kwargs: Arquivo(conteudo)
+
+    app = AppTest.from_file(os.path.join(RAIZ, PAGINA), default_timeout=300).run()
+    if app.exception or not app.radio:
+        return []
+    figuras = []
+    for secao in _constante('SECOES'):
+        app.radio(key='secao_diagnostico').set_value(secao)
+        app.run()
+        if secao != 'desempenho':
+            figuras += _figuras(app, secao)
+            continue
+        for subsecao in _constante('SUBSECOES_DESEMPENHO'):
+            app.radio(key='subsecao_desempenho').set_value(subsecao)
+            app.run()
+            figuras += _figuras(app, f"{secao}/{subsecao}")
+    return figuras
+
+
+# =====================================
+# Relatório
+# =====================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('planilha', help='arquivo .xlsx no formato da página de diagnóstico')
+    parser.add_argument('--limite', type=int, default=20, help='quantidade de figuras listadas')
+    args = parser.parse_args()
+
+    figuras = medir(os.path.abspath(args.planilha))
+    if not figuras:
+        print("Nenhum gráfico desenhado; verifique a planilha.", file=sys.stderr)
+        return 1
+
+    print(f"{len(figuras)} gráficos, {sum(f['total'] for f in figuras) / 1024:.1f} KB "
+          f"(template: {sum(f['template'] for f in figuras) / 1024:.1f} KB)")
+    print(f"  {'total':>8} {'dados':>8} {'layout':>8} {'template':>8}  seção / título")
+    for f in sorted(figuras, key=lambda f: f['total'], reverse=True)[:args.limite]:
+        print(f"  {f['total']:8d} {f['dados']:8d} {f['layout']:8d} {f['template']:8d}  {f['secao']} / {f['titulo']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
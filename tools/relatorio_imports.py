@@ -0,0 +1,99 @@
+"""
+Relatório de importações da tela inicial da página de diagnóstico.
+
+Executa a página sem planilha (a tela de upload) em um processo novo com
+`python -X importtime`, com o pré-carregamento desligado, e lista as
+importações feitas pela própria página, das mais lentas para as mais rápidas
+(tempo acumulado). Termina com código 1 se alguma biblioteca de PESADOS for
+importada antes do upload, para uso como verificação de regressão.
+
+Uso (na raiz do repositório):
+    python tools/relatorio_imports.py [--limite 15]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGINA = os.path.join('pages', '1_Diagnóstico.py')
+MARCADOR = '### inicio da pagina'
+PESADOS = ('pandas', 'plotly.express', 'scipy', 'statsmodels', 'sklearn', 'matplotlib', 'graphviz')
+
+
+# =====================================
+# Processo medido
+# =====================================
+
+def _executar_pagina():
+    # Roda no processo com -X importtime; o Streamlit é importado antes do
+    # marcador para que o relatório mostre só o que a página acrescenta
+    from streamlit.testing.v1 import AppTest
+
+    sys.path.insert(0, RAIZ)
+    import leanflow.preaquecimento
+    leanflow.preaquecimento.ATIVO = False
+
+    antes = set(sys.modules)
+    print(MARCADOR, file=sys.stderr, flush=True)
+    AppTest.from_file(os.path.join(RAIZ, PAGINA), default_timeout=60).run()
+    novos = sorted(set(sys.modules) - antes)
+    print(json.dumps(novos))
+
+
+# =====================================
+# Relatório
+# =====================================
+
+def _ler_importtime(saida):
+    # Linhas no formato "import time: self [us] | cumulative | imported package";
+    # só as de nível superior (sem recuo no nome) somam sem repetir submódulos
+    linhas = saida.split(MARCADOR, 1)[-1].splitlines()
+    tempos = []
+    for linha in linhas:
+        if not linha.startswith('import time:') or 'imported package' in linha:
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        if nome.startswith('  '):
+            continue
+        tempos.append((int(acumulado) / 1e6, nome.strip()))
+    return sorted(tempos, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--limite', type=int, default=15, help='quantidade de importações listadas')
+    parser.add_argument('--medir', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        _executar_pagina()
+        return 0
+
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--medir'],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if processo.returncode != 0:
+        erros = [linha for linha in processo.stderr.splitlines() if not linha.startswith('import time:')]
+        print('\n'.join(erros[-30:]), file=sys.stderr)
+        return processo.returncode
+
+    tempos = _ler_importtime(processo.stderr)
+    novos = json.loads(processo.stdout.strip().splitlines()[-1])
+    pesados = [nome for nome in PESADOS if nome in novos]
+
+    print(f"Importações da tela de upload: {sum(t for t, _ in tempos):.2f} s em {len(tempos)} pacotes")
+    for tempo, nome in tempos[:args.limite]:
+        print(f"  {tempo:7.3f} s  {nome}")
+    if pesados:
+        print(f"ERRO: bibliotecas pesadas importadas antes do upload: {', '.join(pesados)}")
+        return 1
+    print("OK: nenhuma biblioteca pesada antes do upload.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())